@@ -5,13 +5,65 @@
 
 import copy
 import inspect
+import tracemalloc
 from enum import Enum
 
+import numpy as np
+
 from genalog.degradation import effect
 
 DEFAULT_METHOD_PARAM_TO_INCLUDE = "src"
 
 
+def _effect_param(method_name, method_kwargs, param_name):
+    """Look up an effect parameter, falling back to the default value declared
+    in the signature of the method in ``genalog.degradation.effect``
+    """
+    if param_name in method_kwargs:
+        return method_kwargs[param_name]
+    method_sign = inspect.signature(getattr(effect, method_name))
+    return method_sign.parameters[param_name].default
+
+
+def _blur_halo(method_kwargs):
+    return _effect_param("blur", method_kwargs, "radius") // 2
+
+
+def _translation_halo(method_name):
+    def halo(method_kwargs):
+        return abs(int(_effect_param(method_name, method_kwargs, "offset_y")))
+    return halo
+
+
+def _morphology_halo(method_kwargs):
+    operation = _effect_param("morphology", method_kwargs, "operation")
+    kernel_shape = _effect_param("morphology", method_kwargs, "kernel_shape")
+    # "open" and "close" are two consecutive passes of the structuring element
+    passes = 2 if operation in ("open", "close") else 1
+    return passes * max(kernel_shape)
+
+
+def _no_halo(method_kwargs):
+    return 0
+
+
+# Number of rows of vertical context each effect needs above and below
+# a horizontal strip for its output to be identical to the untiled output.
+# Effects not listed here cannot be tiled.
+EFFECT_VERTICAL_HALO = {
+    "blur": _blur_halo,
+    "overlay_weighted": _no_halo,
+    "overlay": _no_halo,
+    "translation": _translation_halo("translation"),
+    "bleed_through": _translation_halo("bleed_through"),
+    "pepper": _no_halo,
+    "salt": _no_halo,
+    "salt_then_pepper": _no_halo,
+    "pepper_then_salt": _no_halo,
+    "morphology": _morphology_halo,
+}
+
+
 class ImageState(Enum):
     ORIGINAL_STATE = "ORIGINAL_STATE"
     CURRENT_STATE = "CURRENT_STATE"
@@ -20,7 +72,7 @@ class ImageState(Enum):
 class Degrader:
     """ An object for applying multiple degradation effects onto an image"""
 
-    def __init__(self, effects):
+    def __init__(self, effects, tile_rows=None, debug=False):
         """
         Arguments:
             effects (list) : a list of 2-element tuple (method_name, method_kwargs) where:
@@ -28,6 +80,14 @@ class Degrader:
                 :method_name: the name of the degradation method (method must be defined in 'genalog.degradation.effect')
                 :method_kwargs: the keyword arguments of the corresponding method
 
+            tile_rows (int, optional) : if set, images taller than this are degraded in
+                horizontal strips of ``tile_rows`` rows, each padded with the halo rows
+                required by the effects, to bound the size of the temporaries allocated
+                by each effect. Defaults to None (no tiling).
+            debug (bool, optional) : if True, check that every effect returns a C-contiguous
+                uint8 image and record the memory allocated by each effect in
+                ``Degrader.effect_reports``. Defaults to False.
+
         Example:
         ::
 
@@ -42,9 +102,17 @@ class Degrader:
         ::
 
                 "blur" -> "bleed_through" -> "morphological operation (open)"
+
+        **NOTE**: tiled results are identical to the untiled results, except for the random
+        effects (i.e. "salt" and "pepper"), which draw their noise strip by strip.
         """
         Degrader.validate_effects(effects)
+        if tile_rows is not None and tile_rows < 1:
+            raise ValueError(f"tile_rows must be a positive integer, but got {tile_rows}")
         self.effects_to_apply = copy.deepcopy(effects)
+        self.tile_rows = tile_rows
+        self.debug = debug
+        self.effect_reports = []
         self._add_default_method_param()
 
     @staticmethod
@@ -107,28 +175,148 @@ class Degrader:
                     DEFAULT_METHOD_PARAM_TO_INCLUDE
                 ] = ImageState.CURRENT_STATE
 
+    def vertical_halo(self):
+        """Number of rows of context a horizontal strip needs on each side
+        so that the degraded strip matches the same rows of the degraded full image.
+
+        Returns:
+            int : the halo of the whole chain of effects (the sum of the halo of each effect),
+            or None if any of the effects cannot be tiled.
+        """
+        halo = 0
+        for method_name, method_kwargs in self.effects_to_apply:
+            if method_name not in EFFECT_VERTICAL_HALO:
+                return None
+            halo += EFFECT_VERTICAL_HALO[method_name](method_kwargs)
+        return halo
+
     def apply_effects(self, src):
         """Apply degradation effects in sequence
 
+        The image is degraded as a C-contiguous uint8 array: any other
+        memory layout is copied once, before the first effect. Pixel values of any
+        other dtype are read on the 0-255 scale: they are clipped to [0, 255] and
+        rounded (a float image in [0, 1] must be scaled by 255 first).
+
+        If ``tile_rows`` is set and the image is taller than ``tile_rows``,
+        the effects are applied strip by strip (see ``Degrader.apply_effects_tiled()``).
+
         Arguments:
             src (numpy.ndarray) : source image of shape (rows, cols)
 
         Returns:
              a copy of the source image {numpy.ndarray} after apply the effects
         """
+        src = np.asarray(src)
+        if src.dtype != np.uint8:
+            # A plain cast would truncate the fractions and wrap the out of range values
+            src = np.clip(src, 0, 255).round()
+        # No copy if the image is already a C-contiguous uint8 array
+        src = np.ascontiguousarray(src, dtype=np.uint8)
+        self.effect_reports = []
+        if self.tile_rows and src.shape[0] > self.tile_rows:
+            halo = self.vertical_halo()
+            if halo is not None:
+                return self.apply_effects_tiled(src, self.tile_rows, halo)
+        return self._apply_effects(src)
+
+    def apply_effects_tiled(self, src, tile_rows, halo):
+        """Apply degradation effects in sequence on horizontal strips of the image
+
+        Each strip of ``tile_rows`` rows is extended by ``halo`` rows above and below,
+        degraded, and only its core rows are copied into the output image.
+
+        Arguments:
+            src (numpy.ndarray) : source image of shape (rows, cols)
+            tile_rows (int) : number of rows in each strip
+            halo (int) : number of overlapping rows on each side of a strip.
+                See ``Degrader.vertical_halo()``.
+
+        Returns:
+             a copy of the source image {numpy.ndarray} after apply the effects
+        """
+        rows = src.shape[0]
+        dst = None
+        for core_start in range(0, rows, tile_rows):
+            core_end = min(core_start + tile_rows, rows)
+            tile_start = max(core_start - halo, 0)
+            tile_end = min(core_end + halo, rows)
+            tile = self._apply_effects(src, row_range=(tile_start, tile_end))
+            if dst is None:
+                dst = np.empty((rows,) + tile.shape[1:], dtype=tile.dtype)
+            dst[core_start:core_end] = tile[core_start - tile_start: core_end - tile_start]
+        self.original_state = src
+        self.current_state = dst
+        return dst
+
+    def _apply_effects(self, src, row_range=None):
+        """Apply degradation effects in sequence on the full image,
+        or on the rows ``[start, end)`` of the image if ``row_range`` is given.
+        Image arguments of the effects are cropped to the same rows.
+        """
+        if row_range:
+            start, end = row_range
+            full_rows = src.shape[0]
+            src = src[start:end]
         self.original_state = src
         self.current_state = src
-        # Preserve the original effect instructions
-        effects_to_apply = copy.deepcopy(self.effects_to_apply)
+        # Preserve the original effect instructions. A shallow copy is enough since only
+        # the top-level arguments are replaced, and it avoids copying image arguments.
+        effects_to_apply = [
+            (method_name, dict(method_kwargs)) for method_name, method_kwargs in self.effects_to_apply
+        ]
         for effect_tuple in effects_to_apply:
             method_name, method_kwargs = effect_tuple
             method = getattr(effect, method_name)
+            if row_range:
+                # Crop images passed explicitly (i.e. a bleed-through background) to the strip
+                for keyword, argument in method_kwargs.items():
+                    if isinstance(argument, np.ndarray) and argument.shape[:1] == (full_rows,):
+                        method_kwargs[keyword] = argument[start:end]
             # Replace constants (i.e. ImageState.ORIGINAL_STATE) with actual image state
             method_kwargs = self.insert_image_state(method_kwargs)
             # Calling the degradation method
-            self.current_state = method(**method_kwargs)
+            if self.debug:
+                self.current_state = self._debug_effect(method_name, method, method_kwargs)
+            else:
+                self.current_state = method(**method_kwargs)
         return self.current_state
 
+    def _debug_effect(self, method_name, method, method_kwargs):
+        """Call a degradation method and check that it preserves the uint8, C-contiguous
+        image. The memory traced during the call is recorded in ``self.effect_reports``.
+
+        Raises:
+            AssertionError: if the method converts the image dtype or returns a non-contiguous image
+        """
+        src = method_kwargs[DEFAULT_METHOD_PARAM_TO_INCLUDE]
+        is_tracing = tracemalloc.is_tracing()
+        if not is_tracing:
+            tracemalloc.start()
+        start_mem, _ = tracemalloc.get_traced_memory()
+        dst = method(**method_kwargs)
+        end_mem, peak_mem = tracemalloc.get_traced_memory()
+        if is_tracing:
+            # The peak of an outer trace includes earlier allocations, use the net allocation instead
+            alloc = end_mem - start_mem
+        else:
+            alloc = peak_mem - start_mem
+            tracemalloc.stop()
+        assert dst.dtype == np.uint8, (
+            f"'{method_name}' converted the image from {src.dtype} to {dst.dtype}"
+        )
+        assert dst.flags["C_CONTIGUOUS"], f"'{method_name}' returned a non C-contiguous image"
+        # "image_copies" is the number of image-sized buffers allocated by the method. A method
+        # without hidden copies allocates one buffer (its output), plus its own temporaries.
+        self.effect_reports.append({
+            "method_name": method_name,
+            "src_dtype": str(src.dtype),
+            "dst_dtype": str(dst.dtype),
+            "alloc_bytes": alloc,
+            "image_copies": alloc / dst.nbytes if dst.nbytes else 0,
+        })
+        return dst
+
     def insert_image_state(self, kwargs):
         """Replace the enumeration (ImageState) with the actual image in
         the keyword argument dictionary
@@ -141,10 +329,13 @@ class Degrader:
         Returns:
             return keyword argument dictionary replaced with
             reference to the image
+
+        **NOTE**: the image is not copied. Degradation methods in
+        ``genalog.degradation.effect`` never modify their input images.
         """
         for keyword, argument in kwargs.items():
             if argument is ImageState.ORIGINAL_STATE:
-                kwargs[keyword] = self.original_state.copy()
+                kwargs[keyword] = self.original_state
             if argument is ImageState.CURRENT_STATE:
-                kwargs[keyword] = self.current_state.copy()
+                kwargs[keyword] = self.current_state
         return kwargs
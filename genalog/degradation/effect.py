@@ -9,6 +9,31 @@ import cv2
 import numpy as np
 
 
+# Number of pixels to draw random noise for at once in "salt" and "pepper"
+NOISE_CHUNK_SIZE = 2 ** 16
+
+
+def _uint8_copy(src):
+    """ Return a C-contiguous uint8 copy of the image in a single allocation """
+    return np.array(src, dtype=np.uint8, order="C", copy=True)
+
+
+def _sprinkle(src, amount, value):
+    """Set a random proportion of the pixels to the given value.
+
+    The noise is drawn in chunks of ``NOISE_CHUNK_SIZE`` pixels to avoid allocating
+    a float64 array the size of the image. Drawing the noise in chunks consumes the
+    random number generator in the same order as drawing it all at once.
+    """
+    dst = _uint8_copy(src)
+    pixels = dst.reshape(-1)  # a view on dst
+    for start in range(0, pixels.size, NOISE_CHUNK_SIZE):
+        chunk = pixels[start: start + NOISE_CHUNK_SIZE]
+        # Method returns random floats in uniform distribution [0, 1)
+        chunk[np.random.random(chunk.size) < amount] = value
+    return dst
+
+
 def blur(src, radius=5):
     """Wrapper function for cv2.GaussianBlur
 
@@ -38,7 +63,8 @@ def overlay_weighted(src, background, alpha, beta, gamma=0):
     Returns:
         numpy.ndarray: a copy of the source image after apply the effect
     """
-    return cv2.addWeighted(src, alpha, background, beta, gamma).astype(np.uint8)
+    # Saturate into uint8 directly, without an intermediate copy
+    return cv2.addWeighted(src, alpha, background, beta, gamma, dtype=cv2.CV_8U)
 
 
 def overlay(src, background):
@@ -53,7 +79,7 @@ def overlay(src, background):
     Returns:
         numpy.ndarray: a copy of the source image after apply the effect
     """
-    return cv2.bitwise_and(src, background).astype(np.uint8)
+    return cv2.bitwise_and(src, background)
 
 
 def translation(src, offset_x, offset_y):
@@ -72,8 +98,7 @@ def translation(src, offset_x, offset_y):
     rows, cols = src.shape
     trans_matrix = np.float32([[1, 0, offset_x], [0, 1, offset_y]])
     # size of the output image should be in the form of (width, height)
-    dst = cv2.warpAffine(src, trans_matrix, (cols, rows), borderValue=255)
-    return dst.astype(np.uint8)
+    return cv2.warpAffine(src, trans_matrix, (cols, rows), borderValue=255)
 
 
 def bleed_through(src, background=None, alpha=0.8, gamma=0, offset_x=0, offset_y=5):
@@ -94,13 +119,36 @@ def bleed_through(src, background=None, alpha=0.8, gamma=0, offset_x=0, offset_y
         numpy.ndarray: a copy of the source image after apply the effect. Pixel value ranges [0, 255]
     """
     if background is None:
-        background = src.copy()
+        background = src  # cv2.flip() does not modify its input
     background = cv2.flip(background, 1)  # flipped horizontally
     background = translation(background, offset_x, offset_y)
     beta = 1 - alpha
     return overlay_weighted(src, background, alpha, beta, gamma)
 
 
+def bleed_through_texture(src, bank_path, index=None, alpha=0.8, gamma=0):
+    """Apply bleed through effect with a pre-rendered backside page from a texture bank.
+    See ``genalog.degradation.texture_bank.TextureBank``.
+
+    Arguments:
+        src (numpy.ndarray) : source image of shape (rows, cols)
+        bank_path (str) : filepath of the texture bank. The bank is memory-mapped
+                          once per process.
+        index (int, optional) : index of the texture in the bank. Defaults to None (a random texture).
+        alpha (float, optional) : transparent factor for the foreground. Defaults to 0.8.
+        gamma (int, optional) : luminance constant. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: a copy of the source image after apply the effect. Pixel value ranges [0, 255]
+    """
+    # Imported here since the texture bank module depends on this module
+    from genalog.degradation.texture_bank import load_texture_bank
+
+    background = load_texture_bank(bank_path).sample(src.shape, index=index)
+    beta = 1 - alpha
+    return overlay_weighted(src, background, alpha, beta, gamma)
+
+
 def pepper(src, amount=0.05):
     """Randomly sprinkle dark pixels on src image.
     Wrapper function for skimage.util.noise.random_noise().
@@ -115,11 +163,7 @@ def pepper(src, amount=0.05):
         numpy.ndarray: a copy of the source image after apply the effect.
         Pixel value ranges [0, 255] as uint8.
     """
-    dst = src.copy()
-    # Method returns random floats in uniform distribution [0, 1)
-    noise = np.random.random(src.shape)
-    dst[noise < amount] = 0
-    return dst.astype(np.uint8)
+    return _sprinkle(src, amount, 0)
 
 
 def salt(src, amount=0.3):
@@ -136,11 +180,7 @@ def salt(src, amount=0.3):
         numpy.ndarray: a copy of the source image after apply the effect.
         Pixel value ranges [0, 255]
     """
-    dst = src.copy()
-    # Method returns random floats in uniform distribution [0, 1)
-    noise = np.random.random(src.shape)
-    dst[noise < amount] = 255
-    return dst.astype(np.uint8)
+    return _sprinkle(src, amount, 255)
 
 
 def salt_then_pepper(src, salt_amount=0.1, pepper_amount=0.05):
@@ -230,18 +270,18 @@ def create_2D_kernel(kernel_shape, kernel_type="ones"):
     if len(kernel_shape) != 2:
         raise ValueError("Kernel shape must be a tuple of 2 integers")
     kernel_rows, kernel_cols = kernel_shape
+    # Kernels are built in uint8 directly, the dtype expected by OpenCV
     if kernel_type == "ones":
-        kernel = np.ones(kernel_shape)
+        kernel = np.ones(kernel_shape, dtype=np.uint8)
     elif kernel_type == "upper_triangle":
-        kernel = np.triu(np.ones(kernel_shape))
+        kernel = np.triu(np.ones(kernel_shape, dtype=np.uint8))
     elif kernel_type == "lower_triangle":
-        kernel = np.tril(np.ones(kernel_shape))
+        kernel = np.tril(np.ones(kernel_shape, dtype=np.uint8))
     elif kernel_type == "x":
-        diagonal = np.eye(kernel_rows, kernel_cols)
-        kernel = np.add(diagonal, np.fliplr(diagonal))
-        kernel[kernel > 1] = 1
+        diagonal = np.eye(kernel_rows, kernel_cols, dtype=np.uint8)
+        kernel = np.maximum(diagonal, np.fliplr(diagonal))
     elif kernel_type == "plus":
-        kernel = np.zeros(kernel_shape)
+        kernel = np.zeros(kernel_shape, dtype=np.uint8)
         center_col = floor(kernel.shape[0] / 2)
         center_row = floor(kernel.shape[1] / 2)
         kernel[:, center_col] = 1
@@ -261,7 +301,7 @@ def create_2D_kernel(kernel_shape, kernel_type="ones"):
             f"Invalid kernel_type: {kernel_type}. Valid types are {valid_kernel_types}"
         )
 
-    return kernel.astype(np.uint8)
+    return kernel
 
 
 def morphology(src, operation="open", kernel_shape=(3, 3), kernel_type="ones"):
@@ -0,0 +1,124 @@
+# ---------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+# ---------------------------------------------------------
+
+"""A bank of pre-rendered backside pages for the bleed-through effect.
+
+``effect.bleed_through`` flips and translates a background page on every call.
+A texture bank stores these backside pages once, already flipped, translated
+and blurred, in a ``.npy`` file that is memory-mapped on load. Worker processes
+opening the same bank share its pages through the OS page cache.
+"""
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from genalog.degradation import effect
+
+
+class TextureBank:
+    """ A read-only, memory-mapped store of bleed-through textures """
+
+    def __init__(self, bank_path):
+        """
+        Arguments:
+            bank_path (str) : filepath of a texture bank created with ``TextureBank.build()``
+        """
+        self.bank_path = bank_path
+        # Array of shape (num_textures, rows, cols)
+        self.textures = np.load(bank_path, mmap_mode="r")
+
+    @staticmethod
+    def build(bank_path, pages, blur_radius=5, offset_x=0, offset_y=5):
+        """Pre-render the backside of each page and store them in a texture bank
+
+        Arguments:
+            bank_path (str) : filepath of the texture bank to write (ex: "bank.npy")
+            pages (list) : a list of grayscale pages {numpy.ndarray} of the same shape (rows, cols)
+            blur_radius (int, optional) : radius of the gaussian blur applied to the backside.
+                                          MUST be an odd integer. Set to None to disable blurring.
+                                          Defaults to 5.
+            offset_x (int, optional) : backside translation offset. Defaults to 0.
+            offset_y (int, optional) : backside translation offset. Defaults to 5.
+
+        Raises:
+            ValueError: if ``pages`` is empty or the pages are not in the same shape
+
+        Returns:
+            TextureBank : the texture bank loaded from ``bank_path``
+        """
+        if len(pages) == 0:
+            raise ValueError("Cannot build a texture bank without pages")
+        shape = pages[0].shape
+        # Validate before creating the file, so that invalid pages leave no bank behind
+        for i, page in enumerate(pages):
+            if page.shape != shape:
+                raise ValueError(
+                    f"Pages must be in the same shape. Expect {shape} but page {i} is in {page.shape}"
+                )
+        textures = np.lib.format.open_memmap(
+            bank_path, mode="w+", dtype=np.uint8, shape=(len(pages),) + shape
+        )
+        complete = False
+        try:
+            for i, page in enumerate(pages):
+                texture = cv2.flip(page, 1)  # flipped horizontally
+                texture = effect.translation(texture, offset_x, offset_y)
+                if blur_radius:
+                    texture = effect.blur(texture, radius=blur_radius)
+                textures[i] = texture
+            textures.flush()
+            complete = True
+        finally:
+            del textures  # close the memory map
+            if not complete:
+                os.remove(bank_path)  # do not leave a partially written bank
+        return TextureBank(bank_path)
+
+    def __len__(self):
+        return len(self.textures)
+
+    def __getitem__(self, index):
+        return self.textures[index]
+
+    def sample(self, shape, index=None):
+        """Get a texture in the given shape
+
+        Arguments:
+            shape (tuple) : shape of the texture (rows, cols)
+            index (int, optional) : index of the texture in the bank.
+                                    Defaults to None (a random texture).
+
+        Returns:
+            numpy.ndarray: a texture of the given shape. The texture is a read-only
+            view of the bank if it is in the same shape, otherwise a resized copy.
+        """
+        if index is None:
+            index = np.random.randint(len(self.textures))
+        texture = self.textures[index]
+        if texture.shape != tuple(shape):
+            rows, cols = shape
+            texture = cv2.resize(texture, (cols, rows), interpolation=cv2.INTER_AREA)
+        return texture
+
+
+def load_texture_bank(bank_path):
+    """Open a texture bank once per process. A bank rebuilt at the same path
+    (another modification time or size) is opened again.
+
+    Arguments:
+        bank_path (str) : filepath of the texture bank
+
+    Returns:
+        TextureBank : the memory-mapped texture bank
+    """
+    stat = os.stat(bank_path)
+    return _load_texture_bank(bank_path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=None)
+def _load_texture_bank(bank_path, mtime_ns, size):
+    return TextureBank(bank_path)
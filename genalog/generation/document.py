@@ -1,3 +1,4 @@
+import hashlib
 import itertools
 import os
 
@@ -5,7 +6,7 @@ import cv2
 import numpy as np
 from cairocffi import FORMAT_ARGB32
 from jinja2 import Environment, select_autoescape
-from jinja2 import FileSystemLoader, PackageLoader
+from jinja2 import FileSystemBytecodeCache, FileSystemLoader, PackageLoader
 from weasyprint import HTML
 
 DEFAULT_DOCUMENT_STYLE = {
@@ -25,6 +26,17 @@ DEFAULT_STYLE_COMBINATION = {
     "hyphenate": [False],
 }
 
+# Environment variable with the default folder of the on-disk cache of compiled templates
+BYTECODE_CACHE_ENV_VAR = "GENALOG_TEMPLATE_CACHE"
+
+# Computed style properties left out of Document.layout_fingerprint(): they are not painted,
+# or they only act through the box geometry and text which are part of the fingerprint
+LAYOUT_ONLY_PROPERTIES = frozenset([
+    "lang", "text_align", "text_indent",
+    "hyphens", "hyphenate_character", "hyphenate_limit_chars", "hyphenate_limit_zone",
+    "anchor", "link", "string_set", "bookmark_label", "bookmark_level", "bookmark_state",
+])
+
 
 class Document(object):
     """ A composite object that represents a document """
@@ -67,6 +79,34 @@ class Document(object):
         # Update the default styles and initialize self._document object
         self.update_style(**styles)
 
+    @classmethod
+    def from_compiled_html(cls, content, template, compiled_html, **styles):
+        """Create a Document from html already compiled from the template, without rendering it again
+
+        Arguments:
+            content (CompositeContent) : the content compiled into the html
+            template (Template) : the jinja2.Template object the html is compiled from
+            compiled_html (str) : the output of ``template.render(content=content, **styles)``
+                with the default styles. See ``Document.render_html()``
+
+        Other Parameters:
+            styles (dict) : the template variables the html is compiled with
+
+        Returns:
+            Document : a laid out document
+        """
+        doc = cls.__new__(cls)
+        doc.content = content
+        doc.template = template
+        doc.styles = {**DEFAULT_DOCUMENT_STYLE, **styles}
+        doc._set_html(compiled_html)
+        return doc
+
+    @property
+    def num_pages(self):
+        """ Number of pages in the laid out document """
+        return len(self._document.pages)
+
     def render_html(self):
         """Wrapper function for Jinjia2.Template.render(). Each template
         declare its template variables. This method assigns each variable to
@@ -173,6 +213,72 @@ class Document(object):
                 f"Invalid channel code {channel}. Valid values are: {valid_channels}."
             )
 
+    def layout_fingerprint(self):
+        """Summarize what is painted on the document: the geometry, text and computed style of every box on every page.
+
+        Two documents with the same fingerprint are painted into the same image, so the
+        fingerprint can be used to rasterize only once the style combinations that do not
+        change the painted output (ex: ``language`` of a text without hyphenation).
+        The computed styles are all included, except ``LAYOUT_ONLY_PROPERTIES``.
+
+        Returns:
+            str : a SHA-256 hex digest of the document layout, or None if the boxes of the
+            pages cannot be read (a document without fingerprint is never shared)
+        """
+        digest = hashlib.sha256()
+        style_reprs = {}  # the boxes of a text share their computed style
+        for page in self._document.pages:
+            page_box = getattr(page, "_page_box", None)
+            if page_box is None:
+                return None
+            digest.update(repr((page.width, page.height)).encode("utf8"))
+            for box in page_box.descendants():
+                style = box.style
+                style_repr = style_reprs.get(id(style))
+                if style_repr is None:
+                    style_repr = repr(sorted(
+                        (name, value) for name, value in style.items() if name not in LAYOUT_ONLY_PROPERTIES
+                    ))
+                    style_reprs[id(style)] = style_repr
+                digest.update(repr((
+                    type(box).__name__,
+                    box.position_x, box.position_y, box.width, box.height,
+                    getattr(box, "text", None), getattr(box, "justification_spacing", None),
+                )).encode("utf8"))
+                digest.update(style_repr.encode("utf8"))
+        return digest.hexdigest()
+
+    def page_lines(self, page_num=0):
+        """Get the lines of text laid out on a page of the document
+
+        Arguments:
+            page_num (int, optional) : index of the page. Defaults to 0.
+
+        Returns:
+            list : the text {str} of each line on the page, in order
+        """
+        page = self._document.pages[page_num]
+        lines = []
+        for box in page._page_box.descendants():
+            if type(box).__name__ == "LineBox":
+                text = " ".join(
+                    child.text for child in box.descendants() if getattr(child, "text", None)
+                )
+                if text:
+                    lines.append(text)
+        return lines
+
+    def page_text(self, page_num=0):
+        """Get the text laid out on a page of the document
+
+        Arguments:
+            page_num (int, optional) : index of the page. Defaults to 0.
+
+        Returns:
+            str : the text of the lines on the page, joined by spaces
+        """
+        return " ".join(self.page_lines(page_num))
+
     def update_style(self, **style):
         """Update template variables that controls the document style and re-compile the document to reflect the style change.
 
@@ -192,7 +298,10 @@ class Document(object):
         """
         self.styles.update(style)
         # Recompile the html template and the document obj
-        self.compiled_html = self.render_html()
+        self._set_html(self.render_html())
+
+    def _set_html(self, compiled_html):
+        self.compiled_html = compiled_html
         self._document = HTML(
             string=self.compiled_html
         ).render()  # weasyprinter.document.Document object
@@ -201,7 +310,7 @@ class Document(object):
 class DocumentGenerator:
     """ Document generator class """
 
-    def __init__(self, template_path=None):
+    def __init__(self, template_path=None, bytecode_cache_dir=None):
         """Initialize a DocumentGenerator class
 
         Arguments:
@@ -209,26 +318,43 @@ class DocumentGenerator:
 
                 **NOTE**: if not set, will use the default templates from the
                 package "genalog.generation.templates".
+            bytecode_cache_dir (str, optional) : folder of an on-disk cache of the compiled templates,
+                shared between processes and runs. Defaults to None (the value of the
+                ``GENALOG_TEMPLATE_CACHE`` environment variable, no cache if unset).
         """
+        bytecode_cache_dir = bytecode_cache_dir or os.environ.get(BYTECODE_CACHE_ENV_VAR)
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
         if template_path:
             self.template_env = Environment(
                 loader=FileSystemLoader(template_path),
                 autoescape=select_autoescape(["html", "xml"]),
+                bytecode_cache=bytecode_cache,
             )
-            self.template_list = self.template_env.list_templates()
+            self._template_filter = None
         else:
             # Loading built-in templates from the genalog package
             self.template_env = Environment(
                 loader=PackageLoader("genalog.generation", "templates"),
                 autoescape=select_autoescape(["html", "xml"]),
+                bytecode_cache=bytecode_cache,
             )
             # Remove macros and css templates from rendering
-            self.template_list = self.template_env.list_templates(
-                filter_func=DocumentGenerator._keep_template
-            )
+            self._template_filter = DocumentGenerator._keep_template
+        self._template_list = None  # listed on first use
 
+        self._compiled_templates = {}
         self.set_styles_to_generate(DEFAULT_STYLE_COMBINATION)
 
+    @property
+    def template_list(self):
+        """ Names of the templates available to generate documents from """
+        if self._template_list is None:
+            self._template_list = self.template_env.list_templates(filter_func=self._template_filter)
+        return self._template_list
+
     @staticmethod
     def _keep_template(template_name):
         """Auxiliary function for Jinja2.Environment.list_templates().
@@ -281,6 +407,26 @@ class DocumentGenerator:
             style_combinations
         )
 
+    def get_template(self, template_name):
+        """Load and compile a template once. Later calls return the same compiled template.
+
+        Arguments:
+            template_name (str) : name of the template in the self.template_env
+
+        Raises:
+            FileNotFoundError: if the template is not in the available templates
+
+        Returns:
+            Template : a compiled jinja2.Template object
+        """
+        if template_name not in self._compiled_templates:
+            if template_name not in self.template_list:
+                raise FileNotFoundError(
+                    f"File '{template_name}' not found. Available templates are {self.template_list}"
+                )
+            self._compiled_templates[template_name] = self.template_env.get_template(template_name)
+        return self._compiled_templates[template_name]
+
     def create_generator(self, content, templates_to_render):
         """Create a Document generator
 
@@ -293,11 +439,7 @@ class DocumentGenerator:
             Document : a Document Object
         """
         for template_name in templates_to_render:
-            if template_name not in self.template_list:
-                raise FileNotFoundError(
-                    f"File '{template_name}' not found. Available templates are {self.template_list}"
-                )
-            template = self.template_env.get_template(template_name)
+            template = self.get_template(template_name)
             for style in self.styles_to_generate:
                 yield Document(content, template, **style)
 
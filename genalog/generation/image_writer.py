@@ -0,0 +1,134 @@
+# ---------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+# ---------------------------------------------------------
+
+"""Background image writer for the generation pipeline.
+
+Encoding a page (especially PNG) and writing it to disk can take as long as laying
+it out. ``ImageWriter`` moves both onto a small thread pool (OpenCV releases the GIL
+while encoding) so that the caller can go straight to the next document.
+"""
+import concurrent.futures
+import os
+import threading
+import timeit
+
+import cv2
+import numpy as np
+
+# Supported image formats and their file extensions
+IMAGE_FORMATS = {"png": ".png", "webp": ".webp", "raw": ".npy"}
+DEFAULT_WRITER_THREADS = 2
+DEFAULT_MAX_QUEUE = 8
+
+
+class ImageWriter:
+    """Write images to "<output_folder>/img/" on a background thread pool
+
+    Example Usage: ::
+
+        with ImageWriter("output", image_format="png", compression=1) as writer:
+            writer.submit(img, "doc_1")  # returns immediately
+        # all the images are on disk here
+    """
+
+    def __init__(
+            self, output_folder, image_format="png", compression=None,
+            max_workers=DEFAULT_WRITER_THREADS, max_queue=DEFAULT_MAX_QUEUE):
+        """
+        Arguments:
+            output_folder (str) : folder in which the images are stored (under "img/").
+                                  The folder is created once here.
+            image_format (str, optional) : one of ``IMAGE_FORMATS``: "png", "webp" or
+                                           "raw" (uncompressed numpy ``.npy`` file). Defaults to "png".
+            compression (int, optional) : PNG compression level (0-9) or WebP quality (1-100).
+                                          Defaults to None (OpenCV default).
+            max_workers (int, optional) : number of writer threads. Defaults to ``DEFAULT_WRITER_THREADS``.
+            max_queue (int, optional) : maximum number of images waiting to be written.
+                                        ``submit()`` blocks when the queue is full. Defaults to ``DEFAULT_MAX_QUEUE``.
+
+        Raises:
+            ValueError: if ``image_format`` is not supported
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unsupported image format '{image_format}'. Expect one of {list(IMAGE_FORMATS)}"
+            )
+        self.img_folder = os.path.join(output_folder, "img")
+        self.image_format = image_format
+        self.extension = IMAGE_FORMATS[image_format]
+        self.params = []
+        if compression is not None:
+            if image_format == "png":
+                self.params = [cv2.IMWRITE_PNG_COMPRESSION, compression]
+            elif image_format == "webp":
+                self.params = [cv2.IMWRITE_WEBP_QUALITY, compression]
+        os.makedirs(self.img_folder, exist_ok=True)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._pending = set()
+
+    def image_path(self, name):
+        """ Return the filepath of the image with the given name (without extension) """
+        return os.path.join(self.img_folder, name + self.extension)
+
+    def submit(self, img, name, telemetry=None):
+        """Queue an image to be written
+
+        Arguments:
+            img (numpy.ndarray) : the image. It must not be modified after submission.
+            name (str) : filename of the image, without extension
+            telemetry (genalog.telemetry.BatchTelemetry, optional) : records the time
+                spent encoding and writing the image as the "write" stage. Defaults to None.
+
+        Raises:
+            RuntimeError: if a previously submitted image could not be written
+        """
+        self._raise_errors(wait=False)
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, img, self.image_path(name), telemetry)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.add(future)
+
+    def flush(self):
+        """Wait until all the submitted images are written
+
+        Raises:
+            RuntimeError: if an image could not be written
+        """
+        self._raise_errors(wait=True)
+
+    def close(self):
+        """ Flush the queue and stop the writer threads """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _raise_errors(self, wait):
+        if wait:
+            concurrent.futures.wait(self._pending)
+        done = {future for future in self._pending if future.done()}
+        self._pending -= done
+        for future in done:
+            future.result()  # re-raise the error of the writer thread, if any
+
+    def _write(self, img, path, telemetry=None):
+        start = timeit.default_timer()
+        if self.image_format == "raw":
+            np.save(path, img)
+        elif not cv2.imwrite(path, img, self.params):
+            raise RuntimeError(f"Could not write to path {path}")
+        if telemetry is not None:
+            telemetry.add("write", timeit.default_timer() - start)
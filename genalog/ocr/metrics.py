@@ -30,8 +30,16 @@ from multiprocessing import Pool
 import pandas as pd
 from tqdm import tqdm
 
-from genalog.text.alignment import GAP_CHAR
-from genalog.text.anchor import align_w_anchor
+from genalog.text.alignment import (
+    _free_gap_char,
+    EDIT_DELETE,
+    EDIT_INSERT,
+    EDIT_MATCH,
+    EDIT_REPLACE,
+    EditScript,
+    GAP_CHAR,
+)
+from genalog.text.alignment_cache import cached_edit_script
 from genalog.text.ner_label import _find_gap_char_candidates
 
 LOG_LEVEL = 0
@@ -47,29 +55,93 @@ def _trim_whitespace(src_string):
     return re.sub(r"\s+", " ", src_string.strip())
 
 
-def _update_align_stats(src, target, align_stats, substitution_dict, gap_char):
-    """Given two string that differ and have no alignment at all,
+def _as_edit_script(alignment, gap_char):
+    """ Return the ``EditScript`` of an alignment given as a tuple of aligned strings """
+    if isinstance(alignment, EditScript):
+        return alignment
+    aligned_src, aligned_target = alignment
+    return EditScript.from_aligned(aligned_src, aligned_target, gap_char=gap_char)
+
+
+def _column_chars(script, run, index):
+    """Return the source and target characters at an index of a run of an edit script
+
+    Args:
+        script (EditScript): the alignment
+        run (tuple): a run of the script, as iterated by ``EditScript.__iter__()``
+        index (int): index of the column in the run
+
+    Returns:
+        tuple(str, str): the source and target characters (None for a gap)
+    """
+    op, _, src_start, target_start, _ = run
+    src_char = None if op == EDIT_INSERT else script.gt[src_start + index]
+    target_char = None if op == EDIT_DELETE else script.noise[target_start + index]
+    return src_char, target_char
+
+
+def _aligned_substr(text, start, end, gap_blocks, gap_char):
+    """Return the aligned substring of text[start:end] without the leading and trailing spaces and gaps
+
+    Args:
+        text (str): source or target string
+        start (int): start of the substring
+        end (int): end of the substring
+        gap_blocks (list): list of (offset, length) of the gaps before text[offset] in the substring
+        gap_char (str): gap character of the inner gaps
+
+    Returns:
+        str: the aligned substring
+    """
+    substr = text[start:end]
+    stripped = substr.strip(" ")
+    if stripped == "":
+        return ""
+    first = start + len(substr) - len(substr.lstrip(" "))
+    last = first + len(stripped)
+    pieces = []
+    for offset, length in gap_blocks:
+        if first < offset < last:
+            pieces.append(text[first:offset])
+            pieces.append(gap_char * length)
+            first = offset
+    pieces.append(text[first:last])
+    return "".join(pieces)
+
+
+def _update_align_stats(script, runs, align_stats, substitution_dict, gap_char):
+    """Given consecutive runs of an alignment where the two strings differ,
      update the alignment dict and fill in substitution if replacements are found.
      update alignment stats with counts of the edit operation to transform the source
      string to the targes
 
     Args:
-        src (str): source string
-        target (str): target string at the
+        script (EditScript): the alignment of the source and target strings
+        runs (list): the runs of the script that differ, as iterated by ``EditScript.__iter__()``
         align_stats (dict): key-value dictionary that stores the counts of inserts, deletes,
             spacing and replacements
         substitution_dict (dict): store the counts of mapping from one substring to another of
             the replacement edit operation. e.g if 'rm' in source needs to map to 'm' in the target 2
             times this will be { ('rm','m'): 2}
-        gap_char (str): gap character used in alignment
+        gap_char (str): gap character of the inner gaps of the substitutions
     """
-    _log("getting gap stats for", src, target)
     spacing_count = 0
-    for char1, char2 in zip(target, src):
-        if (char1 == gap_char and char2 == " ") or (char1 == " " and char2 == gap_char):
-            spacing_count += 1
-    source_substr = src.strip(f"{gap_char} ")
-    target_substr = target.strip(f"{gap_char} ")
+    src_gaps = []
+    target_gaps = []
+    for op, _, src_start, target_start, length in runs:
+        if op == EDIT_INSERT:
+            spacing_count += script.noise.count(" ", target_start, target_start + length)
+            src_gaps.append((src_start, length))
+        elif op == EDIT_DELETE:
+            spacing_count += script.gt.count(" ", src_start, src_start + length)
+            target_gaps.append((target_start, length))
+    _, _, src_start, target_start, _ = runs[0]
+    op, _, src_end, target_end, length = runs[-1]
+    src_end += 0 if op == EDIT_INSERT else length
+    target_end += 0 if op == EDIT_DELETE else length
+    source_substr = _aligned_substr(script.gt, src_start, src_end, src_gaps, gap_char)
+    target_substr = _aligned_substr(script.noise, target_start, target_end, target_gaps, gap_char)
+    _log("getting gap stats for", source_substr, target_substr)
     if source_substr != "" or target_substr != "":
         if source_substr == "":
             _log("inserting", target_substr)
@@ -88,23 +160,22 @@ def _update_align_stats(src, target, align_stats, substitution_dict, gap_char):
 
 
 def _update_word_stats(
-    aligned_src,
-    aligned_target,
-    gap_char,
-    start,
-    end,
+    script,
+    runs,
+    index,
+    text_bounds,
     matching_chars_count,
     matching_words_count,
     matching_alnum_words_count,
 ):
-    """Given two string segments that align. update the counts of matching words and characters
+    """Given a run of an alignment where the two strings match. update the counts of matching words and characters
 
     Args:
-        aligned_src (str): full source string
-        aligned_target (str): full target string
-        gap_char (str): gap character used in alignment
-        start (int): start position of alignment
-        end (int): end position of alignment
+        script (EditScript): the alignment of the source and target strings
+        runs (list): all the runs of the script, as iterated by ``EditScript.__iter__()``
+        index (int): index of the matching run
+        text_bounds (tuple(int,int,int,int)): start and end of the source string without leading and
+            trailing spaces, then of the target string
         matching_chars_count (int): current count of matching characters
         matching_words_count (int): current count of matching words
         matching_alnum_words_count (int): current count of alphanumeric matching words
@@ -112,12 +183,13 @@ def _update_word_stats(
     Returns:
         tuple(int,int,int): the updated matching_chars_count, matching_words_count, matching_alnum_words_count
     """
-    aligned_part = aligned_src[start:end]
-    matching_chars_count += end - start
-    # aligned_part = seq.strip()
-    _log("aligned", aligned_part, start, end)
-    if len(aligned_src) != len(aligned_target):
-        raise ValueError("alignment strings are of different length")
+    _, _, src_start, target_start, length = runs[index]
+    src_end = src_start + length
+    target_end = target_start + length
+    src_first, src_last, target_first, target_last = text_bounds
+    aligned_part = script.gt[src_start:src_end]
+    matching_chars_count += length
+    _log("aligned", aligned_part, src_start, src_end)
     if aligned_part.strip() != "":
         words = re.split(r"\s+", aligned_part.strip())
         matching_words_count += len(words)
@@ -129,40 +201,32 @@ def _update_word_stats(
                 matching_alnum_words_count -= 1
 
             # handle the edge case for the first and last words as these are at the boundary and need
-            # to be compared with the full string to see if they have space before or after
-
-            if i == 0:
-                if start != 0 and (
-                    aligned_target[start] != " " or aligned_src[start] != " "
-                ):
-                    # if this was the start of the string in the target or source
-                    if not (
-                        aligned_src[:start].replace(gap_char, "").replace(" ", "") == ""
-                        and aligned_target[start - 1] == " "
-                    ) and not (
-                        aligned_target[:start].replace(gap_char, "").replace(" ", "")
-                        == ""
-                        and aligned_src[start - 1] == " "
-                    ):
-                        # beginning word not matching completely
-                        _log("removing first match word from count", word, aligned_part)
-                        matching_words_count -= 1
-                        if re.search(r"\w", word):
-                            matching_alnum_words_count -= 1
-                        continue
-
-            if i == len(words) - 1:
-                if end != len(aligned_target) and (
-                    aligned_target[end] != " " or aligned_src[end] != " "
+            # to be compared with the characters before and after the run to see if they have space before or after
+
+            if i == 0 and index != 0 and aligned_part[0] != " ":
+                previous_run = runs[index - 1]
+                src_char, target_char = _column_chars(script, previous_run, previous_run[-1] - 1)
+                # if this was the start of the string in the target or source
+                if not (
+                    src_start <= src_first and target_char == " "
+                ) and not (
+                    target_start <= target_first and src_char == " "
                 ):
+                    # beginning word not matching completely
+                    _log("removing first match word from count", word, aligned_part)
+                    matching_words_count -= 1
+                    if re.search(r"\w", word):
+                        matching_alnum_words_count -= 1
+                    continue
+
+            if i == len(words) - 1 and index != len(runs) - 1:
+                src_char, target_char = _column_chars(script, runs[index + 1], 0)
+                if target_char != " " or src_char != " ":
                     # this was not the end of the string in the src and not end of string in target
                     if not (
-                        aligned_src[end:].replace(gap_char, "").replace(" ", "") == ""
-                        and aligned_target[end] == " "
+                        src_end >= src_last and target_char == " "
                     ) and not (
-                        aligned_target[end:].replace(gap_char, "").replace(" ", "")
-                        == ""
-                        and aligned_src[end] == " "
+                        target_end >= target_last and src_char == " "
                     ):
                         # last word not matching completely
                         _log("removing last match word from count", word, aligned_part)
@@ -180,10 +244,11 @@ def _get_align_stats(alignment, src_string, target, gap_char):
     transform the source string to the target string
 
     Args:
-        alignment (tuple(str, str)): the result of calling align on the two strings
+        alignment (EditScript or tuple(str, str)): the edit script of the alignment of the
+            two strings, or the result of calling align on the two strings
         src_source (str): the source string
         target (str) : the target string
-        gap_char (str) : the gap character used in alignment
+        gap_char (str) : the gap character used in alignment, and in the substitutions
 
     Raises:
         ValueError: if any of the aligned string are empty
@@ -192,7 +257,7 @@ def _get_align_stats(alignment, src_string, target, gap_char):
         tuple(dict, dict): align stats dict, substitution mappings dict
     """
 
-    aligned_src, aligned_target = alignment
+    script = _as_edit_script(alignment, gap_char)
 
     if src_string.strip() == "" or target.strip() == "":
         raise ValueError("one of the input strings is empty")
@@ -220,97 +285,47 @@ def _get_align_stats(alignment, src_string, target, gap_char):
         "total_words": word_count,
         "total_alnum_words": alnum_words_count,
     }
-    start = 0
+    # the strings without the leading and trailing spaces
+    text_bounds = (
+        len(script.gt) - len(script.gt.lstrip(" ")),
+        len(script.gt.rstrip(" ")),
+        len(script.noise) - len(script.noise.lstrip(" ")),
+        len(script.noise.rstrip(" ")),
+    )
 
     _log("######### Alignment ############")
-    _log(aligned_src)
-    _log(aligned_target)
+    _log(script)
     _log("################################")
 
-    gap_start = None
-    for i, (char_1, char_2) in enumerate(zip(aligned_src, aligned_target)):
-        if char_1 != char_2:
-            # since characters don't match here start:i is a substring of the string that align
+    runs = list(script)
+    gap_runs = []
+    for index, run in enumerate(runs):
+        if run[0] == EDIT_MATCH:
+            if gap_runs:
+                # the runs since the previous match are a substring of the characters that didnt align
+                # handle this gap alignment by calling _update_align_stats
+                _update_align_stats(script, gap_runs, align_stats, substitution_dict, gap_char)
+                gap_runs = []
             # since this substring aligns, simple count the number of matching words and chars in and update
             # the word stats
-            end = i
-            _log(
-                "sequences",
-                aligned_src[start:end],
-                aligned_target[start:end],
-                start,
-                end,
-            )
-            assert aligned_src[start:end] == aligned_target[start:end]
             (
                 matching_chars_count,
                 matching_words_count,
                 matching_alnum_words_count,
             ) = _update_word_stats(
-                aligned_src,
-                aligned_target,
-                gap_char,
-                start,
-                end,
+                script,
+                runs,
+                index,
+                text_bounds,
                 matching_chars_count,
                 matching_words_count,
                 matching_alnum_words_count,
             )
-            start = end + 1
-            if gap_start is None:
-                gap_start = end
         else:
-            gap_end = i
-            if gap_start is not None:
-                # since characters now match  gap_start:i contains a substring of the characters that didnt align before
-                # handle this gap alignment by calling _update_align_stats
-                _log(
-                    "gap",
-                    aligned_src[gap_start:gap_end],
-                    aligned_target[gap_start:gap_end],
-                    gap_start,
-                    gap_end,
-                )
-                _update_align_stats(
-                    aligned_src[gap_start:gap_end],
-                    aligned_target[gap_start:gap_end],
-                    align_stats,
-                    substitution_dict,
-                    gap_char,
-                )
-            gap_start = None
-
-    # Now compare any left overs string segments from the for loop
-    if gap_start is not None:
+            gap_runs.append(run)
+    if gap_runs:
         # handle last alignment gap
-        _log("last gap", aligned_src[gap_start:], aligned_target[gap_start:])
-        _update_align_stats(
-            aligned_src[gap_start:],
-            aligned_target[gap_start:],
-            align_stats,
-            substitution_dict,
-            gap_char,
-        )
-    else:
-        # handle last aligned substring
-        seq = aligned_src[start:]
-        aligned_part = seq.strip()
-        end = len(aligned_src)
-        _log("last aligned", aligned_part)
-        (
-            matching_chars_count,
-            matching_words_count,
-            matching_alnum_words_count,
-        ) = _update_word_stats(
-            aligned_src,
-            aligned_target,
-            gap_char,
-            start,
-            end,
-            matching_chars_count,
-            matching_words_count,
-            matching_alnum_words_count,
-        )
+        _update_align_stats(script, gap_runs, align_stats, substitution_dict, gap_char)
 
     align_stats["matching_chars"] = matching_chars_count
     align_stats["matching_alnum_words"] = matching_alnum_words_count
@@ -321,24 +336,26 @@ def _get_align_stats(alignment, src_string, target, gap_char):
     return align_stats, substitution_dict
 
 
-def get_editops_stats(alignment, gap_char):
+def get_editops_stats(alignment, gap_char=GAP_CHAR):
     """Get stats for character level edit operations that need to be done to
     transform the source string to the target string. Inputs must not be empty
     and must be the result of calling the runing the align function.
 
     Args:
-        alignment (tuple(str, str)): the results from the string alignment biopy function
-        gap_char (str): gap character used in alignment
+        alignment (EditScript or tuple(str, str)): the edit script of the alignment,
+            or the results from the string alignment biopy function
+        gap_char (str, optional): gap character used in the aligned strings. Defaults to GAP_CHAR.
 
     Raises:
         ValueError: If any of the string in the alignment are empty
 
     Returns:
-        [type]: [description]
+        tuple(dict, dict): the counts of the edit operations, and the edit operations
+            by position in the aligned strings
     """
 
-    aligned_src, aligned_target = alignment
-    if aligned_src == "" or aligned_target == "":
+    script = _as_edit_script(alignment, gap_char)
+    if len(script) == 0:
         raise ValueError("one of the input strings is empty")
     stats = {
         "edit_insert": 0,
@@ -348,37 +365,37 @@ def get_editops_stats(alignment, gap_char):
         "edit_delete_spacing": 0,
     }
     actions = {}
-    for i, (char_1, char_2) in enumerate(zip(aligned_src, aligned_target)):
-        if LOG_LEVEL > 1:
-            _log(char_1, char_2)
-        if char_1 == gap_char:
-            # insert
-            if char_2 == " ":
-                stats["edit_insert_spacing"] += 1
-            else:
-                stats["edit_insert"] += 1
-            actions[i] = ("I", char_2)
-        elif char_2 == gap_char:
-            # delete
-            if char_1 == " ":
-                stats["edit_delete_spacing"] += 1
-            else:
-                stats["edit_delete"] += 1
-            actions[i] = "D"
-        elif char_2 != char_1:
-            stats["edit_replace"] += 1
-            actions[i] = ("R", char_2)
+    for op, column, src_start, target_start, length in script:
+        if op == EDIT_INSERT:
+            inserted = script.noise[target_start:target_start + length]
+            spacing_count = inserted.count(" ")
+            stats["edit_insert_spacing"] += spacing_count
+            stats["edit_insert"] += length - spacing_count
+            for i, char in enumerate(inserted, column):
+                actions[i] = ("I", char)
+        elif op == EDIT_DELETE:
+            spacing_count = script.gt.count(" ", src_start, src_start + length)
+            stats["edit_delete_spacing"] += spacing_count
+            stats["edit_delete"] += length - spacing_count
+            for i in range(column, column + length):
+                actions[i] = "D"
+        elif op == EDIT_REPLACE:
+            stats["edit_replace"] += length
+            for i, char in enumerate(script.noise[target_start:target_start + length], column):
+                actions[i] = ("R", char)
     return stats, actions
 
 
-def get_align_stats(alignment, src_string, target, gap_char):
+def get_align_stats(alignment, src_string, target, gap_char=GAP_CHAR):
     """Get alignment stats
 
     Args:
-        alignment (tuple(str,str)): the result of calling the align function
+        alignment (EditScript or tuple(str,str)): the edit script of the alignment,
+            or the result of calling the align function
         src_string (str): the original source string
         target (str): the original target string
-        gap_char (str): the gap character used in alignment
+        gap_char (str, optional): the gap character used in the aligned strings, and
+            in the substitutions. Defaults to GAP_CHAR.
 
     Raises:
         ValueError: if any of the strings are empty
@@ -412,17 +429,18 @@ def get_stats(target, src_string):
     Returns:
        tuple(str, str): One dict containing the edit and align stats, another dict containing the substitutions
     """
-    gap_char_candidates, input_char_set = _find_gap_char_candidates(
-        [src_string], [target]
-    )
-    gap_char = (
-        GAP_CHAR if GAP_CHAR in gap_char_candidates else gap_char_candidates.pop()
-    )
-    alignment = align_w_anchor(src_string, target, gap_char=gap_char)
-    align_stats, substitution_dict = get_align_stats(
-        alignment, src_string, target, gap_char
-    )
-    edit_stats, actions = get_editops_stats(alignment, gap_char)
+    # The substitutions are rendered with a gap char absent from the input
+    gap_char_candidates, _ = _find_gap_char_candidates([src_string], [target])
+    if GAP_CHAR in gap_char_candidates:
+        gap_char = GAP_CHAR
+    elif gap_char_candidates:
+        gap_char = gap_char_candidates.pop()
+    else:
+        gap_char = _free_gap_char(src_string, target)
+    # (reuse the alignment of the same texts if an alignment cache is set)
+    script = cached_edit_script(src_string, target)
+    align_stats, substitution_dict = get_align_stats(script, src_string, target, gap_char)
+    edit_stats, actions = get_editops_stats(script, gap_char)
     _log("alignment", align_stats)
     return {**edit_stats, **align_stats}, substitution_dict, actions
 
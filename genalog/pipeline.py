@@ -4,7 +4,9 @@
 # Licensed under the MIT License.
 # ---------------------------------------------------------
 
+import collections
 import concurrent.futures
+import itertools
 import os
 import timeit
 from json import JSONEncoder
@@ -14,8 +16,14 @@ from tqdm import tqdm
 
 from genalog.degradation.degrader import Degrader, ImageState
 from genalog.generation.content import CompositeContent, ContentType
-from genalog.generation.document import DEFAULT_STYLE_COMBINATION
-from genalog.generation.document import DocumentGenerator
+from genalog.generation.document import DEFAULT_DOCUMENT_STYLE, DEFAULT_STYLE_COMBINATION
+from genalog.generation.document import Document, DocumentGenerator
+from genalog.generation.image_writer import ImageWriter
+from genalog.telemetry import BatchTelemetry, PipelineMetrics
+
+# Number of rasters kept for reuse by AnalogDocumentGeneration.generate_all_styles(),
+# the least recently used raster is dropped first
+MAX_CACHED_RASTERS = 4
 
 
 class ImageStateEncoder(JSONEncoder):
@@ -34,6 +42,8 @@ class AnalogDocumentGeneration(object):
         self.doc_generator.set_styles_to_generate(styles)
         self.degrader = Degrader(degradations)
 
+        self.template_path = template_path
+        self.styles = styles
         self.resolution = resolution
 
     def list_templates(self):
@@ -45,17 +55,20 @@ class AnalogDocumentGeneration(object):
         return self.doc_generator.template_list
 
     # Fix: rename to generate_sample()
-    # TODO: dd another method called generate_all_styles()
-    def generate_img(self, full_text_path, template, target_folder=None):
+    def generate_img(self, full_text_path, template, target_folder=None, writer=None, telemetry=None):
         """Generate a image with a sample style given a text document
 
         **NOTE**: This does not generate all possible style combinations.
+        See ``AnalogDocumentGeneration.generate_all_styles()``.
 
         Arguments:
             full_text_path (str) : full filepath of a text document (ex: "/dataset/doc.txt").
             template (str) : name of html template to generate document from. (ex: "text_block.html.jinja")
             target_folder (str, optional) : folder path in which the generated images are stored. Defaults to None.
-            resolution (int, optional) : resolution in dpi. Defaults to 300.
+            writer (ImageWriter, optional) : if set, the image is queued to this writer instead
+                of being written synchronously to ``target_folder``. Defaults to None.
+            telemetry (genalog.telemetry.BatchTelemetry, optional) : records the number of
+                documents and pages and the time spent in each stage. Defaults to None.
 
         Raises:
             RuntimeError: when cannot write to disk at specified path
@@ -63,33 +76,165 @@ class AnalogDocumentGeneration(object):
         Returns:
             numpy.ndarray: synthetic image
         """
-        with open(full_text_path, "r", encoding="utf8") as f:  # read file
-            text = f.read()
-        content = CompositeContent([text], [ContentType.PARAGRAPH])
-
-        generator = self.doc_generator.create_generator(content, [template])
-        # Generate the image
-        try:
-            doc = next(generator)  # NOTE: this does not exhaust all of the style combinations in the generator
-        except StopIteration:
-            return None
-        src = doc.render_array(resolution=self.resolution, channel="GRAYSCALE")
+        if telemetry is None:
+            telemetry = BatchTelemetry()
+        with telemetry.time("layout"):
+            content = _read_content(full_text_path)
+            generator = self.doc_generator.create_generator(content, [template])
+            # Generate the image
+            try:
+                doc = next(generator)  # NOTE: this does not exhaust all of the style combinations in the generator
+            except StopIteration:
+                return None
+        telemetry.docs += 1
+        telemetry.pages += doc.num_pages
+        with telemetry.time("raster"):
+            src = doc.render_array(resolution=self.resolution, channel="GRAYSCALE")
         # Degrade the image
-        dst = self.degrader.apply_effects(src)
+        with telemetry.time("degrade"):
+            dst = self.degrader.apply_effects(src)
 
-        if not target_folder:
+        text_filename = os.path.basename(full_text_path)
+        if writer:
+            # encode and save it onto disk in the background
+            writer.submit(dst, text_filename.replace(".txt", ""), telemetry=telemetry)
+            return
+        elif not target_folder:
             # return the analog document as numpy.ndarray
             return dst
         else:
             # save it onto disk
-            text_filename = os.path.basename(full_text_path)
             img_filename = text_filename.replace(".txt", ".png")
             img_dst_path = os.path.join(target_folder, "img", img_filename)
             _setup_folder(target_folder)
-            if not cv2.imwrite(img_dst_path, dst):
-                raise RuntimeError(f"Could not write to path {img_dst_path}")
+            with telemetry.time("write"):
+                if not cv2.imwrite(img_dst_path, dst):
+                    raise RuntimeError(f"Could not write to path {img_dst_path}")
             return
 
+    def generate_all_styles(self, full_text_path, template, executor=None, chunk_size=1, max_in_flight=None):
+        """Generate an image for every style combination given a text document
+
+        The content is read once and the html of each style combination is compiled once.
+        Combinations compiled into the same html are laid out once, and combinations with the same
+        layout (see ``Document.layout_fingerprint()``) are rasterized once: the last
+        ``MAX_CACHED_RASTERS`` rasters are kept for reuse. Each image is degraded separately.
+
+        Arguments:
+            full_text_path (str) : full filepath of a text document (ex: "/dataset/doc.txt").
+            template (str) : name of html template to generate document from. (ex: "text_block.html.jinja")
+            executor (concurrent.futures.ProcessPoolExecutor, optional) : executor created with
+                ``AnalogDocumentGeneration.create_executor()``. If set, the combinations are laid out
+                in parallel in the worker processes, each keeping its own rasters for reuse
+                across tasks. Defaults to None (lay out in this process).
+            chunk_size (int, optional) : number of distinct html per task sent to the executor.
+                All the combinations compiled into the same html go to the same task. Defaults to 1.
+            max_in_flight (int, optional) : maximum number of submitted tasks not yet yielded.
+                Defaults to twice the number of processors.
+
+        Yields:
+            tuple : a ``(style_key, image)`` pair where ``style_key`` is a tuple of ``(style_name, value)``
+            pairs (ex: ``(("font_family", "Times"), ("font_size", "12px"))``) and
+            ``image`` is the degraded image {numpy.ndarray}. The combinations compiled into the same
+            html are yielded one after the other, in order of their first combination
+            in ``expand_style_combinations()``
+        """
+        styles = self.doc_generator.styles_to_generate
+        content = _read_content(full_text_path)
+        groups = self._group_by_html(content, template, styles)
+        if executor is None:
+            yield from self._generate_styles(content, template, groups)
+            return
+        if not max_in_flight:
+            max_in_flight = 2 * (os.cpu_count() or 1)
+        # Submit the tasks in order and yield their results as soon as they are done, in order
+        in_flight = collections.deque()
+        for chunk in _divide_batches(groups, chunk_size):
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().result()
+            in_flight.append(executor.submit(_generate_styles_chunk, (content, template, chunk)))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+    def create_executor(self, template, max_workers=None):
+        """Create a process pool whose workers hold a copy of this generator,
+        for ``AnalogDocumentGeneration.generate_all_styles()``
+
+        Arguments:
+            template (str) : name of html template to compile in each worker
+            max_workers (int, optional) : number of processes. Defaults to the number of processors.
+
+        Returns:
+            concurrent.futures.ProcessPoolExecutor : the process pool
+        """
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(
+                None, self.styles, self.degrader.effects_to_apply, template,
+                self.resolution, self.template_path, None, None,
+            ),
+        )
+
+    def _group_by_html(self, content, template, styles):
+        """Compile the html of each style combination and group the combinations with the same html
+
+        Returns:
+            list : ``(html, styles)`` pairs, in order of the first combination of each group
+        """
+        template_obj = self.doc_generator.get_template(template)
+        groups = {}
+        for style in styles:
+            html = template_obj.render(content=content, **{**DEFAULT_DOCUMENT_STYLE, **style})
+            groups.setdefault(html, []).append(style)
+        return list(groups.items())
+
+    def _generate_styles(self, content, template, groups, rasters=None):
+        """Generate the degraded images of groups of style combinations compiled into the same html
+        (see ``AnalogDocumentGeneration._group_by_html()``), sharing the layout and raster work
+
+        Arguments:
+            rasters (collections.OrderedDict, optional) : layout fingerprint -> rendered image,
+                least recently used first. Kept across calls by the worker processes.
+                Defaults to None (a new cache for this call).
+
+        Yields:
+            tuple : a ``(style_key, image)`` pair
+        """
+        template_obj = self.doc_generator.get_template(template)
+        if rasters is None:
+            rasters = collections.OrderedDict()
+        for html, styles in groups:
+            doc = Document.from_compiled_html(content, template_obj, html, **styles[0])
+            fingerprint = doc.layout_fingerprint()
+            if fingerprint in rasters:
+                rasters.move_to_end(fingerprint)
+                raster = rasters[fingerprint]
+            else:
+                raster = doc.render_array(resolution=self.resolution, channel="GRAYSCALE")
+                if fingerprint is not None:
+                    rasters[fingerprint] = raster
+                    if len(rasters) > MAX_CACHED_RASTERS:
+                        rasters.popitem(last=False)
+            del doc  # the laid out document is not needed past the raster
+            for style in styles:
+                # Degrader does not modify the shared raster
+                yield tuple(style.items()), self.degrader.apply_effects(raster)
+
+
+def _read_content(full_text_path):
+    with open(full_text_path, "r", encoding="utf8") as f:  # read file
+        text = f.read()
+    return CompositeContent([text], [ContentType.PARAGRAPH])
+
+
+def _generate_styles_chunk(args):
+    """Generate the images of a chunk of ``(html, styles)`` groups in a worker process initialized by _init_worker()"""
+    content, template, groups = args
+    # The rasters are shared by all the tasks of the worker: the groups of a document
+    # with the same layout but different html are rasterized once per worker
+    return list(_worker_generator._generate_styles(content, template, groups, rasters=_worker_rasters))
+
 
 def _divide_batches(a, batch_size):
     for i in range(0, len(a), batch_size):
@@ -100,56 +245,185 @@ def _setup_folder(output_folder):
     os.makedirs(os.path.join(output_folder, "img"), exist_ok=True)
 
 
-def batch_img_generate(args):
-    input_files, output_folder, styles, degradations, template, resolution = args
-    generator = AnalogDocumentGeneration(
-        styles=styles, degradations=degradations, resolution=resolution
+# Per-process state of the workers in generate_dataset_multiprocess(), set by _init_worker()
+_worker_generator = None
+_worker_template = None
+_worker_writer = None
+_worker_rasters = None
+
+
+def _init_worker(
+        output_folder, styles, degradations, template, resolution,
+        template_path=None, image_format="png", compression=None):
+    """Initialize a worker process once: the document generator (with its template
+    environment and compiled template), the degrader and the image writer (if ``output_folder``
+    is set) are reused for all the batches processed by the worker.
+    """
+    global _worker_generator, _worker_template, _worker_writer, _worker_rasters
+    _worker_generator = AnalogDocumentGeneration(
+        template_path=template_path, styles=styles, degradations=degradations, resolution=resolution
     )
+    _worker_generator.doc_generator.get_template(template)  # compile the template once
+    _worker_template = template
+    _worker_rasters = collections.OrderedDict()
+    if output_folder:
+        _worker_writer = ImageWriter(output_folder, image_format=image_format, compression=compression)
+
+
+def batch_img_generate(input_files):
+    """Generate the images of a batch of text files in a worker process initialized by _init_worker()
+
+    Arguments:
+        input_files (list) : a list of text filepaths
+
+    Returns:
+        tuple : the input filepaths and the measurements of the batch (see ``BatchTelemetry.to_dict()``)
+    """
+    telemetry = BatchTelemetry()
+    start = timeit.default_timer()
     for file in input_files:
-        generator.generate_img(file, template, target_folder=output_folder)
-
-
-def _set_batch_generate_args(
-    file_batches, output_folder, styles, degradations, template, resolution
-):
-    return list(
-        map(
-            lambda batch: (
-                batch,
-                output_folder,
-                styles,
-                degradations,
-                template,
-                resolution,
-            ),
-            file_batches,
-        )
-    )
+        _worker_generator.generate_img(file, _worker_template, writer=_worker_writer, telemetry=telemetry)
+    if _worker_writer is not None:
+        _worker_writer.flush()  # the images of the batch are on disk when the batch is reported done
+    telemetry.busy_seconds = timeit.default_timer() - start
+    return input_files, telemetry.to_dict()
 
 
-def generate_dataset_multiprocess(
+def _iter_batches(iterable, batch_size):
+    """Lazily group the items of any iterable into lists of ``batch_size`` items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_text_files(input_folder, ext=".txt"):
+    """Lazily walk a folder (and its sub-folders) for text files
+
+    Arguments:
+        input_folder (str) : folder to search in
+        ext (str, optional) : file extension of the text files. Defaults to ".txt".
+
+    Yields:
+        str : filepath of a text file
+    """
+    for dirpath, _, filenames in os.walk(input_folder):
+        for filename in filenames:
+            if filename.endswith(ext):
+                yield os.path.join(dirpath, filename)
+
+
+def iter_manifest(manifest_path):
+    """Lazily read the filepaths listed in a manifest file, one filepath per line
+
+    Arguments:
+        manifest_path (str) : filepath of the manifest
+
+    Yields:
+        str : filepath of a text file
+    """
+    with open(manifest_path, "r", encoding="utf8") as f:
+        for line in f:
+            path = line.strip()
+            if path:
+                yield path
+
+
+def generate_dataset_streaming(
         input_text_files, output_folder,
         styles, degradations, template,
-        resolution=300, batch_size=25):
+        resolution=300, batch_size=25, max_workers=None, max_in_flight=None,
+        image_format="png", compression=None, callbacks=None, total_docs=None):
+    """Generate the images of a stream of text files with a bounded number of batches in flight.
+
+    The input filepaths are consumed lazily: at most ``max_in_flight`` batches are
+    submitted to the process pool at any time, so neither the filepaths nor the futures
+    of the whole dataset are held in memory.
+
+    Arguments:
+        input_text_files (iterable) : any iterable of text filepaths,
+            ex: ``iter_text_files(folder)`` or ``iter_manifest(manifest_path)``
+        output_folder (str) : folder in which the generated images are stored (under "img/")
+        styles (dict) : style combinations. See ``DocumentGenerator.set_styles_to_generate()``
+        degradations (list) : degradation effects. See ``Degrader``
+        template (str) : name of html template to generate document from. (ex: "text_block.html.jinja")
+        resolution (int, optional) : resolution in dpi. Defaults to 300.
+        batch_size (int, optional) : number of text files per task. Defaults to 25.
+        max_workers (int, optional) : number of processes. Defaults to the number of processors.
+        max_in_flight (int, optional) : maximum number of submitted batches not yet consumed.
+            Defaults to twice the number of processes.
+        image_format (str, optional) : "png", "webp" or "raw". See ``ImageWriter``. Defaults to "png".
+        compression (int, optional) : PNG compression level (0-9) or WebP quality (1-100).
+            Defaults to None (OpenCV default).
+        callbacks (list, optional) : callables called with a metrics snapshot after each batch,
+            ex: ``genalog.telemetry.JsonLinesExporter``. See ``genalog.telemetry``. Defaults to None.
+        total_docs (int, optional) : number of text files, to estimate the remaining time. Defaults to None.
+
+    Yields:
+        list : the filepaths of a generated batch, in order of completion
+    """
     _setup_folder(output_folder)
+    if not max_in_flight:
+        max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    batches = _iter_batches(input_text_files, batch_size)
+    metrics = PipelineMetrics(total_docs=total_docs)
+
+    def collect(future, queue_depth):
+        files, batch_telemetry = future.result()
+        metrics.update(batch_telemetry, queue_depth=queue_depth)
+        if callbacks:
+            snapshot = metrics.snapshot()
+            for callback in callbacks:
+                callback(snapshot)
+        return files
+
+    # Styles and degradations are sent once per worker, the tasks only carry the filepaths
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(
+            output_folder, styles, degradations, template, resolution,
+            None, image_format, compression,
+        ),
+    ) as executor:
+        in_flight = set()
+        for batch in batches:
+            if len(in_flight) >= max_in_flight:
+                # Wait for a slot before reading the next batch from the input
+                done, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield collect(future, len(in_flight))
+            in_flight.add(executor.submit(batch_img_generate, batch))
+        for remaining, future in enumerate(concurrent.futures.as_completed(in_flight)):
+            yield collect(future, len(in_flight) - remaining - 1)
+
+
+def generate_dataset_multiprocess(
+        input_text_files, output_folder,
+        styles, degradations, template,
+        resolution=300, batch_size=25, image_format="png", compression=None, callbacks=None):
     print(f"Storing generated images in {output_folder}")
 
-    batches = list(_divide_batches(input_text_files, batch_size))
+    num_batches = -(-len(input_text_files) // batch_size)  # ceiling division
     print(
-        f"Splitting {len(input_text_files)} documents into {len(batches)} batches with size {batch_size}"
-    )
-
-    batch_img_generate_args = _set_batch_generate_args(
-        batches, output_folder, styles, degradations, template, resolution
+        f"Splitting {len(input_text_files)} documents into {num_batches} batches with size {batch_size}"
     )
 
     # Default to the number of processors on the machine
     start_time = timeit.default_timer()
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        batch_iterator = executor.map(batch_img_generate, batch_img_generate_args)
-        for _ in tqdm(
-            batch_iterator, total=len(batch_img_generate_args)
-        ):  # wrapping tqdm for progress report
-            pass
+    batch_iterator = generate_dataset_streaming(
+        input_text_files, output_folder, styles, degradations, template,
+        resolution=resolution, batch_size=batch_size,
+        image_format=image_format, compression=compression,
+        callbacks=callbacks, total_docs=len(input_text_files),
+    )
+    for _ in tqdm(
+        batch_iterator, total=num_batches
+    ):  # wrapping tqdm for progress report
+        pass
     elapsed = timeit.default_timer() - start_time
     print(f"Time to generate {len(input_text_files)} documents: {elapsed:.3f} sec")
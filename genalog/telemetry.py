@@ -0,0 +1,191 @@
+# ---------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+# ---------------------------------------------------------
+
+"""Progress and throughput telemetry of the dataset generation pipeline.
+
+The workers time each stage of the generation of a document in a ``BatchTelemetry``.
+``PipelineMetrics`` aggregates the batches in the main process and produces a
+snapshot after each batch::
+
+    {
+        "timestamp": 1600000000.0,          # unix time of the snapshot
+        "elapsed_sec": 12.5,
+        "batches": 4, "docs": 100, "pages": 130,
+        "total_docs": 1000,                 # None if unknown
+        "docs_per_sec": 8.0, "pages_per_sec": 10.4,
+        "eta_sec": 112.5,                   # None if the total is unknown
+        "queue_depth": 8,                   # batches submitted and not yet done
+        "worker_utilization": {"1234": 0.97, ...},  # busy time / elapsed time, per worker pid
+        "stage_latency_sec": {"layout": 0.05, "raster": 0.04, "degrade": 0.01, "write": 0.02},
+    }
+
+The snapshots are passed to callbacks, ex: the exporters ``JsonLinesExporter`` and
+``PrometheusExporter`` which let a local tool watch long runs.
+"""
+import json
+import os
+import threading
+import time
+import timeit
+from contextlib import contextmanager
+
+# Stages of the generation of a document, in order
+STAGES = ("layout", "raster", "degrade", "write")
+
+
+class BatchTelemetry:
+    """ Measurements of a batch of documents, collected in a worker process """
+
+    def __init__(self):
+        self.worker = os.getpid()
+        self.docs = 0
+        self.pages = 0
+        self.busy_seconds = 0.0
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        # Writes are timed in the writer threads
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """ Add the duration (in seconds) of a stage """
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    @contextmanager
+    def time(self, stage):
+        """ Time the enclosed block as the given stage """
+        start = timeit.default_timer()
+        try:
+            yield
+        finally:
+            self.add(stage, timeit.default_timer() - start)
+
+    def to_dict(self):
+        """ Return the measurements as a picklable dictionary """
+        with self._lock:
+            return {
+                "worker": self.worker,
+                "docs": self.docs,
+                "pages": self.pages,
+                "busy_seconds": self.busy_seconds,
+                "stage_seconds": dict(self.stage_seconds),
+            }
+
+
+class PipelineMetrics:
+    """ Aggregate the batch measurements of a pipeline run into snapshots """
+
+    def __init__(self, total_docs=None):
+        """
+        Arguments:
+            total_docs (int, optional) : number of documents in the run, to estimate
+                                         the remaining time. Defaults to None (unknown).
+        """
+        self.total_docs = total_docs
+        self.start_time = timeit.default_timer()
+        self.batches = 0
+        self.docs = 0
+        self.pages = 0
+        self.queue_depth = 0
+        self.worker_busy_seconds = {}
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+
+    def update(self, batch, queue_depth=0):
+        """Add the measurements of a finished batch
+
+        Arguments:
+            batch (dict) : measurements from ``BatchTelemetry.to_dict()``
+            queue_depth (int, optional) : number of batches still in flight. Defaults to 0.
+        """
+        self.batches += 1
+        self.docs += batch["docs"]
+        self.pages += batch["pages"]
+        self.queue_depth = queue_depth
+        worker = str(batch["worker"])
+        self.worker_busy_seconds[worker] = self.worker_busy_seconds.get(worker, 0.0) + batch["busy_seconds"]
+        for stage, seconds in batch["stage_seconds"].items():
+            self.stage_seconds[stage] += seconds
+
+    def snapshot(self):
+        """ Return the current metrics as a dictionary (see the module docstring) """
+        elapsed = max(timeit.default_timer() - self.start_time, 1e-9)
+        docs_per_sec = self.docs / elapsed
+        eta = None
+        if self.total_docs is not None and docs_per_sec > 0:
+            eta = max(self.total_docs - self.docs, 0) / docs_per_sec
+        return {
+            "timestamp": time.time(),
+            "elapsed_sec": elapsed,
+            "batches": self.batches,
+            "docs": self.docs,
+            "pages": self.pages,
+            "total_docs": self.total_docs,
+            "docs_per_sec": docs_per_sec,
+            "pages_per_sec": self.pages / elapsed,
+            "eta_sec": eta,
+            "queue_depth": self.queue_depth,
+            "worker_utilization": {
+                worker: min(busy / elapsed, 1.0) for worker, busy in self.worker_busy_seconds.items()
+            },
+            "stage_latency_sec": {
+                stage: seconds / self.docs if self.docs else 0.0
+                for stage, seconds in self.stage_seconds.items()
+            },
+        }
+
+
+class JsonLinesExporter:
+    """ Callback appending each snapshot as a line of JSON to a file """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, snapshot):
+        with open(self.path, "a", encoding="utf8") as f:
+            f.write(json.dumps(snapshot) + "\n")
+
+
+class PrometheusExporter:
+    """Callback writing the latest snapshot to a file in the Prometheus text format,
+    ex: for the textfile collector of the node exporter.
+    The file is replaced atomically, so a reader never sees a partial snapshot.
+    """
+
+    def __init__(self, path, prefix="genalog"):
+        self.path = path
+        self.prefix = prefix
+
+    def format(self, snapshot):
+        """ Format a snapshot in the Prometheus text format """
+        lines = []
+
+        def add(name, metric_type, help_text, samples):
+            name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        add("docs_total", "counter", "Documents generated.", [("", snapshot["docs"])])
+        add("pages_total", "counter", "Pages generated.", [("", snapshot["pages"])])
+        add("batches_total", "counter", "Batches generated.", [("", snapshot["batches"])])
+        add("elapsed_seconds", "gauge", "Time since the start of the run.", [("", snapshot["elapsed_sec"])])
+        add("docs_per_second", "gauge", "Document throughput.", [("", snapshot["docs_per_sec"])])
+        add("pages_per_second", "gauge", "Page throughput.", [("", snapshot["pages_per_sec"])])
+        if snapshot["eta_sec"] is not None:
+            add("eta_seconds", "gauge", "Estimated time to completion.", [("", snapshot["eta_sec"])])
+        add("queue_depth", "gauge", "Batches submitted and not yet done.", [("", snapshot["queue_depth"])])
+        add("worker_utilization", "gauge", "Fraction of the elapsed time a worker was busy.", [
+            (f'{{worker="{worker}"}}', value) for worker, value in snapshot["worker_utilization"].items()
+        ])
+        add("stage_latency_seconds", "gauge", "Mean time per document spent in a stage.", [
+            (f'{{stage="{stage}"}}', value) for stage, value in snapshot["stage_latency_sec"].items()
+        ])
+        return "\n".join(lines) + "\n"
+
+    def __call__(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            f.write(self.format(snapshot))
+        os.replace(tmp_path, self.path)
@@ -3,11 +3,13 @@
 # Licensed under the MIT License.
 # ---------------------------------------------------------
 
+import itertools
 import re
 
+import numpy as np
 from Bio import pairwise2
 
-from genalog.text.preprocess import _is_spacing, tokenize
+from genalog.text.preprocess import tokenize
 
 # Configuration params for global sequence alignment algorithm (Needleman-Wunsch)
 MATCH_REWARD = 1
@@ -17,12 +19,548 @@ MISMATCH_PENALTY = -0.5
 GAP_CHAR = "@"
 ONE_ALIGNMENT_ONLY = False
 SPACE_MISMATCH_PENALTY = 0.1
+# Scores are scaled to integers so that ties are compared exactly
+# (Bio.pairwise2 compares the scores with a precision of 1/1000)
+SCORE_SCALE = 1000
+# Maximum number of tracebacks recovered from the traceback matrix (as in Bio.pairwise2)
+MAX_ALIGNMENTS = 1000
+
+# Directions in the traceback matrix (bit flags, as in Bio.pairwise2)
+_GAP_IN_A = 1  # open a gap in the first sequence
+_MATCH = 2  # align a character of each sequence (match or mismatch)
+_GAP_IN_B = 4  # open a gap in the second sequence
+_GAP_IN_A_EXTEND = 8
+_GAP_IN_B_EXTEND = 16
+# Traceback directions of the transposed matrix (the sequences are swapped)
+_SWAPPED_DIRECTIONS = np.array([
+    (d & _MATCH) | (d & _GAP_IN_A) << 2 | (d & _GAP_IN_B) >> 2
+    | (d & _GAP_IN_A_EXTEND) << 1 | (d & _GAP_IN_B_EXTEND) >> 1
+    for d in range(32)
+], dtype=np.uint8)
+# Number of rows of the traceback matrix filled at once
+_TRACE_BLOCK_ROWS = 256
+# Half-width of the first band of diagonals in banded alignments
+INITIAL_BAND = 8
+# Shorter strings are aligned on the full matrices, the band does not pay off
+MIN_BANDED_LENGTH = 200
+# Score of the cells outside of a band of diagonals
+_OUTSIDE = -(2 ** 40)
+# Segments with more (gt, noise) character pairs are split by ``align_linear()``
+LINEAR_MEMORY_BASE_CELLS = 2 ** 18
+# Edit operations of an ``EditScript`` (to transform the ground truth into the noise)
+EDIT_MATCH = "="  # the characters of both strings are equal
+EDIT_REPLACE = "X"  # the characters of both strings differ
+EDIT_INSERT = "I"  # a character of the noise string only (gap in the ground truth)
+EDIT_DELETE = "D"  # a character of the ground truth only (gap in the noise)
+# First code point tried as gap char by ``_free_gap_char()`` (Unicode private use area)
+_PRIVATE_USE_START = 0xE000
+# Whether each code point is a spacing of ``preprocess.tokenize()`` (str.split()),
+# the last entry stands for all the larger code points (U+3000 is the last unicode space)
+_IS_SPACE = np.array([chr(code_point).isspace() for code_point in range(0x3002)])
+
+
+def _code_points(s):
+    """ Return the unicode code points of a string as a numpy array """
+    return np.frombuffer(s.encode("utf-32-le"), dtype=np.uint32)
+
+
+def _scaled_scores(gt, noise, match_reward, mismatch_pen, gap_pen, gap_ext_pen, space_mismatch_penalty):
+    """Scale the scoring parameters to integers (see ``SCORE_SCALE``) and build the
+    substitution matrix of two strings
 
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, int, int) : the symbol of each gt character, the
+        substitution scores of each symbol against each noise character, the scaled
+        gap penalty and the scaled gap extension penalty
+
+    Raises:
+        ValueError: if a gap penalty is positive or if ``gap_pen`` is lower than ``gap_ext_pen``
+    """
+    if gap_pen > 0 or gap_ext_pen > 0:
+        raise ValueError("Gap penalties should be non-positive.")
+    if gap_ext_pen < gap_pen:
+        raise ValueError("Gap opening penalty should be higher than gap extension penalty (or equal)")
+
+    def scale(score):
+        return int(round(score * SCORE_SCALE))
+
+    # Substitution scores of each distinct gt character against each noise character
+    symbols, gt_symbols = np.unique(_code_points(gt), return_inverse=True)
+    noise_codes = _code_points(noise)
+    space = ord(" ")
+    substitution = np.where(
+        symbols[:, None] == noise_codes,
+        scale(match_reward),
+        np.where(
+            (symbols[:, None] == space) | (noise_codes == space),
+            # mismatch of a character with a space get a stronger penalty
+            scale(mismatch_pen - space_mismatch_penalty),
+            scale(mismatch_pen),
+        ),
+    ).astype(np.int32)
+    return gt_symbols, substitution, scale(gap_pen), scale(gap_ext_pen)
+
+
+def _directions(best, diagonal, gap_a, left, left_gap_a, gap_b, up, up_gap_b, gap_open, gap_ext):
+    """Return the traceback directions (bit flags) of cells, given their score (``best``),
+    their score ending with a gap in gt (``gap_a``) and in noise (``gap_b``), and the scores
+    of their neighbors: the diagonal move (``diagonal``), the cell on the left (``left``
+    and ``left_gap_a``) and the cell above (``up`` and ``up_gap_b``)
+    """
+    best_gap_a = gap_a == best
+    best_gap_b = gap_b == best
+    return (
+        (diagonal == best) * _MATCH
+        + (best_gap_a & (left + gap_open == gap_a)) * _GAP_IN_A
+        + (best_gap_a & (left_gap_a + gap_ext == gap_a)) * _GAP_IN_A_EXTEND
+        + (best_gap_b & (up + gap_open == gap_b)) * _GAP_IN_B
+        + (best_gap_b & (up_gap_b + gap_ext == gap_b)) * _GAP_IN_B_EXTEND
+    )
+
+
+def _score_matrices(gt_symbols, substitution, gap_open, gap_ext):
+    """Fill the score and traceback matrices of the global alignment of two strings
+
+    This is the Needleman-Wunsch algorithm with affine gap penalties (Gotoh), with the
+    same recurrences and ties as ``Bio.pairwise2.align.globalcs()``. The scores are scaled
+    to integers and each row is filled with NumPy. Within a row, the gaps in ``gt`` are
+    resolved with a running maximum instead of a loop over the columns.
+
+    Arguments:
+        gt_symbols, substitution, gap_open, gap_ext : the scores from ``_scaled_scores()``
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray) : the score matrix (in ``SCORE_SCALE`` units)
+        and the traceback matrix (bit flags), both of shape ``(len(gt) + 1, len(noise) + 1)``
+    """
+    n, m = len(gt_symbols), substitution.shape[1]
+    # score: best score, gap_a: best score ending with a gap in gt, gap_b: with a gap in noise
+    score = np.zeros((n + 1, m + 1), dtype=np.int32)
+    gap_a = np.zeros_like(score)
+    gap_b = np.zeros_like(score)
+    score[1:, 0] = gap_open + gap_ext * np.arange(n)
+    score[0, 1:] = gap_open + gap_ext * np.arange(m)
+    gap_a[1:, 0] = score[1:, 0] + gap_open
+    gap_b[0, 1:] = score[0, 1:] + gap_open
+
+    # A gap in gt ending at column c is opened after the column k < c maximizing
+    #     score[k] + gap_open + gap_ext * (c - 1 - k)
+    # Re-opening a gap is never better than extending it (gap_open <= gap_ext), so score[k]
+    # can exclude the gaps in gt and the maximum is a running maximum over the row
+    extensions = gap_ext * np.arange(m, dtype=np.int32)
+    gap_a_offsets = gap_open - extensions
+    gap_open, gap_ext = np.int32(gap_open), np.int32(gap_ext)
+    buffer = np.empty(m, dtype=np.int32)
+    rows = zip(
+        score[:-1, :-1], score[:-1, 1:], gap_b[:-1, 1:],
+        score[1:, :-1], score[1:, 1:], gap_a[1:, 1:], gap_b[1:, 1:],
+        substitution[gt_symbols],
+    )
+    for above_left, above, above_gap_b, current_left, current, current_gap_a, current_gap_b, row_substitution in rows:
+        np.add(above, gap_open, out=buffer)
+        np.add(above_gap_b, gap_ext, out=current_gap_b)
+        np.maximum(current_gap_b, buffer, out=current_gap_b)
+        np.add(above_left, row_substitution, out=current)
+        np.maximum(current, current_gap_b, out=current)
+        # current_left is [score[0], current[:-1]] with no gap in gt yet
+        np.add(current_left, gap_a_offsets, out=buffer)
+        np.maximum.accumulate(buffer, out=current_gap_a)
+        current_gap_a += extensions
+        np.maximum(current, current_gap_a, out=current)
+
+    trace = np.zeros((n + 1, m + 1), dtype=np.uint8)
+    for start in range(1, n + 1, _TRACE_BLOCK_ROWS):
+        rows = slice(start, min(start + _TRACE_BLOCK_ROWS, n + 1))
+        rows_above = slice(start - 1, rows.stop - 1)
+        trace[rows, 1:] = _directions(
+            score[rows, 1:], score[rows_above, :-1] + substitution[gt_symbols[rows_above]],
+            gap_a[rows, 1:], score[rows, :-1], gap_a[rows, :-1],
+            gap_b[rows, 1:], score[rows_above, 1:], gap_b[rows_above, 1:],
+            gap_open, gap_ext,
+        )
+    return score, trace
+
+
+class _Band:
+    """A band of diagonals of a matrix: ``values[row, j]`` is the cell ``(row, row + min_diagonal + j)``.
+    It reads like a numpy matrix in ``_traceback()``: the cells outside of the band are ``outside``.
+    """
+
+    def __init__(self, values, min_diagonal, outside):
+        self.values = values
+        self.min_diagonal = min_diagonal
+        self.outside = outside
+
+    def item(self, row, col):
+        j = col - row - self.min_diagonal
+        if 0 <= j < self.values.shape[1]:
+            return self.values.item(row, j)
+        return self.outside
 
-def _join_char_list(alignment_tuple):
-    """ Post-process alignment results for unicode support """
-    gt_char_list, noise_char_list, score, start, end = alignment_tuple
-    return "".join(gt_char_list), "".join(noise_char_list), score, start, end
+
+def _banded_score_matrices(gt_symbols, substitution, gap_open, gap_ext, band):
+    """Fill the score and traceback matrices (see ``_score_matrices()``) in a band of diagonals:
+    the cells ``(row, col)`` with ``min(0, m - n) - band <= col - row <= max(0, m - n) + band``.
+
+    A path leaving the band has at least ``abs(m - n) + 2 * band + 2`` gaps, which bounds its
+    score. If the best score in the band is above that bound, all the optimal alignments are
+    in the band (Ukkonen), where the scores and directions along them are the same as in the
+    full matrices.
+
+    Returns:
+        tuple(_Band, _Band) : the score and traceback matrices, or None if the band may miss
+        an optimal alignment
+    """
+    n, m = len(gt_symbols), substitution.shape[1]
+    min_diagonal, max_diagonal = min(0, m - n) - band, max(0, m - n) + band
+    width = max_diagonal - min_diagonal + 1
+    offsets = np.arange(width)
+    # The substitution scores are padded for the parts of the band outside of the matrix
+    padded = np.full((len(substitution), m + 2 * width), _OUTSIDE, dtype=np.int64)
+    padded[:, width:width + m] = substitution
+    score = np.full((n + 1, width), _OUTSIDE, dtype=np.int64)
+    gap_a = np.full_like(score, _OUTSIDE)
+    gap_b = np.full_like(score, _OUTSIDE)
+    cols = min_diagonal + offsets
+    inside = (cols >= 1) & (cols <= m)
+    score[0, inside] = gap_open + gap_ext * (cols[inside] - 1)
+    gap_b[0, inside] = score[0, inside] + gap_open
+    score[0, -min_diagonal] = 0
+
+    # In a row, (row - 1, col) is at j + 1 in the row above and (row, col - 1) at j - 1
+    extensions = gap_ext * offsets[:-1]
+    gap_a_offsets = gap_open - extensions
+    for row in range(1, n + 1):
+        above, current, current_gap_a, current_gap_b = score[row - 1], score[row], gap_a[row], gap_b[row]
+        np.maximum(above[1:] + gap_open, gap_b[row - 1, 1:] + gap_ext, out=current_gap_b[:-1])
+        first = width + row - 1 + min_diagonal
+        np.maximum(above + padded[gt_symbols[row - 1], first:first + width], current_gap_b, out=current)
+        # cells in the matrix: columns 0 to m
+        low, high = max(0, -row - min_diagonal), min(width, m - row - min_diagonal + 1)
+        first_column = low == -row - min_diagonal
+        current[:low] = _OUTSIDE
+        if first_column:
+            current[low] = gap_open + gap_ext * (row - 1)
+        np.maximum.accumulate(current[:-1] + gap_a_offsets, out=current_gap_a[1:])
+        current_gap_a[1:] += extensions
+        np.maximum(current, current_gap_a, out=current)
+        if first_column:
+            current_gap_a[low] = current[low] + gap_open
+            current_gap_b[low] = _OUTSIDE
+        current[high:] = current_gap_a[high:] = current_gap_b[high:] = _OUTSIDE
+        current_gap_a[:low] = current_gap_b[:low] = _OUTSIDE
+
+    best = score.item(n, m - n - min_diagonal)
+    num_gaps = abs(m - n) + 2 * band + 2
+    if num_gaps <= n + m:
+        max_substitution = substitution.max()
+        if best <= max_substitution * (n + m - num_gaps) / 2 + gap_open + gap_ext * (num_gaps - 1):
+            return None
+
+    trace = np.zeros((n + 1, width), dtype=np.uint8)
+    for start in range(1, n + 1, _TRACE_BLOCK_ROWS):
+        rows = slice(start, min(start + _TRACE_BLOCK_ROWS, n + 1))
+        rows_above = slice(start - 1, rows.stop - 1)
+        cols = np.arange(rows.start, rows.stop)[:, None] + min_diagonal + offsets
+        left, left_gap_a, up, up_gap_b = (np.full_like(score[rows], _OUTSIDE) for _ in range(4))
+        left[:, 1:], left_gap_a[:, 1:] = score[rows, :-1], gap_a[rows, :-1]
+        up[:, :-1], up_gap_b[:, :-1] = score[rows_above, 1:], gap_b[rows_above, 1:]
+        diagonal = score[rows_above] + padded[gt_symbols[rows_above, None], width - 1 + cols]
+        directions = _directions(
+            score[rows], diagonal, gap_a[rows], left, left_gap_a,
+            gap_b[rows], up, up_gap_b, gap_open, gap_ext,
+        )
+        trace[rows] = np.where((cols >= 1) & (cols <= m), directions, 0)
+    return _Band(score, min_diagonal, _OUTSIDE), _Band(trace, min_diagonal, 0)
+
+
+def _alignment_matrices(
+    gt, noise, match_reward, mismatch_pen, gap_pen, gap_ext_pen, space_mismatch_penalty, banded=True
+):
+    """Return the score and traceback matrices of the global alignment of two strings
+
+    Arguments:
+        banded (bool, optional) : first fill bands of diagonals of increasing width, starting at
+                                  ``INITIAL_BAND``, until the band provably contains the optimal
+                                  alignments (see ``_banded_score_matrices()``). The time and memory
+                                  are then proportional to ``len(gt) * k`` where ``k`` is about
+                                  the edit distance. The full matrices are filled if ``noise`` is
+                                  shorter than ``MIN_BANDED_LENGTH`` or if the band would cover
+                                  more than half of them. Defaults to True.
+
+    Returns:
+        tuple : the score and the traceback matrices, numpy matrices or ``_Band`` objects
+
+    Raises:
+        ValueError: if a gap penalty is positive or if ``gap_pen`` is lower than ``gap_ext_pen``
+    """
+    gt_symbols, substitution, gap_open, gap_ext = _scaled_scores(
+        gt, noise, match_reward, mismatch_pen, gap_pen, gap_ext_pen, space_mismatch_penalty
+    )
+    n, m = len(gt), len(noise)
+    # the bound on the score outside of the band decreases with the number of gaps
+    if banded and m >= MIN_BANDED_LENGTH and substitution.max() >= 2 * gap_ext:
+        band = INITIAL_BAND
+    else:
+        band = m
+    while 2 * (abs(m - n) + 2 * band + 1) <= m + 1:
+        matrices = _banded_score_matrices(gt_symbols, substitution, gap_open, gap_ext, band)
+        if matrices is not None:
+            return matrices
+        band = 2 * band or 1
+    return _score_matrices(gt_symbols, substitution, gap_open, gap_ext)
+
+
+def _last_row_scores(gt_symbols, substitution, gap_open, gap_ext):
+    """Compute the last row of the score matrix (see ``_score_matrices()``) in linear memory
+
+    Arguments:
+        gt_symbols, substitution, gap_open, gap_ext : the scores from ``_scaled_scores()``
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray) : for each column of the last row,
+        the best score, the best score ending with a gap in noise, and the row where
+        that gap starts
+    """
+    n, m = len(gt_symbols), substitution.shape[1]
+    score = np.empty(m + 1, dtype=np.int64)
+    score[0] = 0
+    score[1:] = gap_open + gap_ext * np.arange(m)
+    gap_b = np.full(m + 1, _OUTSIDE, dtype=np.int64)
+    gap_start = np.zeros(m + 1, dtype=np.int64)
+    extensions = gap_ext * np.arange(m, dtype=np.int64)
+    gap_a_offsets = gap_open - extensions
+    for row in range(1, n + 1):
+        opened = score + gap_open
+        extended = gap_b + gap_ext
+        gap_start = np.where(extended > opened, gap_start, row - 1)
+        gap_b = np.maximum(opened, extended)
+        diagonal = score[:-1] + substitution[gt_symbols[row - 1]]
+        score = gap_b.copy()
+        np.maximum(score[1:], diagonal, out=score[1:])
+        # gaps in gt, resolved with a running maximum as in _score_matrices()
+        gap_a = np.maximum.accumulate(score[:-1] + gap_a_offsets) + extensions
+        np.maximum(score[1:], gap_a, out=score[1:])
+    return score, gap_b, gap_start
+
+
+def _ends_gap_token(path, gap_char):
+    """Return True if the last characters added to a partial alignment (see ``_traceback()``)
+    end a token made of gaps only in the first sequence. That is, if the last character is
+    a whitespace after a run of gaps preceded by a whitespace or the end of the sequence.
+    """
+    if path is None or not path[0].isspace():
+        return False
+    path = path[2]
+    if path is None or path[0] != gap_char:
+        return False
+    while path is not None and path[0] == gap_char:
+        path = path[2]
+    return path is None or path[0].isspace()
+
+
+def _lowest_direction(direction, *_):
+    """ Follow the directions in the order of ``Bio.pairwise2`` """
+    return direction & -direction
+
+
+def _token_boundary_direction(direction, seq_a, seq_b, path, row, col):
+    """Follow first the gaps next to a whitespace (at a token boundary), then the
+    matches and mismatches and then the other gaps
+    """
+    def rank(step):
+        if step == _MATCH:
+            return 1
+        if step & (_GAP_IN_A | _GAP_IN_A_EXTEND):
+            right, left = path[0] if path else " ", seq_a[row - 1] if row else " "
+        else:
+            right, left = path[1] if path else " ", seq_b[col - 1] if col else " "
+        return 0 if right.isspace() or left.isspace() else 2
+
+    steps = [step for step in (_GAP_IN_A, _MATCH, _GAP_IN_B, _GAP_IN_A_EXTEND, _GAP_IN_B_EXTEND) if direction & step]
+    return min(steps, key=rank)
+
+
+def _find_gap_open(seq_a, seq_b, path, row, col, col_gap, gap_in_a,
+                   gap_char, score, trace, stack, gap_open, gap_ext, keep_tokens_a):
+    """Follow an extended gap to the border and push the positions where it may open
+    on the traceback stack (see ``_traceback()``)
+
+    Returns:
+        tuple(tuple, int, int, bool) : the path, the row and column at the end of the gap
+        and whether the traceback is a dead end
+    """
+    target_score = score.item(row, col)
+    dead_end = False
+    for length in range(1, (col if gap_in_a else row) + 1):
+        if gap_in_a:
+            col -= 1
+            path = (gap_char, seq_b[col], path)
+        else:
+            row -= 1
+            path = (seq_a[row], gap_char, path)
+            if keep_tokens_a and length == 1 and _ends_gap_token(path, gap_char):
+                return path, row, col, True
+        direction = trace.item(row, col)
+        if length > 1 and score.item(row, col) + gap_open + gap_ext * (length - 1) == target_score:
+            if not direction:
+                break
+            stack.append((path, row, col, col_gap, direction))
+        if not direction:
+            dead_end = True
+    return path, row, col, dead_end
+
+
+def _traceback(seq_a, seq_b, score, trace, gap_char, gap_open, gap_ext,
+               max_candidates=MAX_ALIGNMENTS, keep_tokens_a=False, next_direction=_lowest_direction):
+    """Recover the optimal global alignments from the traceback matrix
+
+    This is a depth-first search with a stack, which yields the alignments lazily
+    (by default in the same order as ``Bio.pairwise2``). A gap in ``seq_b`` is never
+    followed by a gap in ``seq_a``, so that "A-/-B" and "-A/B-" are not both recovered.
+    A partial alignment (a path) is a linked list of ``(char_a, char_b, rest_of_path)``
+    tuples from right to left, so the paths on the stack share their common suffix
+    and the memory does not grow with the number of candidates.
+
+    Arguments:
+        seq_a (str) : first sequence (rows of the matrices)
+        seq_b (str) : second sequence (columns of the matrices)
+        score (numpy.ndarray) : score matrix from ``_score_matrices()``
+        trace (numpy.ndarray) : traceback matrix from ``_score_matrices()``
+        gap_char (str) : gap character
+        gap_open (int) : scaled gap penalty
+        gap_ext (int) : scaled gap extension penalty
+        max_candidates (int, optional) : maximum number of alignments to recover. Defaults to ``MAX_ALIGNMENTS``.
+        keep_tokens_a (bool, optional) : abandon the paths where gaps form a token of their
+                                         own in the aligned ``seq_a``. Defaults to False.
+        next_direction (function, optional) : choose which of the directions of a cell
+                                              to follow first. Defaults to the order of ``Bio.pairwise2``.
+
+    Yields:
+        tuple(list, list) : the aligned ``seq_a`` and ``seq_b`` as lists of characters,
+        at most ``max_candidates`` of them (possibly with duplicates)
+    """
+    stack = [(None, len(seq_a), len(seq_b), False, trace.item(len(seq_a), len(seq_b)))]
+    num_tracebacks = 0
+    while stack and num_tracebacks < max_candidates:
+        path, row, col, col_gap, direction = stack.pop()
+        dead_end = False
+        while (row > 0 or col > 0) and not dead_end:
+            branch = (path, row, col, col_gap)
+            if not direction:
+                # Reached the border of the matrix: add the rest of the sequences
+                if col and col_gap:
+                    dead_end = True
+                else:
+                    for i in range(1, max(row, col) + 1):
+                        path = (seq_a[row - i] if i <= row else gap_char, seq_b[col - i] if i <= col else gap_char, path)
+                break
+            step = next_direction(direction, seq_a, seq_b, path, row, col)
+            direction -= step
+            if step == _GAP_IN_A:
+                if col_gap:
+                    dead_end = True
+                else:
+                    col -= 1
+                    path = (gap_char, seq_b[col], path)
+            elif step == _MATCH:
+                row -= 1
+                col -= 1
+                path = (seq_a[row], seq_b[col], path)
+                col_gap = False
+                dead_end = keep_tokens_a and _ends_gap_token(path, gap_char)
+            elif step == _GAP_IN_B:
+                row -= 1
+                path = (seq_a[row], gap_char, path)
+                col_gap = True
+                dead_end = keep_tokens_a and _ends_gap_token(path, gap_char)
+            elif step == _GAP_IN_A_EXTEND:
+                if col_gap:
+                    dead_end = True
+                else:
+                    path, row, col, dead_end = _find_gap_open(
+                        seq_a, seq_b, path, row, col, col_gap, True,
+                        gap_char, score, trace, stack, gap_open, gap_ext, keep_tokens_a,
+                    )
+            else:  # _GAP_IN_B_EXTEND
+                col_gap = True
+                path, row, col, dead_end = _find_gap_open(
+                    seq_a, seq_b, path, row, col, col_gap, False,
+                    gap_char, score, trace, stack, gap_open, gap_ext, keep_tokens_a,
+                )
+            if direction:  # There is another path to follow from this cell
+                stack.append(branch + (direction,))
+            direction = trace.item(row, col)
+        if not dead_end:
+            num_tracebacks += 1
+            aligned_a, aligned_b = [], []
+            while path is not None:
+                char_a, char_b, path = path
+                aligned_a.append(char_a)
+                aligned_b.append(char_b)
+            yield aligned_a, aligned_b
+
+
+def _iter_alignments(
+    gt,
+    noise,
+    match_reward=MATCH_REWARD,
+    mismatch_pen=MISMATCH_PENALTY,
+    gap_pen=GAP_PENALTY,
+    gap_ext_pen=GAP_EXT_PENALTY,
+    space_mismatch_penalty=SPACE_MISMATCH_PENALTY,
+    gap_char=GAP_CHAR,
+    max_candidates=MAX_ALIGNMENTS,
+    prefer_token_boundaries=False,
+    keep_gt_tokens=False,
+    banded=True,
+):
+    """Lazily yield the distinct optimal global alignments of two non-empty strings.
+    The arguments are the same as ``_align_seg()``, plus:
+
+    Arguments:
+        keep_gt_tokens (bool, optional) : only yield the alignments where the aligned ground truth
+            has as many tokens as ``gt`` (the gaps do not form tokens of their own). The paths
+            that break this invariant are abandoned as soon as possible. Defaults to False.
+        banded (bool, optional) : fill the matrices in a band of diagonals when it provably
+            contains the optimal alignments (see ``_alignment_matrices()``). Defaults to True.
+
+    Yields:
+        tuple(str, str, float, int, int) : an alignment candidate
+            (aligned_gt, aligned_noise, alignment_score, alignment_start, alignment_end)
+    """
+    scoring = (match_reward, mismatch_pen, gap_pen, gap_ext_pen, space_mismatch_penalty)
+    score, trace = _alignment_matrices(gt, noise, *scoring, banded=banded)
+    best_score = score.item(len(gt), len(noise)) / SCORE_SCALE
+    gap_open = int(round(gap_pen * SCORE_SCALE))
+    gap_ext = int(round(gap_ext_pen * SCORE_SCALE))
+    next_direction = _token_boundary_direction if prefer_token_boundaries else _lowest_direction
+    num_gt_tokens = len(tokenize(gt))
+    seen = set()
+
+    def unique_candidates(tracebacks):
+        for aligned_gt, aligned_noise in tracebacks:
+            candidate = ("".join(aligned_gt), "".join(aligned_noise))
+            if candidate in seen:
+                continue
+            if keep_gt_tokens and len(tokenize(candidate[0])) != num_gt_tokens:
+                continue
+            seen.add(candidate)  # only the yielded candidates, so that the retry below runs if none is kept
+            yield candidate + (best_score, 0, len(aligned_gt))
+
+    yield from unique_candidates(_traceback(
+        gt, noise, score, trace, gap_char, gap_open, gap_ext,
+        max_candidates, keep_gt_tokens, next_direction,
+    ))
+    if not seen:
+        # All the tracebacks were dead ends (or broke the gt tokens): search again with the sequences swapped
+        if isinstance(score, _Band):
+            score, trace = _alignment_matrices(gt, noise, *scoring, banded=False)
+        tracebacks = _traceback(
+            noise, gt, score.T, _SWAPPED_DIRECTIONS[trace.T], gap_char, gap_open, gap_ext,
+            max_candidates, next_direction=next_direction,
+        )
+        yield from unique_candidates((aligned_gt, aligned_noise) for aligned_noise, aligned_gt in tracebacks)
 
 
 def _align_seg(
@@ -35,9 +573,12 @@ def _align_seg(
     space_mismatch_penalty=SPACE_MISMATCH_PENALTY,
     gap_char=GAP_CHAR,
     one_alignment_only=ONE_ALIGNMENT_ONLY,
+    max_candidates=MAX_ALIGNMENTS,
+    prefer_token_boundaries=False,
 ):
-    """Wrapper function for Bio.pairwise2.align.globalms(), which
-    calls the sequence alignment algorithm (Needleman-Wunsch)
+    """Global sequence alignment (Needleman-Wunsch with affine gap penalties).
+    By default, the alignment candidates are the same, in the same order, as with
+    ``Bio.pairwise2.align.globalcs()``.
 
     Arguments:
         gt (str) : a ground truth string
@@ -46,6 +587,13 @@ def _align_seg(
         mismatch_pen (int, optional) : penalty for mistmatching characters. Defaults to ``MISMATCH_PENALTY``.
         gap_pen      (int, optional) : penalty for creating a gap. Defaults to ``GAP_PENALTY``.
         gap_ext_pen  (int, optional) : penalty for extending a gap. Defaults to ``GAP_EXT_PENALTY``.
+        space_mismatch_penalty (float, optional) : additional penalty for mismatching a character
+                                                   with a space. Defaults to ``SPACE_MISMATCH_PENALTY``.
+        gap_char (char, optional) : gap char used in alignment algorithm. Defaults to ``GAP_CHAR``.
+        one_alignment_only (bool, optional) : return only the first candidate. Defaults to ``ONE_ALIGNMENT_ONLY``.
+        max_candidates (int, optional) : maximum number of candidates traced back. Defaults to ``MAX_ALIGNMENTS``.
+        prefer_token_boundaries (bool, optional) : list first the candidates with gaps next to
+                                                   whitespaces (token boundaries). Defaults to False.
 
     Returns:
         list : a list of alignment tuples. Each alignment tuple
@@ -61,28 +609,15 @@ def _align_seg(
                 ...
             ]
     """
-
-    def match_reward_fn(x, y):
-        if x == y:
-            return match_reward
-        elif x == " " or y == " ":
-            # mismatch of a character with a space get a stronger penalty
-            return mismatch_pen - space_mismatch_penalty
-        else:
-            return mismatch_pen
-
-    # NOTE: Work-around to enable support full Unicode character set - passing string as a list of characters
-    alignments = pairwise2.align.globalcs(
-        list(gt),
-        list(noise),
-        match_reward_fn,
-        gap_pen,
-        gap_ext_pen,
-        gap_char=[gap_char],
-        one_alignment_only=ONE_ALIGNMENT_ONLY,
+    if not gt or not noise:
+        return []
+    alignments = _iter_alignments(
+        gt, noise, match_reward, mismatch_pen, gap_pen, gap_ext_pen, space_mismatch_penalty, gap_char,
+        max_candidates, prefer_token_boundaries,
     )
-    # Alignment result is a list of char instead of string because of the work-around
-    return list(map(_join_char_list, alignments))
+    if one_alignment_only:
+        return list(itertools.islice(alignments, 1))
+    return list(alignments)
 
 
 def _select_alignment_candidates(alignments, target_num_gt_tokens):
@@ -114,7 +649,7 @@ def _select_alignment_candidates(alignments, target_num_gt_tokens):
         This method is to search for such candidate that satisfy the invariant.
 
     Arguments:
-        alignments (list) : a list of alignment tuples as follows:
+        alignments (iterable) : an iterable (ex: a list or a generator) of alignment tuples as follows:
                             [(str1, str2, alignment_score, alignment_start, alignment_end), (str1, str2, ...), ...]
         target_num_gt_tokens (int) : the number of token in the aligned ground truth string should have
 
@@ -127,7 +662,9 @@ def _select_alignment_candidates(alignments, target_num_gt_tokens):
         an alignment tuple (str, str, int, int, int) with following information:
             (str1, str2, alignment_score, alignment_start, alignment_end)
     """
+    num_candidates = 0
     for alignment in alignments:
+        num_candidates += 1
         aligned_gt = alignment[0]
         aligned_noise = alignment[1]
         num_aligned_gt_tokens = len(tokenize(aligned_gt))
@@ -142,20 +679,29 @@ def _select_alignment_candidates(alignments, target_num_gt_tokens):
             return alignment
 
     raise ValueError(
-        f"No alignment candidates with {target_num_gt_tokens} tokens. Total candidates: {len(alignments)}"
+        f"No alignment candidates with {target_num_gt_tokens} tokens. Total candidates: {num_candidates}"
     )
 
 
-def align(gt, noise, gap_char=GAP_CHAR):
+def align(gt, noise, gap_char=GAP_CHAR, max_candidates=MAX_ALIGNMENTS, prefer_token_boundaries=False):
     """Align two text segments via sequence alignment algorithm
 
     **NOTE**: this algorithm is O(N^2) and is NOT efficient for longer text.
-    Please refer to `genalog.text.anchor` for faster alignment on longer strings.
+    Please refer to `genalog.text.anchor` for faster alignment on longer strings,
+    and to ``align_linear()`` for alignment in linear memory.
 
     Arguments:
         gt (str) : ground true text (should not contain GAP_CHAR)
         noise (str) : str with ocr noise (should not contain GAP_CHAR)
         gap_char (char, optional) : gap char used in alignment algorithm (default: GAP_CHAR)
+        max_candidates (int, optional) : maximum number of co-optimal alignments to trace back
+                                         in search of one satisfying the invariants. It bounds
+                                         the time and memory spent on repetitive text.
+                                         Defaults to ``MAX_ALIGNMENTS``.
+        prefer_token_boundaries (bool, optional) : among the co-optimal alignments, prefer the ones
+                                                   with gaps next to whitespaces (token boundaries)
+                                                   instead of the first one in the order of
+                                                   ``Bio.pairwise2``. Defaults to False.
 
     Returns:
         tuple(str, str) : a tuple of aligned ground truth and noise
@@ -181,7 +727,11 @@ def align(gt, noise, gap_char=GAP_CHAR):
         return gt, gap_char * len(gt)
     else:
         num_gt_tokens = len(tokenize(gt))
-        alignments = _align_seg(gt, noise, gap_char=gap_char)
+        # Candidates are traced back lazily, until one has the target number of tokens
+        alignments = _iter_alignments(
+            gt, noise, gap_char=gap_char, max_candidates=max_candidates,
+            prefer_token_boundaries=prefer_token_boundaries, keep_gt_tokens=True,
+        )
         try:
             aligned_gt, aligned_noise, _, _, _ = _select_alignment_candidates(
                 alignments, num_gt_tokens
@@ -193,6 +743,242 @@ def align(gt, noise, gap_char=GAP_CHAR):
         return aligned_gt, aligned_noise
 
 
+def _middle_in_token(s):
+    """Return the index closest to the middle of ``s`` between two non-whitespace characters,
+    or the middle of ``s`` if there is none.
+    """
+    middle = len(s) // 2
+    for offset in range(middle):
+        for index in (middle - offset, middle + offset):
+            if 0 < index < len(s) and not (s[index - 1].isspace() or s[index].isspace()):
+                return index
+    return middle
+
+
+def _hirschberg(gt, noise, gt_symbols, substitution, gap_open, gap_ext, pieces, **kwargs):
+    """Align ``gt`` and ``noise`` by divide and conquer (Hirschberg, with affine gaps as in
+    Myers & Miller) and append the aligned pieces to ``pieces``, as (aligned_gt, aligned_noise)
+    tuples in order.
+
+    The optimal alignment crosses the middle row of the score matrix at a column found
+    with the last rows of the forward and backward score matrices. The two halves are
+    then aligned independently. The middle row is taken within a gt token, so that
+    the gaps around it cannot form tokens of their own. A gap in noise crossing the middle row is taken as a
+    whole, so that the halves do not depend on each other's gaps. The segments with at
+    most ``LINEAR_MEMORY_BASE_CELLS`` cells are aligned by ``_iter_alignments()``
+    with ``kwargs``.
+    """
+    n, m = len(gt), len(noise)
+    if n == 0 or m == 0:
+        pieces.append((gt or kwargs["gap_char"] * m, noise or kwargs["gap_char"] * n))
+        return
+    if n <= 1 or (n + 1) * (m + 1) <= LINEAR_MEMORY_BASE_CELLS:
+        alignments = itertools.chain(
+            _iter_alignments(gt, noise, keep_gt_tokens=True, **kwargs), _iter_alignments(gt, noise, **kwargs)
+        )
+        pieces.append(next(alignments)[:2])
+        return
+    middle = _middle_in_token(gt)
+    score, gap_b, gap_start = _last_row_scores(gt_symbols[:middle], substitution, gap_open, gap_ext)
+    reverse_score, reverse_gap_b, reverse_gap_start = _last_row_scores(
+        gt_symbols[middle:][::-1], substitution[:, ::-1], gap_open, gap_ext
+    )
+    through = score + reverse_score[::-1]
+    # a gap in noise across the middle row is opened once
+    through_gap = gap_b + reverse_gap_b[::-1] + gap_ext - gap_open
+    col = int(np.argmax(np.maximum(through, through_gap)))
+    if through[col] >= through_gap[col]:
+        top, bottom = middle, middle
+    else:
+        top, bottom = int(gap_start[col]), n - int(reverse_gap_start[::-1][col])
+    _hirschberg(gt[:top], noise[:col], gt_symbols[:top], substitution[:, :col], gap_open, gap_ext, pieces, **kwargs)
+    if top < bottom:
+        pieces.append((gt[top:bottom], kwargs["gap_char"] * (bottom - top)))
+    _hirschberg(
+        gt[bottom:], noise[col:], gt_symbols[bottom:], substitution[:, col:], gap_open, gap_ext, pieces, **kwargs
+    )
+
+
+def align_linear(gt, noise, gap_char=GAP_CHAR, max_candidates=MAX_ALIGNMENTS, prefer_token_boundaries=False):
+    """Align two text segments in linear memory. This is a drop-in replacement of ``align()``
+    for long segments: the memory is O(N + M) instead of O(N * M), for about twice the time.
+
+    The segment is split recursively (Hirschberg) until the parts have at most
+    ``LINEAR_MEMORY_BASE_CELLS`` cells, and the parts are aligned as in ``align()``.
+    The alignment has the optimal score, but it may be a different co-optimal alignment
+    than the one of ``align()`` on segments longer than that.
+
+    Arguments:
+        gt (str) : ground true text (should not contain GAP_CHAR)
+        noise (str) : str with ocr noise (should not contain GAP_CHAR)
+        gap_char (char, optional) : gap char used in alignment algorithm (default: GAP_CHAR)
+        max_candidates (int, optional) : see ``align()``. Defaults to ``MAX_ALIGNMENTS``.
+        prefer_token_boundaries (bool, optional) : see ``align()``. Defaults to False.
+
+    Returns:
+        tuple(str, str) : a tuple of aligned ground truth and noise,
+        with the same invariants as ``align()``
+
+    Raises:
+        ValueError: if the aligned ground truth does not have the same number of tokens as ``gt``
+    """
+    if not gt or not noise:
+        return align(gt, noise, gap_char=gap_char)
+    gt_symbols, substitution, gap_open, gap_ext = _scaled_scores(
+        gt, noise, MATCH_REWARD, MISMATCH_PENALTY, GAP_PENALTY, GAP_EXT_PENALTY, SPACE_MISMATCH_PENALTY
+    )
+    pieces = []
+    _hirschberg(
+        gt, noise, gt_symbols, substitution, gap_open, gap_ext, pieces,
+        gap_char=gap_char, max_candidates=max_candidates, prefer_token_boundaries=prefer_token_boundaries,
+    )
+    aligned_gt = "".join(aligned_gt for aligned_gt, _ in pieces)
+    aligned_noise = "".join(aligned_noise for _, aligned_noise in pieces)
+    try:
+        _select_alignment_candidates([(aligned_gt, aligned_noise)], len(tokenize(gt)))
+    except ValueError as e:
+        raise ValueError(
+            f"Error with input strings '{gt}' and '{noise}': \n{str(e)}"
+        )
+    return aligned_gt, aligned_noise
+
+
+class EditScript:
+    """An alignment of two strings as runs of edit operations, without gap chars.
+
+    A run is a tuple ``(op, length)`` where ``op`` is one of ``EDIT_MATCH``, ``EDIT_REPLACE``,
+    ``EDIT_INSERT`` or ``EDIT_DELETE``. The script references the input strings instead of
+    holding two gap-padded copies of them, and the inputs may contain any character.
+
+    Example Usage: ::
+
+        >>> script = EditScript.from_aligned("N@ew York", "N ew@York")
+        >>> script.runs
+        [('=', 1), ('I', 1), ('=', 2), ('D', 1), ('=', 4)]
+        >>> script.to_aligned(gap_char="-")
+        ('N-ew York', 'N ew-York')
+    """
+
+    def __init__(self, gt, noise, runs):
+        """
+        Arguments:
+            gt (str) : ground truth string
+            noise (str) : noise string
+            runs (list) : list of ``(op, length)`` tuples transforming ``gt`` into ``noise``
+        """
+        self.gt = gt
+        self.noise = noise
+        self.runs = runs
+
+    @classmethod
+    def from_aligned(cls, aligned_gt, aligned_noise, gap_char=GAP_CHAR):
+        """Create the edit script of two aligned strings
+
+        Arguments:
+            aligned_gt (str) : ground truth string aligned with the noise string
+            aligned_noise (str) : noise string aligned with the ground truth
+            gap_char (char, optional) : gap char used in alignment algorithm. Defaults to GAP_CHAR.
+
+        Raises:
+            ValueError: if the aligned strings are not equal in length
+
+        Returns:
+            EditScript : the edit script
+        """
+        if len(aligned_gt) != len(aligned_noise):
+            raise ValueError("Aligned strings are not equal in length")
+        gt = aligned_gt.replace(gap_char, "")
+        noise = aligned_noise.replace(gap_char, "")
+        if not aligned_gt:
+            return cls(gt, noise, [])
+        aligned_gt_symbols = _code_points(aligned_gt)
+        aligned_noise_symbols = _code_points(aligned_noise)
+        gap = ord(gap_char)
+        # index of the operation of each column in _EDIT_OPS
+        ops = np.where(
+            aligned_gt_symbols == gap, 2,
+            np.where(aligned_noise_symbols == gap, 3, (aligned_gt_symbols != aligned_noise_symbols).astype(np.int8))
+        )
+        run_starts = np.flatnonzero(np.diff(ops)) + 1
+        run_lengths = np.diff(run_starts, prepend=0, append=len(ops))
+        run_ops = ops[np.concatenate(([0], run_starts))]
+        return cls(gt, noise, [(_EDIT_OPS[op], length) for op, length in zip(run_ops.tolist(), run_lengths.tolist())])
+
+    def __iter__(self):
+        """Iterate over the runs with their offsets
+
+        Yields:
+            tuple(str, int, int, int, int) : ``(op, column, gt_start, noise_start, length)`` where
+            ``column`` is the start of the run in the aligned strings, and ``gt_start`` and
+            ``noise_start`` are the offsets of the run in the ground truth and noise strings
+        """
+        column = gt_start = noise_start = 0
+        for op, length in self.runs:
+            yield op, column, gt_start, noise_start, length
+            column += length
+            if op != EDIT_INSERT:
+                gt_start += length
+            if op != EDIT_DELETE:
+                noise_start += length
+
+    def __len__(self):
+        """ Length of the aligned strings """
+        return sum(length for _, length in self.runs)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, EditScript) and self.runs == other.runs
+            and self.gt == other.gt and self.noise == other.noise
+        )
+
+    def __repr__(self):
+        return f"EditScript({self.gt!r}, {self.noise!r}, {self.runs!r})"
+
+    def to_aligned(self, gap_char=GAP_CHAR):
+        """Return the gap-padded aligned strings
+
+        Arguments:
+            gap_char (char, optional) : gap char of the aligned strings. Defaults to GAP_CHAR.
+
+        Returns:
+            tuple(str, str) : a tuple of aligned ground truth and noise
+        """
+        aligned_gt = []
+        aligned_noise = []
+        for op, _, gt_start, noise_start, length in self:
+            if op == EDIT_INSERT:
+                aligned_gt.append(gap_char * length)
+            else:
+                aligned_gt.append(self.gt[gt_start:gt_start + length])
+            if op == EDIT_DELETE:
+                aligned_noise.append(gap_char * length)
+            else:
+                aligned_noise.append(self.noise[noise_start:noise_start + length])
+        return "".join(aligned_gt), "".join(aligned_noise)
+
+
+# Edit operations by the column codes of ``EditScript.from_aligned()``
+_EDIT_OPS = (EDIT_MATCH, EDIT_REPLACE, EDIT_INSERT, EDIT_DELETE)
+
+
+def _free_gap_char(*texts):
+    """Return a gap char that is not in any of the texts
+
+    The char is taken from the Unicode private use area, so it is not a space and
+    it cannot be confused with the characters of common texts.
+
+    Arguments:
+        *texts (str) : the texts to align
+
+    Returns:
+        str : a character that none of the texts contains
+    """
+    code_point = _PRIVATE_USE_START
+    while any(chr(code_point) in text for text in texts):
+        code_point += 1
+    return chr(code_point)
+
+
 def _format_alignment(align1, align2):
     """Wrapper function for Bio.pairwise2.format_alignment()
 
@@ -221,81 +1007,6 @@ def _format_alignment(align1, align2):
     return formatted_str_no_score
 
 
-def _find_token_start(s, index):
-    """Find the position of the start of token
-
-    Arguments:
-        s (str) : string to search in
-        index (int) : index to begin search from
-
-    Returns:
-        - position {int} of the first non-whitespace character
-
-    Raises:
-        ValueError: if input s is an empty string
-        IndexError: if is out-of-bound index
-    """
-    max_index = len(s) - 1
-    if len(s) == 0:
-        raise ValueError("Cannot search in an empty string")
-    if index > max_index:
-        raise IndexError(f"Out-of-bound index: {index} in string: {s}")
-
-    while index < max_index and _is_spacing(s[index]):
-        index += 1
-    return index
-
-
-def _find_token_end(s, index):
-    """Find the position of the end of a token
-
-    *** Important ***
-        This method ALWAYS return index within the bound of the string.
-        So, for single character string (eg. "c"), it will return 0.
-
-    Arguments:
-        s (str) : string to search in
-        index (int) : index to begin search from
-
-    Returns:
-        - position {int} of the first non-whitespace character
-
-    Raises:
-        ValueError: if input s is an empty string
-        IndexError: if is out-of-bound index
-    """
-    max_index = len(s) - 1
-    if len(s) == 0:
-        raise ValueError("Cannot search in an empty string")
-    if index > max_index:
-        raise IndexError(f"Out-of-bound index: {index} in string: {s}")
-
-    while index < max_index and not _is_spacing(s[index]):
-        index += 1
-    return index
-
-
-def _find_next_token(s, start):
-    """Return the start and end index of a token in a string
-
-    *** Important ***
-        This method ALWAYS return indices within the bound of the string.
-        So, for single character string (eg. "c"), it will return (0,0)
-
-    Arguments:
-        s (str) : the string to search token in
-        start (int) : the starting index to start search in
-
-    Returns:
-        a tuple of (int, int) responding to the start and end indices of
-        a token in the given s.
-    """
-
-    token_start = _find_token_start(s, start)
-    token_end = _find_token_end(s, token_start)
-    return token_start, token_end
-
-
 def _is_valid_token(token, gap_char=GAP_CHAR):
     """Returns true if token is valid (i.e. compose of non-gap characters)
         Invalid tokens are
@@ -319,7 +1030,129 @@ def _is_valid_token(token, gap_char=GAP_CHAR):
     return not re.match(INVALID_TOKEN_REGEX, token)
 
 
-def parse_alignment(aligned_gt, aligned_noise, gap_char=GAP_CHAR):
+class TokenMapping:
+    """A mapping from the tokens of a string to the tokens of another string,
+    in the compressed sparse row (CSR) format: the tokens mapped to token ``i``
+    are ``indices[indptr[i]:indptr[i + 1]]``.
+
+    A ``TokenMapping`` behaves as a list of rows: ``len(mapping)`` is the number of tokens,
+    ``mapping[i]`` is the array of tokens mapped to token ``i``, and ``tolist()``
+    returns the list of lists.
+    """
+
+    def __init__(self, indptr, indices):
+        """
+        Arguments:
+            indptr (numpy.ndarray) : the row offsets, of length ``number of tokens + 1``
+            indices (numpy.ndarray) : the mapped token indices of all the rows
+        """
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_pairs(cls, rows, cols, n_rows):
+        """Create the mapping of ``(rows[k], cols[k])`` token pairs, sorted by row """
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, cols)
+
+    @classmethod
+    def from_lists(cls, rows):
+        """ Create the mapping of a list of lists of token indices """
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=indptr[1:])
+        return cls(indptr, np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=indptr[-1]))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Token index out of range: {index}")
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def __iter__(self):
+        return (self.indices[start:end] for start, end in zip(self.indptr[:-1], self.indptr[1:]))
+
+    def __repr__(self):
+        return f"TokenMapping({self.tolist()})"
+
+    def row_lengths(self):
+        """ Return the number of tokens mapped to each token, as an array """
+        return np.diff(self.indptr)
+
+    def tolist(self):
+        """ Return the mapping as a list of lists of token indices """
+        indices = self.indices.tolist()
+        return [indices[start:end] for start, end in zip(self.indptr[:-1].tolist(), self.indptr[1:].tolist())]
+
+
+def _aligned_token_ends(text, gap_offsets, gap_lengths):
+    """Return the end positions of the tokens of one side of an alignment in the aligned string
+
+    The tokens are the tokens of ``text``, where a gap next to a token is a part of the token,
+    and the gaps between two spacings, which are tokens on their own (invalid tokens).
+
+    Arguments:
+        text (str) : one of the aligned strings, without gaps
+        gap_offsets (numpy.ndarray) : sorted offsets in ``text`` of the gaps (a gap is before ``text[offset]``)
+        gap_lengths (numpy.ndarray) : lengths of the gaps
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray) : the sorted end positions of the tokens,
+        and whether each token is valid (i.e. not only made of gaps)
+    """
+    is_token = ~_IS_SPACE[np.minimum(_code_points(text), len(_IS_SPACE) - 1)]
+    token_edges = np.diff(is_token.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(token_edges == 1)
+    ends = np.flatnonzero(token_edges == -1)
+    # gaps_before[k] is the number of gap chars in the first k gaps
+    gaps_before = np.concatenate(([0], np.cumsum(gap_lengths)))
+    # the gaps right after a token are a part of it
+    token_ends = ends + gaps_before[np.searchsorted(gap_offsets, ends, side="right")]
+    # the gaps that are not in or next to a token are tokens on their own
+    previous_token = np.searchsorted(starts, gap_offsets, side="right") - 1
+    in_token = gap_offsets <= np.append(ends, -1)[previous_token]
+    gap_token_ends = (gap_offsets + gaps_before[1:])[~in_token]
+    all_token_ends = np.concatenate((token_ends, gap_token_ends))
+    order = np.argsort(all_token_ends, kind="stable")
+    return all_token_ends[order], order < len(token_ends)
+
+
+def _parse_edit_script(script):
+    """ Implementation of ``parse_alignment()`` on an ``EditScript`` """
+    ops = np.array([op for op, _ in script.runs], dtype="<U1")
+    lengths = np.array([length for _, length in script.runs], dtype=np.int64)
+    gt_lengths = np.where(ops == EDIT_INSERT, 0, lengths)
+    noise_lengths = np.where(ops == EDIT_DELETE, 0, lengths)
+    # offsets of the runs in the gt and noise strings
+    gt_starts = np.cumsum(gt_lengths) - gt_lengths
+    noise_starts = np.cumsum(noise_lengths) - noise_lengths
+    gt_token_ends, gt_is_valid = _aligned_token_ends(
+        script.gt, gt_starts[ops == EDIT_INSERT], lengths[ops == EDIT_INSERT]
+    )
+    noise_token_ends, noise_is_valid = _aligned_token_ends(
+        script.noise, noise_starts[ops == EDIT_DELETE], lengths[ops == EDIT_DELETE]
+    )
+    # A gt token and a noise token are paired if they overlap, including the spacing before them:
+    # each interval between two consecutive token ends is in one gt token and one noise token
+    token_ends = np.union1d(gt_token_ends, noise_token_ends)
+    gt_index = np.searchsorted(gt_token_ends, token_ends)
+    noise_index = np.searchsorted(noise_token_ends, token_ends)
+    paired = (gt_index < len(gt_token_ends)) & (noise_index < len(noise_token_ends))
+    gt_index, noise_index = gt_index[paired], noise_index[paired]
+    paired = gt_is_valid[gt_index] & noise_is_valid[noise_index]
+    gt_index, noise_index = gt_index[paired], noise_index[paired]
+    # both indices are sorted: the pairs are sorted by gt token and by noise token
+    return (
+        TokenMapping.from_pairs(gt_index, noise_index, len(gt_token_ends)),
+        TokenMapping.from_pairs(noise_index, gt_index, len(noise_token_ends)),
+    )
+
+
+def parse_alignment(aligned_gt, aligned_noise=None, gap_char=GAP_CHAR):
     r"""Parse alignment to pair ground truth tokens with noise tokens
     ::
 
@@ -334,15 +1167,18 @@ def parse_alignment(aligned_gt, aligned_noise, gap_char=GAP_CHAR):
             noise   "New Yo rk"     "NewYork"       "N ewYork"      "New"           "New York"
 
     Arguments:
-        aligned_gt (str) : ground truth string aligned with the nose string
-        aligned_noise (str) : noise string aligned with the ground truth
+        aligned_gt (str or EditScript) : ground truth string aligned with the nose string,
+                                         or the ``EditScript`` of the alignment
+        aligned_noise (str, optional) : noise string aligned with the ground truth.
+                                        Not used with an ``EditScript``.
         gap_char (char, optional) : gap char used in alignment algorithm. Defaults to GAP_CHAR.
+                                    Not used with an ``EditScript``.
 
     Returns:
-        tuple : ``(gt_to_noise_mapping, noise_to_gt_mapping)`` of two 2D int arrays:
+        tuple : ``(gt_to_noise_mapping, noise_to_gt_mapping)`` of two ``TokenMapping``
 
-    where each array defines the mapping between aligned gt tokens
-    to noise tokens and vice versa.
+    where each ``TokenMapping`` defines the mapping between aligned gt tokens
+    to noise tokens and vice versa (``TokenMapping.tolist()`` returns it as a 2D list).
 
     Example:
         Given input
@@ -352,119 +1188,11 @@ def parse_alignment(aligned_gt, aligned_noise, gap_char=GAP_CHAR):
                                 /\\   |    |   |
                 aligned_noise: "N ew@York kis big."
 
-        The returned output will be:
+        The returned output will be (as lists):
         ::
 
                 ([[0,1],[1],[2],[3]], [[0],[0,1],[2],[3]])
     """
-    # Pseudo-algorithm:
-    #
-    #              tk_start_gt=12         tk_index_gt = 4      total_tokens = 4
-    #              |  tk_end_gt=15        tk_index_noise = 3   total_tokens = 3
-    #              |  |
-    # "New York is big "                     gt_token:big    gt_to_noise_mapping: [[0][0][][2]]
-    # "New@york @@ big "                  noise_token:big    noise_to_gt_mapping: [[0][][3]]
-    #              |  |
-    #              |  tk_end_noise=15      INVALID TOKENS: @*
-    #              tk_start_noise=12
-
-    # 1. Initialization:
-    # 1. IMPORTANT: add whitespace padding (' ') to both end of aligned_gt and aligned_noise to avoid overflow
-    # 2. find the first gt_token and the first noise_token
-    # 3. tk_index_gt = tk_index_noise = 0
-    # 2. While tk_index_gt < total_tk_gt and tk_index_noise < total_tk_noise:
-    # 1. if tk_end_gt == tk_end_noise (1-1 case)
-    # 1. check if the two tokens are valid
-    # 1. if so, register tokens in mapping
-    # 2. find next gt_token token and next noise_token
-    # 3. tk_index_gt ++, tk_index_noise ++
-    # 3. if tk_end_gt < tk_end_noise (many-1 case)
-    # 1. while tk_end_gt < tk_end_noise
-    # 1. check if gt_token and noise_token are BOTH valid
-    # 1. if so register tokens in mapping
-    # 2. find next gt_token
-    # 3. tk_index_gt ++
-    # 4. if tk_end_gt > tk_end_noise (1-many case)
-    # 1. while tk_end_gt > tk_end_noise
-    # 1. check if gt_token and noise_token are BOTH valid
-    # 1. if so register tokens in mapping
-    # 2. find next noise token
-    # 3. tk_index_noise ++
-    # sanity check
-    if len(aligned_gt) != len(aligned_noise):
-        raise ValueError("Aligned strings are not equal in length")
-
-    total_gt_tokens = len(tokenize(aligned_gt))
-    total_noise_tokens = len(tokenize(aligned_noise))
-
-    # Initialization
-    aligned_gt += " "  # add whitespace padding to prevent ptr overflow
-    aligned_noise += " "  # add whitespace padding to prevent ptr overflow
-    tk_index_gt = tk_index_noise = 0
-    tk_start_gt, tk_end_gt = _find_next_token(aligned_gt, 0)
-    tk_start_noise, tk_end_noise = _find_next_token(aligned_noise, 0)
-    gt_to_noise_mapping = [[] for i in range(total_gt_tokens)]
-    noise_to_gt_mapping = [[] for i in range(total_noise_tokens)]
-
-    while tk_index_gt < total_gt_tokens or tk_index_noise < total_noise_tokens:
-        # If both tokens are aligned (one-to-one case)
-        if tk_end_gt == tk_end_noise:
-            # if both gt_token and noise_token are valid (missing token case)
-            if _is_valid_token(
-                aligned_gt[tk_start_gt:tk_end_gt], gap_char=gap_char
-            ) and _is_valid_token(
-                aligned_noise[tk_start_noise:tk_end_noise], gap_char=gap_char
-            ):
-                # register the index of these tokens in the gt_to_noise_mapping
-                index_row = gt_to_noise_mapping[tk_index_gt]
-                index_row.append(tk_index_noise)
-                # register the index of these tokens in the noise_to_gt_mapping
-                index_row = noise_to_gt_mapping[tk_index_noise]
-                index_row.append(tk_index_gt)
-            # find the start and end the next gt_token and noise_token
-            tk_start_gt, tk_end_gt = _find_next_token(aligned_gt, tk_end_gt)
-            tk_start_noise, tk_end_noise = _find_next_token(aligned_noise, tk_end_noise)
-            tk_index_gt += 1
-            tk_index_noise += 1
-        # If gt_token is shorter than noise_token (many-to-one case)
-        elif tk_end_gt < tk_end_noise:
-            while tk_end_gt < tk_end_noise:
-                # if both gt_token and noise_token are valid (missing token case)
-                if _is_valid_token(
-                    aligned_gt[tk_start_gt:tk_end_gt], gap_char=gap_char
-                ) and _is_valid_token(
-                    aligned_noise[tk_start_noise:tk_end_noise], gap_char=gap_char
-                ):
-                    # register the index of these tokens in the gt_to_noise_mapping
-                    index_row = gt_to_noise_mapping[tk_index_gt]
-                    index_row.append(tk_index_noise)
-                    # register the index of these tokens in the noise_to_gt_mapping
-                    index_row = noise_to_gt_mapping[tk_index_noise]
-                    index_row.append(tk_index_gt)
-                # Find the next gt_token
-                tk_start_gt, tk_end_gt = _find_next_token(aligned_gt, tk_end_gt)
-                # Increment index
-                tk_index_gt += 1
-        # If gt_token is longer than noise_token (one-to-many case)
-        else:
-            while tk_end_gt > tk_end_noise:
-                # if both gt_token and noise_token are valid (missing token case)
-                if _is_valid_token(
-                    aligned_gt[tk_start_gt:tk_end_gt], gap_char=gap_char
-                ) and _is_valid_token(
-                    aligned_noise[tk_start_noise:tk_end_noise], gap_char=gap_char
-                ):
-                    # register the index of these token in the gt_to_noise mapping
-                    index_row = gt_to_noise_mapping[tk_index_gt]
-                    index_row.append(tk_index_noise)
-                    # register the index of these token in the noise_to_gt mapping
-                    index_row = noise_to_gt_mapping[tk_index_noise]
-                    index_row.append(tk_index_gt)
-                # Find the next gt_token
-                tk_start_noise, tk_end_noise = _find_next_token(
-                    aligned_noise, tk_end_noise
-                )
-                # Increment index
-                tk_index_noise += 1
-
-    return gt_to_noise_mapping, noise_to_gt_mapping
+    if not isinstance(aligned_gt, EditScript):
+        aligned_gt = EditScript.from_aligned(aligned_gt, aligned_noise, gap_char=gap_char)
+    return _parse_edit_script(aligned_gt)
@@ -0,0 +1,176 @@
+# ---------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+# ---------------------------------------------------------
+
+"""Persistent cache of text alignments.
+
+Computing the OCR metrics and propagating the NER labels of a dataset align the same
+ground truth and OCR texts. An ``AlignmentCache`` stores the aligned strings in a SQLite
+file, keyed by a hash of the input texts, the gap char and the alignment method, so the
+second and later passes over a dataset skip the alignment.
+
+The cache is opt-in: set the ``GENALOG_ALIGNMENT_CACHE`` environment variable to the path
+of the cache file (ex: "alignments.sqlite"), or pass an ``AlignmentCache`` to ``cached_align()``.
+The environment variable is inherited by the worker processes, which share the file. ::
+
+    export GENALOG_ALIGNMENT_CACHE=alignments.sqlite
+    python -m genalog.ocr.metrics ...  # aligns and fills the cache
+    python -m genalog.text.conll_format ...  # reuses the alignments of the same texts
+"""
+import hashlib
+import os
+import sqlite3
+import zlib
+
+from genalog.text import alignment, anchor
+from genalog.text.alignment import GAP_CHAR
+
+# Environment variable with the default filepath of the alignment cache
+ALIGNMENT_CACHE_ENV_VAR = "GENALOG_ALIGNMENT_CACHE"
+# Part of the keys: bump it when the alignment algorithms change their results
+CACHE_VERSION = 1
+# Seconds to wait for another process writing to the cache
+SQLITE_TIMEOUT = 60
+
+_default_caches = {}
+
+
+class AlignmentCache:
+    """A SQLite file of aligned strings, keyed by the hash of the input strings
+
+    Example Usage: ::
+
+        cache = AlignmentCache("alignments.sqlite")
+        aligned_gt, aligned_noise = cached_align(gt, noise, cache=cache)
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path (str) : filepath of the cache. The file is created if it does not exist.
+        """
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    @staticmethod
+    def key(gt, noise, gap_char, method):
+        """Return the key of an alignment
+
+        Arguments:
+            gt (str) : ground truth text
+            noise (str) : text with ocr noise
+            gap_char (str) : gap char of the alignment
+            method (str) : name of the alignment method (ex: "align_w_anchor")
+
+        Returns:
+            bytes : the SHA-256 digest of the arguments and ``CACHE_VERSION``
+        """
+        digest = hashlib.sha256()
+        for part in (str(CACHE_VERSION), method, gap_char, gt, noise):
+            encoded = part.encode("utf8")
+            # the length prefix keeps the parts apart
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.digest()
+
+    def get(self, key):
+        """ Return the ``(aligned_gt, aligned_noise)`` tuple stored with ``key``, or None """
+        row = self._connect().execute(
+            "SELECT aligned_gt, aligned_noise FROM alignments WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return tuple(zlib.decompress(value).decode("utf8") for value in row)
+
+    def put(self, key, aligned_gt, aligned_noise):
+        """ Store an alignment with ``key`` (an existing alignment is kept) """
+        self._connect().execute(
+            "INSERT OR IGNORE INTO alignments (key, aligned_gt, aligned_noise) VALUES (?, ?, ?)",
+            (key, zlib.compress(aligned_gt.encode("utf8")), zlib.compress(aligned_noise.encode("utf8"))),
+        )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM alignments").fetchone()[0]
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def _connect(self):
+        # A connection cannot be shared with a forked process
+        if self._connection is None or self._pid != os.getpid():
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            # Concurrent readers do not block the writer
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS alignments "
+                "(key BLOB PRIMARY KEY, aligned_gt BLOB NOT NULL, aligned_noise BLOB NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+
+def get_default_cache():
+    """Return the cache at the path of the ``GENALOG_ALIGNMENT_CACHE`` environment variable
+
+    Returns:
+        AlignmentCache : the cache, or None if the environment variable is not set
+    """
+    path = os.environ.get(ALIGNMENT_CACHE_ENV_VAR)
+    if not path:
+        return None
+    if path not in _default_caches:
+        _default_caches[path] = AlignmentCache(path)
+    return _default_caches[path]
+
+
+def cached_align(gt, noise, gap_char=GAP_CHAR, use_anchor=True, cache=None):
+    """Align two texts with ``anchor.align_w_anchor()`` (or ``alignment.align()``), reusing
+    the alignment stored in a cache if the same texts were aligned before
+
+    Arguments:
+        gt (str) : ground truth text
+        noise (str) : text with ocr noise
+        gap_char (str, optional) : gap char used in alignment algorithm. Defaults to ``GAP_CHAR``.
+        use_anchor (bool, optional) : use the faster alignment with anchors. Defaults to True.
+        cache (AlignmentCache, optional) : the cache. Defaults to None (``get_default_cache()``,
+                                           no cache if the environment variable is not set).
+
+    Returns:
+        tuple(str, str) : a tuple of aligned ground truth and noise
+    """
+    align = anchor.align_w_anchor if use_anchor else alignment.align
+    if cache is None:
+        cache = get_default_cache()
+        if cache is None:
+            return align(gt, noise, gap_char=gap_char)
+    key = AlignmentCache.key(gt, noise, gap_char, align.__name__)
+    aligned = cache.get(key)
+    if aligned is None:
+        aligned = align(gt, noise, gap_char=gap_char)
+        cache.put(key, *aligned)
+    return aligned
+
+
+def cached_edit_script(gt, noise, use_anchor=True, cache=None):
+    """Align two texts as in ``cached_align()``, and return the alignment as an ``EditScript``.
+    The texts may contain any character: the gap char of the alignment is not in the texts.
+
+    Arguments:
+        gt (str) : ground truth text
+        noise (str) : text with ocr noise
+        use_anchor (bool, optional) : use the faster alignment with anchors. Defaults to True.
+        cache (AlignmentCache, optional) : the cache. Defaults to None (``get_default_cache()``).
+
+    Returns:
+        EditScript : the edit script transforming ``gt`` into ``noise``
+    """
+    gap_char = alignment._free_gap_char(gt, noise)
+    aligned_gt, aligned_noise = cached_align(gt, noise, gap_char=gap_char, use_anchor=use_anchor, cache=cache)
+    return alignment.EditScript.from_aligned(aligned_gt, aligned_noise, gap_char=gap_char)
@@ -18,16 +18,22 @@ This is an re-implementation of the algorithm in this paper
 We rely on `genalog.text.alignment` to align the subsequences.
 """
 import itertools
+import os
 from collections import Counter
 
+import numpy as np
+
 from genalog.text import alignment, preprocess
 from genalog.text.alignment import GAP_CHAR
-from genalog.text.lcs import LCS
+from genalog.text.lcs import LCS, UniqueLCS
 
 # The recursively portion of the algorithm will run on
 # segments longer than this value to find anchor points in
 # the longer segment (to break it up further).
 MAX_ALIGN_SEGMENT_LENGTH = 100  # in characters length
+# Segments left longer than this value (ex: when anchors are scarce)
+# are aligned in linear memory with `alignment.align_linear()`.
+LINEAR_MEMORY_SEGMENT_LENGTH = 1000  # in characters length
 
 
 def get_unique_words(tokens, case_sensitive=False):
@@ -74,14 +80,19 @@ def get_word_map(unique_words, src_tokens):
         1. ``word`` is a typical word token
         2. ``word_index`` is the index of the word in the source token array
     """
-    # Find the indices of the unique words in the source text
-    unique_word_indices = map(src_tokens.index, unique_words)
-    word_map = list(zip(unique_words, unique_word_indices))
-    word_map.sort(key=lambda x: x[1])  # Re-arrange order by the index
-    return word_map
-
-
-def get_anchor_map(gt_tokens, ocr_tokens, min_anchor_len=2):
+    # Find the indices of the unique words in the source text, in a single pass
+    word_indices = {}
+    for index, token in enumerate(src_tokens):
+        if token in unique_words and token not in word_indices:
+            word_indices[token] = index
+    missing_words = unique_words.difference(word_indices)
+    if missing_words:
+        raise ValueError(f"Unique words not in src_tokens: {missing_words}")
+    # Ordered by the index
+    return list(word_indices.items())
+
+
+def get_anchor_map(gt_tokens, ocr_tokens, min_anchor_len=2, char_level_lcs=False):
     """Find the location of anchor words in both the gt and ocr text.
     Anchor words are location where we can split both the source gt
     and ocr text into smaller text fragment for faster alignment.
@@ -91,6 +102,9 @@ def get_anchor_map(gt_tokens, ocr_tokens, min_anchor_len=2):
         ocr_tokens (list) : a list of tokens from OCR'ed document
         min_anchor_len (int, optional) : minimum len of the anchor word.
                                          Defaults to 2.
+        char_level_lcs (bool, optional) : find the anchor words with the LCS of the characters of
+                                          the joined unique words (``LCS``) instead of the LCS
+                                          of the word ids (``UniqueLCS``). Defaults to False.
 
     Returns:
         tuple: a 2-element ``(anchor_map_gt, anchor_map_ocr)`` tuple:
@@ -123,16 +137,28 @@ def get_anchor_map(gt_tokens, ocr_tokens, min_anchor_len=2):
     # Unzip to get the ordered unique_words
     ordered_unique_words_gt, _ = zip(*unique_word_map_gt)
     ordered_unique_words_ocr, _ = zip(*unique_word_map_ocr)
-    # Join words into a space-separated string for finding LCS
-    unique_words_gt_str = preprocess.join_tokens(ordered_unique_words_gt)
-    unique_words_ocr_str = preprocess.join_tokens(ordered_unique_words_ocr)
 
-    # 3. Find the LCS between the two ordered list of unique words
-    lcs = LCS(unique_words_gt_str, unique_words_ocr_str)
-    lcs_str = lcs.get_str()
+    if char_level_lcs:
+        # Join words into a space-separated string for finding LCS
+        unique_words_gt_str = preprocess.join_tokens(ordered_unique_words_gt)
+        unique_words_ocr_str = preprocess.join_tokens(ordered_unique_words_ocr)
+
+        # 3. Find the LCS between the two ordered list of unique words
+        lcs = LCS(unique_words_gt_str, unique_words_ocr_str)
+        lcs_str = lcs.get_str()
+
+        # 4. Break up the LCS string into tokens
+        lcs_words = set(preprocess.tokenize(lcs_str))
+    else:
+        # 3. Find the LCS between the two ordered lists of unique word ids
+        word_ids = {word: word_id for word_id, word in enumerate(ordered_unique_words_gt)}
+        lcs = UniqueLCS(
+            range(len(ordered_unique_words_gt)), [word_ids[word] for word in ordered_unique_words_ocr]
+        )
 
-    # 4. Break up the LCS string into tokens
-    lcs_words = set(preprocess.tokenize(lcs_str))
+        # 4. Map the word ids back to words. Empty tokens are not anchors, as with the LCS string
+        lcs_words = {ordered_unique_words_gt[word_id] for word_id in lcs.get_seq()}
+        lcs_words.discard("")
 
     # 5. Anchor words are the unique words in the lcs string
     anchor_words = lcs_words.intersection(unique_words_common)
@@ -154,6 +180,63 @@ def get_anchor_map(gt_tokens, ocr_tokens, min_anchor_len=2):
     return anchor_map_gt, anchor_map_ocr
 
 
+class _TokenIndex:
+    """Token ids and occurrence indexes of a list of tokens, to find the unique words
+    of any range of tokens without building new lists
+    """
+
+    def __init__(self, tokens, vocabulary):
+        """
+        Arguments:
+            tokens (list) : a list of tokens
+            vocabulary (dict) : token ids, shared with the other text, and completed with ``tokens``
+        """
+        self.ids = np.fromiter(
+            (vocabulary.setdefault(token, len(vocabulary)) for token in tokens), dtype=np.int32, count=len(tokens)
+        )
+        lowercase = {}
+        lowercase_ids = np.fromiter(
+            (lowercase.setdefault(token.lower(), len(lowercase)) for token in tokens), dtype=np.int32, count=len(tokens)
+        )
+        # previous and next occurrence of each token, case insensitive (-1 and len(tokens) if none)
+        self.previous = np.full(len(tokens), -1, dtype=np.int32)
+        self.next = np.full(len(tokens), len(tokens), dtype=np.int32)
+        order = np.argsort(lowercase_ids, kind="stable")
+        same = lowercase_ids[order[1:]] == lowercase_ids[order[:-1]]
+        self.previous[order[1:][same]] = order[:-1][same]
+        self.next[order[:-1][same]] = order[1:][same]
+        # segment_len() of the tokens before each position
+        self.lengths = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens)), out=self.lengths[1:])
+
+    def unique_positions(self, start, end):
+        """ Return the positions of the tokens unique in ``[start, end)`` (see ``get_unique_words()``) """
+        positions = np.arange(start, end)
+        unique = (self.previous[start:end] < start) & (self.next[start:end] >= end)
+        return positions[unique]
+
+    def segment_len(self, start, end):
+        return int(self.lengths[end] - self.lengths[start])
+
+
+def _range_anchors(gt_index, ocr_index, gt_range, ocr_range, excluded_ids):
+    """Find the anchor words of a range of the gt and ocr tokens (see ``get_anchor_map()``)
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray) : the positions of the anchors in the gt and ocr tokens
+    """
+    gt_positions = gt_index.unique_positions(*gt_range)
+    ocr_positions = ocr_index.unique_positions(*ocr_range)
+    gt_ids, ocr_ids = gt_index.ids[gt_positions], ocr_index.ids[ocr_positions]
+    common_ids = np.intersect1d(gt_ids, ocr_ids)
+    in_gt, in_ocr = np.isin(gt_ids, common_ids), np.isin(ocr_ids, common_ids)
+    lcs = UniqueLCS(gt_ids[in_gt].tolist(), ocr_ids[in_ocr].tolist())
+    anchor_ids = np.setdiff1d(lcs.get_seq(), excluded_ids)
+    gt_positions, gt_ids = gt_positions[in_gt], gt_ids[in_gt]
+    ocr_positions, ocr_ids = ocr_positions[in_ocr], ocr_ids[in_ocr]
+    return gt_positions[np.isin(gt_ids, anchor_ids)], ocr_positions[np.isin(ocr_ids, anchor_ids)]
+
+
 def find_anchor_recur(
     gt_tokens,
     ocr_tokens,
@@ -163,6 +246,12 @@ def find_anchor_recur(
 ):
     """Recursively find anchor positions in the gt and ocr text
 
+    The anchors are found as with ``get_anchor_map()``, then the segments between the anchors
+    longer than ``max_seg_length`` are searched for anchors again (without their first token,
+    assumed to be an anchor word), until the segments are short enough or have no anchors.
+    The segments are handled from a work stack as ``(start, end)`` ranges of the token lists,
+    so long texts do not hit the recursion limit.
+
     Arguments:
         gt_tokens (list) : a list of ground truth tokens
         ocr_tokens (list) : a list of tokens from OCR'ed document
@@ -178,58 +267,68 @@ def find_anchor_recur(
         tuple : two lists of token indices where each list is the position of the anchor in the input
         ``gt_tokens`` and ``ocr_tokens``
     """
-    # 1. Try to find anchor words
-    anchor_word_map_gt, anchor_word_map_ocr = get_anchor_map(gt_tokens, ocr_tokens)
-
-    # 2. Check invariant
-    if len(anchor_word_map_gt) != len(anchor_word_map_ocr):
-        raise ValueError("Unequal number of anchor points across gt and ocr string")
-    # Return empty if no anchor word found
-    if len(anchor_word_map_gt) == 0:
-        return [], []
-
-    # 3. Unzip map to get indices of the anchor tokens
-    _, anchor_indices_gt = map(list, zip(*anchor_word_map_gt))
-    _, anchor_indices_ocr = map(list, zip(*anchor_word_map_ocr))
-
-    output_gt_anchors = set(map(lambda x: x + start_pos_gt, anchor_indices_gt))
-    output_ocr_anchors = set(map(lambda x: x + start_pos_ocr, anchor_indices_ocr))
-    # 4. Find split point of each segment
-    seg_start_gt = list(itertools.chain([0], anchor_indices_gt))
-    seg_start_ocr = list(itertools.chain([0], anchor_indices_ocr))
-    start_n_end_gt = zip(seg_start_gt, itertools.chain(anchor_indices_gt, [None]))
-    start_n_end_ocr = zip(seg_start_ocr, itertools.chain(anchor_indices_ocr, [None]))
-    gt_segments = [gt_tokens[start:end] for start, end in start_n_end_gt]
-    ocr_segments = [ocr_tokens[start:end] for start, end in start_n_end_ocr]
-    # 4. Loop through each segment
-    for gt_seg, ocr_seg, gt_start, ocr_start in zip(
-        gt_segments, ocr_segments, seg_start_gt, seg_start_ocr
-    ):
-        if (
-            segment_len(gt_seg) > max_seg_length
-            or segment_len(ocr_seg) > max_seg_length
-        ):
-            # recur on the segment in between the two anchors.
-            # We assume the first token in the segment is an anchor word
-            gt_anchors, ocr_anchors = find_anchor_recur(
-                gt_seg[1:],
-                ocr_seg[1:],
-                start_pos_gt=gt_start + 1,
-                start_pos_ocr=ocr_start + 1,
-                max_seg_length=max_seg_length,
-            )
-            # shift the token indices
-            # (these are indices of a subsequence and does not reflect true position in the source sequence)
-            gt_anchors = set(map(lambda x: x + start_pos_gt, gt_anchors))
-            ocr_anchors = set(map(lambda x: x + start_pos_ocr, ocr_anchors))
-            # merge recursion results
-            output_gt_anchors = output_gt_anchors.union(gt_anchors)
-            output_ocr_anchors = output_ocr_anchors.union(ocr_anchors)
-
-    return sorted(output_gt_anchors), sorted(output_ocr_anchors)
-
-
-def align_w_anchor(gt, ocr, gap_char=GAP_CHAR, max_seg_length=MAX_ALIGN_SEGMENT_LENGTH):
+    vocabulary = {}
+    gt_index = _TokenIndex(gt_tokens, vocabulary)
+    ocr_index = _TokenIndex(ocr_tokens, vocabulary)
+    # empty tokens are dropped from the LCS, they are never anchors (see get_anchor_map())
+    excluded_ids = np.array([vocabulary[""]] if "" in vocabulary else [], dtype=np.int32)
+
+    output_gt_anchors = []
+    output_ocr_anchors = []
+    stack = [((0, len(gt_tokens)), (0, len(ocr_tokens)))]
+    while stack:
+        gt_range, ocr_range = stack.pop()
+        # 1. Try to find anchor words
+        anchors_gt, anchors_ocr = _range_anchors(gt_index, ocr_index, gt_range, ocr_range, excluded_ids)
+
+        # 2. Check invariant
+        if len(anchors_gt) != len(anchors_ocr):
+            raise ValueError("Unequal number of anchor points across gt and ocr string")
+        output_gt_anchors.extend(anchors_gt.tolist())
+        output_ocr_anchors.extend(anchors_ocr.tolist())
+        # Stop if no anchor word found
+        if len(anchors_gt) == 0:
+            continue
+
+        # 3. Find the segments between the anchors
+        seg_starts_gt = [gt_range[0]] + anchors_gt.tolist()
+        seg_starts_ocr = [ocr_range[0]] + anchors_ocr.tolist()
+        seg_ends_gt = anchors_gt.tolist() + [gt_range[1]]
+        seg_ends_ocr = anchors_ocr.tolist() + [ocr_range[1]]
+        # 4. Loop through each segment
+        for gt_start, gt_end, ocr_start, ocr_end in zip(seg_starts_gt, seg_ends_gt, seg_starts_ocr, seg_ends_ocr):
+            if (
+                gt_index.segment_len(gt_start, gt_end) > max_seg_length
+                or ocr_index.segment_len(ocr_start, ocr_end) > max_seg_length
+            ):
+                # search the segment in between the two anchors.
+                # We assume the first token in the segment is an anchor word
+                stack.append((
+                    (min(gt_start + 1, gt_end), gt_end),
+                    (min(ocr_start + 1, ocr_end), ocr_end),
+                ))
+
+    output_gt_anchors = sorted(anchor + start_pos_gt for anchor in output_gt_anchors)
+    output_ocr_anchors = sorted(anchor + start_pos_ocr for anchor in output_ocr_anchors)
+    return output_gt_anchors, output_ocr_anchors
+
+
+def _align_segment(gt_segment, noisy_segment, gap_char):
+    """Align a pair of segments, in linear memory if they are long"""
+    if max(len(gt_segment), len(noisy_segment)) > LINEAR_MEMORY_SEGMENT_LENGTH:
+        return alignment.align_linear(gt_segment, noisy_segment, gap_char=gap_char)
+    return alignment.align(gt_segment, noisy_segment, gap_char=gap_char)
+
+
+def _align_segments(args):
+    """Align a chunk of ``(gt_segment, noisy_segment)`` pairs (in the executor workers)"""
+    segment_pairs, gap_char = args
+    return [_align_segment(gt_segment, noisy_segment, gap_char) for gt_segment, noisy_segment in segment_pairs]
+
+
+def align_w_anchor(
+    gt, ocr, gap_char=GAP_CHAR, max_seg_length=MAX_ALIGN_SEGMENT_LENGTH, executor=None, chunk_size=None
+):
     """A faster alignment scheme of two text segments. This method first
     breaks the strings into smaller segments with anchor words.
     Then these smaller segments are aligned.
@@ -265,6 +364,15 @@ def align_w_anchor(gt, ocr, gap_char=GAP_CHAR, max_seg_length=MAX_ALIGN_SEGMENT_
         gap_char (str, optional) : gap char used in alignment algorithm . Defaults to GAP_CHAR.
         max_seg_length (int, optional) : maximum segment length. Segments longer than this threshold
             will continued be split recursively into smaller segment. Defaults to ``MAX_ALIGN_SEGMENT_LENGTH``.
+            The segments that cannot be split below ``LINEAR_MEMORY_SEGMENT_LENGTH`` are aligned
+            in linear memory (see ``genalog.text.alignment.align_linear()``).
+        executor (concurrent.futures.Executor, optional) : executor aligning chunks of segments in
+            parallel, ex: a ``concurrent.futures.ProcessPoolExecutor`` for a long document. The
+            segments are short and the alignment mostly holds the GIL, so a thread pool is only
+            faster on long segments. The result is the same as without executor.
+            Defaults to None (align the segments in this process).
+        chunk_size (int, optional) : number of segments per task sent to the executor.
+            Defaults to None (split the segments into 4 chunks per CPU).
 
     Returns:
         a tuple (str, str) of aligned ground truth and noise:
@@ -289,15 +397,25 @@ def align_w_anchor(gt, ocr, gap_char=GAP_CHAR, max_seg_length=MAX_ALIGN_SEGMENT_
     ocr_segments = [ocr_tokens[start:end] for start, end in start_n_end_ocr]
 
     # 3. Run alignment on each segment
+    segment_pairs = [
+        (preprocess.join_tokens(gt_segment), preprocess.join_tokens(noisy_segment))
+        for gt_segment, noisy_segment in zip(gt_segments, ocr_segments)
+    ]
+    if executor is None:
+        aligned_segments = _align_segments((segment_pairs, gap_char))
+    else:
+        if not chunk_size:
+            num_chunks = 4 * (os.cpu_count() or 1)  # more chunks than CPUs, the segments vary in length
+            chunk_size = max(1, -(-len(segment_pairs) // num_chunks))  # ceiling division
+        chunks = (
+            (segment_pairs[start:start + chunk_size], gap_char)
+            for start in range(0, len(segment_pairs), chunk_size)
+        )
+        # executor.map() returns the results in order
+        aligned_segments = itertools.chain.from_iterable(executor.map(_align_segments, chunks))
     aligned_segments_gt = []
     aligned_segments_ocr = []
-    for gt_segment, noisy_segment in zip(gt_segments, ocr_segments):
-        gt_segment = preprocess.join_tokens(gt_segment)
-        noisy_segment = preprocess.join_tokens(noisy_segment)
-        # Run alignment algorithm
-        aligned_seg_gt, aligned_seg_ocr = alignment.align(
-            gt_segment, noisy_segment, gap_char=gap_char
-        )
+    for aligned_seg_gt, aligned_seg_ocr in aligned_segments:
         if aligned_seg_gt and aligned_seg_ocr:  # if not empty string ""
             aligned_segments_gt.append(aligned_seg_gt)
             aligned_segments_ocr.append(aligned_seg_ocr)
@@ -111,7 +111,7 @@ def propagate_labels_sentences(clean_tokens, clean_labels, clean_sentences, ocr_
     )
 
     # 3. Find sentence breaks in clean text sentences
-    gt_to_ocr_mapping_is_empty = [len(mapping) == 0 for mapping in gt_to_ocr_mapping]
+    gt_to_ocr_mapping_is_empty = (gt_to_ocr_mapping.row_lengths() == 0).tolist()
 
     sentence_index = []
     sentence_token_counts = 0
@@ -2,6 +2,8 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 # ---------------------------------------------------------
+from bisect import bisect_left, bisect_right
+
 
 class LCS:
     """ Compute the Longest Common Subsequence (LCS) of two given string."""
@@ -53,3 +55,47 @@ class LCS:
 
     def get_str(self):
         return self._lcs
+
+
+class UniqueLCS:
+    """Compute the Longest Common Subsequence (LCS) of two sequences in which each item is unique
+    (ex: the ids of the anchor words of two texts).
+
+    With unique items, the LCS is the Longest Increasing Subsequence (LIS) of the positions
+    in ``seq_m`` of the items of ``seq_n``, found in O(n log n) with patience sorting
+    (instead of the O(m * n) dynamic programming of ``LCS``). If there are several LCS,
+    the one returned is the same as with ``LCS``.
+    """
+
+    def __init__(self, seq_m, seq_n):
+        position_in_m = {item: i for i, item in enumerate(seq_m)}
+        positions = [position_in_m[item] for item in seq_n if item in position_in_m]
+        self._lcs = [seq_m[i] for i in self._find_lis(positions)]
+        self._lcs_len = len(self._lcs)
+
+    @staticmethod
+    def _find_lis(values):
+        # piles[k]: the values ending an increasing subsequence of length k + 1 (and no longer),
+        # in order. Their values decrease, so the piles are searched on the negated values.
+        piles = []
+        tails = []  # the smallest (i.e. last) value of each pile
+        for value in values:
+            k = bisect_left(tails, value)
+            if k == len(piles):
+                piles.append([])
+                tails.append(value)
+            piles[k].append(-value)
+            tails[k] = value
+        # Backtrack from the end, keeping the largest values as the traceback of LCS does:
+        # the first value of each pile lower than the next value of the LIS
+        lis = []
+        for pile in reversed(piles):
+            index = bisect_right(pile, -lis[-1]) if lis else 0
+            lis.append(-pile[index])
+        return lis[::-1]
+
+    def get_len(self):
+        return self._lcs_len
+
+    def get_seq(self):
+        return self._lcs
@@ -7,7 +7,7 @@ import itertools
 import re
 import string
 
-from genalog.text import alignment, anchor
+from genalog.text import alignment, alignment_cache
 from genalog.text import preprocess
 
 # Both regex below has the following behavior:
@@ -203,37 +203,26 @@ def propagate_label_to_ocr(gt_labels, gt_tokens, ocr_tokens, use_anchor=True):
         gap_char (char, optional) : gap char used in alignment algorithm. Defaults to ``alignment.GAP_CHAR``.
         use_anchor (bool, optional) : use faster alignment method with anchors if set to True. Defaults to True.
 
-    Raises:
-        GapCharError:
-            when the set of input character is EQUAL
-            to set of all possible gap characters (GAP_CHAR_SET)
-
     Returns:
         tuple : a tuple of 3 elements ``(ocr_labels, aligned_gt, aligned_ocr, gap_char)`` where
         1. ``ocr_labels`` is a list of NER label for the corresponding ocr tokens
         2. ``aligned_gt`` is the ground truth string aligned with the ocr text
         3. ``aligned_ocr`` is the ocr text aligned with ground true
-        4. ``gap_char`` is the char used to alignment for inserting gaps
+        4. ``gap_char`` is the char used to alignment for inserting gaps. It is a char of
+           GAP_CHAR_SET if the input does not contain all of them, a non-printable char otherwise.
     """
     # Find a set of suitable GAP_CHAR based not in the set of input characters
-    gap_char_candidates, input_char_set = _find_gap_char_candidates(
-        gt_tokens, ocr_tokens
-    )
-    if len(gap_char_candidates) == 0:
-        raise GapCharError(
-            "Exhausted all possible GAP_CHAR candidates for alignment."
-            + " Consider reducing cardinality of the input character set.\n"
-            + f"The set of possible GAP_CHAR candidates is: '{''.join(sorted(GAP_CHAR_SET))}'\n"
-            + f"The set of input character is: '{''.join(sorted(input_char_set))}'"
-        )
+    # (the alignment itself does not use the gap char, only the returned aligned strings do)
+    gap_char_candidates, _ = _find_gap_char_candidates(gt_tokens, ocr_tokens)
+    if alignment.GAP_CHAR in gap_char_candidates:
+        gap_char = alignment.GAP_CHAR  # prefer to use default GAP_CHAR
+    elif gap_char_candidates:
+        gap_char = gap_char_candidates.pop()
     else:
-        if alignment.GAP_CHAR in gap_char_candidates:
-            gap_char = alignment.GAP_CHAR  # prefer to use default GAP_CHAR
-        else:
-            gap_char = gap_char_candidates.pop()
-        return _propagate_label_to_ocr(
-            gt_labels, gt_tokens, ocr_tokens, gap_char=gap_char, use_anchor=use_anchor
-        )
+        gap_char = alignment._free_gap_char(*gt_tokens, *ocr_tokens)
+    return _propagate_label_to_ocr(
+        gt_labels, gt_tokens, ocr_tokens, gap_char=gap_char, use_anchor=use_anchor
+    )
 
 
 def _propagate_label_to_ocr(
@@ -281,7 +270,7 @@ def _propagate_label_to_ocr(
         gt_labels (list) : a list of NER label for ground truth token
         gt_tokens (list) : a list of ground truth string tokens
         ocr_tokens (list) : a list of OCR'ed text tokens
-        gap_char (char, optional) : gap char used in alignment algorithm . Defaults to ``alignment.GAP_CHAR``.
+        gap_char (char, optional) : gap char of the returned aligned strings. Defaults to ``alignment.GAP_CHAR``.
         use_anchor (bool, optional) : use faster alignment method with anchors if set to True.
                             Defaults to True.
     Raises:
@@ -385,15 +374,9 @@ def _propagate_label_to_ocr(
     gt_txt = preprocess.join_tokens(gt_tokens)
     ocr_txt = preprocess.join_tokens(ocr_tokens)
     # Align the ground truth and ocr text first
-    if use_anchor:
-        aligned_gt, aligned_ocr = anchor.align_w_anchor(
-            gt_txt, ocr_txt, gap_char=gap_char
-        )
-    else:
-        aligned_gt, aligned_ocr = alignment.align(gt_txt, ocr_txt, gap_char=gap_char)
-    gt_to_ocr_mapping, ocr_to_gt_mapping = alignment.parse_alignment(
-        aligned_gt, aligned_ocr, gap_char=gap_char
-    )
+    # (reuse the alignment of the same texts if an alignment cache is set)
+    script = alignment_cache.cached_edit_script(gt_txt, ocr_txt, use_anchor=use_anchor)
+    gt_to_ocr_mapping, ocr_to_gt_mapping = alignment.parse_alignment(script)
     # Check invariant
     if len(gt_to_ocr_mapping) != len(gt_tokens):
         raise ValueError(
@@ -405,7 +388,7 @@ def _propagate_label_to_ocr(
     # STEP 1: naively propagate NER label based on text-alignment
     for ocr_to_gt_token_relationship in ocr_to_gt_mapping:
         # if is not mapping to missing a token (Case 4)
-        if ocr_to_gt_token_relationship:
+        if len(ocr_to_gt_token_relationship) > 0:
             # Find the corresponding gt_token it is aligned to
             ner_label_index = _select_from_multiple_ner_labels(
                 ocr_to_gt_token_relationship
@@ -427,6 +410,7 @@ def _propagate_label_to_ocr(
     # STEP 2b: resolve MULTI-TOKEN-LABELS Case 5 (Missing B-label)
     ocr_labels = correct_ner_labels(ocr_labels)
 
+    aligned_gt, aligned_ocr = script.to_aligned(gap_char=gap_char)
     return ocr_labels, aligned_gt, aligned_ocr, gap_char
 
 
@@ -7,7 +7,8 @@
 It has the capability to pack sentences into generated pages more tightly.
 
 usage: splitter.py [-h] [--doc_sep DOC_SEP] [--line_sep LINE_SEP]
-                   [--force_doc_sep]
+                   [--force_doc_sep] [--estimate_fit] [--paginate]
+                   [--processes PROCESSES] [--buffer_size BUFFER_SIZE]
                    input_file output_folder
 
 positional arguments:
@@ -19,6 +20,14 @@ optional arguments:
   --doc_sep DOC_SEP    CoNLL doc seperator
   --line_sep LINE_SEP  CoNLL line seperator
   --force_doc_sep      If set, documents are forced to be split by the doc seperator (recommended to turn this off)
+  --estimate_fit       If set, predict the split points from the calibrated page capacity
+                       instead of searching them with trial layouts (faster)
+  --paginate           If set, lay out chunks of sentences once and cut them at the page
+                       boundaries (fastest)
+  --processes PROCESSES
+                       Number of processes splitting the buffers in parallel
+  --buffer_size BUFFER_SIZE
+                       Number of sentences per buffer
 
 example usage:
 
@@ -28,8 +37,12 @@ example usage:
 
 """
 import argparse
+import collections
+import concurrent.futures
 import multiprocessing
 import os
+from array import array
+from functools import lru_cache
 from multiprocessing.pool import ThreadPool
 
 from tqdm import tqdm
@@ -39,7 +52,7 @@ from genalog.generation.document import DocumentGenerator
 from genalog.text import preprocess
 
 # default buffer. Preferebly set this to something large
-# It holds the lines read from the CoNLL file
+# It holds the sentences read from the CoNLL file (see SentenceBuffer)
 BUFFER_SIZE = 50000
 
 CONLL2012_DOC_SEPERATOR = ""
@@ -50,9 +63,77 @@ STARTING_SPLIT_GUESS = 100  # starting estimate of point where to split text
 MAX_SIZE = 100  # max number of sentences to pack on a doc page
 
 SPLIT_ITERS = 2  # number of iterations to run to find a good split
+PAGINATION_CHUNK_SIZE = 1000  # number of sentences laid out at once by paginate_split_positions()
+ESTIMATE_RETRIES = 2  # number of recalibrations by estimate_split_position() before a binary search
 WORKERS_PER_CPU = 2
 
-default_generator = DocumentGenerator()
+
+@lru_cache(maxsize=None)
+def get_default_generator():
+    """ Create the document generator on first use, once per process """
+    return DocumentGenerator()
+
+
+def __getattr__(name):
+    # ``splitter.default_generator`` is created on first access, see get_default_generator()
+    if name == "default_generator":
+        return get_default_generator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class SentenceBuffer:
+    """A compact buffer of CoNLL sentences.
+
+    Instead of a list of (word, label) tuples per sentence, the words and labels are
+    interned in a vocabulary and the sentences are stored as arrays of vocabulary ids,
+    which takes a few bytes per token. A sentence is read back as a list of
+    (word, label) tuples, so a SentenceBuffer can be used as a list of sentences.
+    """
+
+    def __init__(self):
+        self.vocab = []  # id -> word or label
+        self._ids = {}  # word or label -> id
+        self.word_ids = array("I")
+        self.label_ids = array("I")
+        self.sentence_ends = array("I")  # index of the token after the last token of each sentence
+
+    def _intern(self, string):
+        string_id = self._ids.get(string)
+        if string_id is None:
+            string_id = self._ids[string] = len(self.vocab)
+            self.vocab.append(string)
+        return string_id
+
+    def add_token(self, word, label):
+        """ Add a token to the current sentence """
+        self.word_ids.append(self._intern(word))
+        self.label_ids.append(self._intern(label))
+
+    def end_sentence(self):
+        """ End the current sentence. Empty sentences are ignored. """
+        last_end = self.sentence_ends[-1] if self.sentence_ends else 0
+        if len(self.word_ids) > last_end:
+            self.sentence_ends.append(len(self.word_ids))
+
+    def append(self, sentence):
+        """ Add a sentence given as a list of (word, label) tuples """
+        for word, label in sentence:
+            self.add_token(word, label)
+        self.end_sentence()
+
+    def __len__(self):
+        return len(self.sentence_ends)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.sentence_ends)
+        start = self.sentence_ends[index - 1] if index > 0 else 0
+        end = self.sentence_ends[index]
+        vocab = self.vocab
+        return [
+            (vocab[word_id], vocab[label_id])
+            for word_id, label_id in zip(self.word_ids[start:end], self.label_ids[start:end])
+        ]
 
 
 def unwrap(size, accumulator):
@@ -66,43 +147,258 @@ def unwrap(size, accumulator):
     return words, labels
 
 
+class PageFitEstimator:
+    """Predict how many sentences fit on a page without laying out every candidate split.
+
+    The page capacity of a template, in characters of text, is calibrated on real layouts:
+    when a candidate page overflows, the text laid out on its first page gives the exact
+    capacity for that text. The capacity is kept per template to predict the split point
+    of the next pages, which is then verified with a single layout.
+    """
+
+    def __init__(self):
+        self.capacity = {}  # template name -> number of characters that fit on a page
+        self.lines = {}  # template name -> number of lines on a full page
+
+    def predict_split(self, accumulator, start_pos, end, template_name):
+        """Predict the last split point in ``(start_pos, end]`` whose text fits on a page
+
+        Args:
+            accumulator (list or SentenceBuffer): buffer containing sentences
+            start_pos (int): index of the first sentence of the page
+            end (int): largest split point to consider
+            template_name (str): name of the template
+
+        Returns:
+            int: the predicted split point, ``end`` if the template is not calibrated yet
+        """
+        capacity = self.capacity.get(template_name)
+        if capacity is None:
+            return end
+        length = -1  # the words are joined by a space
+        for i in range(start_pos, end):
+            length += sum(len(word) + 1 for word, _ in accumulator[i])
+            if length > capacity:
+                return max(i, start_pos + 1)
+        return end
+
+    def calibrate(self, template_name, doc):
+        """Measure the page capacity on the first page of an overflowing document
+
+        Args:
+            template_name (str): name of the template of the document
+            doc (Document): a document laid out on more than one page
+
+        Returns:
+            int: the number of characters on the first page
+        """
+        words = doc.page_text(0).split()
+        # The last word of the page may be hyphenated onto the next page
+        capacity = len(" ".join(words[:-1]))
+        self.capacity[template_name] = capacity
+        self.lines[template_name] = len(doc.page_lines(0))
+        return capacity
+
+    def has_room(self, accumulator, split_point, template_name, doc):
+        """Tell whether the free lines at the bottom of a one page document
+        are likely to hold the next sentence
+
+        Args:
+            accumulator (list or SentenceBuffer): buffer containing sentences
+            split_point (int): index of the next sentence
+            template_name (str): name of the template
+            doc (Document): the document of the sentences before ``split_point``
+
+        Returns:
+            bool: False if the template is not calibrated yet
+        """
+        capacity = self.capacity.get(template_name)
+        lines = self.lines.get(template_name)
+        if not capacity or not lines or split_point >= len(accumulator):
+            return False
+        free_lines = lines - len(doc.page_lines(0))
+        length = sum(len(word) + 1 for word, _ in accumulator[split_point])
+        return free_lines * capacity / lines >= length
+
+
+def _layout(accumulator, start_pos, split_point, template_name):
+    """ Lay out the sentences in [start_pos, split_point) as a document """
+    content_words, labels = unwrap((start_pos, split_point), accumulator)
+    text = " ".join(content_words)
+    content = CompositeContent([text], [ContentType.PARAGRAPH])
+    doc_gen = get_default_generator().create_generator(content, [template_name])
+    return next(doc_gen), labels, text
+
+
+def estimate_split_position(
+    accumulator, start_pos, estimator, template_name="text_block.html.jinja"
+):
+    """Find the split point from the start with the page capacity predicted by
+    a PageFitEstimator. Usually takes a single layout once the estimator is calibrated.
+
+    When the predicted document overflows, the estimator is calibrated on it and the split
+    point is predicted again, at most ``ESTIMATE_RETRIES`` times before falling back to
+    find_split_position(). When the predicted document fits with room left for the next
+    sentence, one more sentence is tried. So a split takes one layout, or two with the growth
+    step, and at worst ``ESTIMATE_RETRIES + 1`` layouts followed by a binary search.
+
+    Args:
+        accumulator (list or SentenceBuffer): buffer containing sentences
+        start_pos (int): index of the first sentence of the page
+        estimator (PageFitEstimator): the page capacity estimator, calibrated on the way
+
+    Returns:
+        the split position for a doc, the doc, its labels and text
+    """
+    end = min(len(accumulator), MAX_SIZE + start_pos)
+    split_point = estimator.predict_split(accumulator, start_pos, end, template_name)
+    for retry in range(ESTIMATE_RETRIES + 1):
+        doc, labels, text = _layout(accumulator, start_pos, split_point, template_name)
+        if doc.num_pages <= 1 or split_point == start_pos + 1:
+            break
+        if retry == ESTIMATE_RETRIES:
+            # The estimate keeps overflowing: search the split point
+            return find_split_position(accumulator, start_pos, template_name=template_name)
+        # The capacity measured on this text is exact, so the next layout should fit
+        estimator.calibrate(template_name, doc)
+        split_point = min(
+            estimator.predict_split(accumulator, start_pos, split_point, template_name),
+            split_point - 1,
+        )
+    if doc.num_pages <= 1 and split_point < end and estimator.has_room(accumulator, split_point, template_name, doc):
+        # The capacity is only an estimate: try to fill the free lines with the next sentence
+        grown_doc, grown_labels, grown_text = _layout(accumulator, start_pos, split_point + 1, template_name)
+        if grown_doc.num_pages <= 1:
+            return split_point + 1, grown_doc, grown_labels, grown_text
+    return split_point, doc, labels, text
+
+
+def paginate_split_positions(
+    accumulator, start_pos, template_name="text_block.html.jinja", chunk_size=PAGINATION_CHUNK_SIZE
+):
+    """Lay out a chunk of sentences once and cut it into one document per page,
+    at the last sentence boundary of each page.
+
+    The pages are mapped back to the sentences by character offsets: the non-space characters
+    laid out on a page are matched against the characters of the chunk, skipping the hyphens
+    added by hyphenation, so words broken across lines or inline boxes do not shift the
+    following pages. When a sentence straddles a page boundary, it is carried over to the
+    next document, which then no longer starts at the top of its page: that document is
+    packed to the capacity of its page minus its longest line, so that the carried over
+    words still fit. Every document is laid out once to check that it fits one page, and is
+    split with find_split_position() if it does not.
+    The last page of the chunk is left for the next chunk, unless the chunk reaches
+    the end of the accumulator.
+
+    Args:
+        accumulator (list or SentenceBuffer): buffer containing sentences
+        start_pos (int): index of the first sentence of the chunk
+        template_name (str, optional): name of the template. Defaults to "text_block.html.jinja".
+        chunk_size (int, optional): number of sentences to lay out. Defaults to PAGINATION_CHUNK_SIZE.
+
+    Returns:
+        list: the split positions of the documents, in order.
+        The last one is the start of the next chunk.
+    """
+    end = min(len(accumulator), start_pos + chunk_size)
+    doc, _, _ = _layout(accumulator, start_pos, end, template_name)
+    words = [word for i in range(start_pos, end) for word, _ in accumulator[i]]
+    chars = "".join("".join(word.split()) for word in words)  # non-space characters of the chunk
+    # Number of non-space characters of the chunk before the end of each sentence
+    sentence_ends = []
+    word_index = 0
+    for i in range(start_pos, end):
+        next_word_index = word_index + len(accumulator[i])
+        length = sum(len("".join(word.split())) for word in words[word_index:next_word_index])
+        sentence_ends.append((sentence_ends[-1] if sentence_ends else 0) + length)
+        word_index = next_word_index
+    # Index of the first word of each sentence
+    sentence_words = [0]
+    for i in range(start_pos, end - 1):
+        sentence_words.append(sentence_words[-1] + len(accumulator[i]))
+
+    def text_length(first_sentence, last_sentence):
+        first_word = sentence_words[first_sentence - start_pos]
+        last_word = sentence_words[last_sentence - start_pos] if last_sentence < end else len(words)
+        return sum(len(word) + 1 for word in words[first_word:last_word]) - 1
+
+    splits = []
+    pos = start_pos  # first sentence of the next document
+    page_start = 0  # offset in chars of the first character on the page
+    full_page_capacity = None  # number of characters on a full page
+    for page_num in range(doc.num_pages):
+        if page_num == doc.num_pages - 1 and end < len(accumulator) and splits:
+            break
+        lines = doc.page_lines(page_num)
+        page_text = " ".join(" ".join(lines).split())
+        page_end = page_start  # offset in chars of the first character on the next page
+        for char in page_text.replace(" ", ""):
+            if page_end < len(chars) and chars[page_end] == char:
+                page_end += 1
+        doc_start = sentence_ends[pos - start_pos - 1] if pos > start_pos else 0
+        if doc_start == page_start:
+            # The document starts at the top of the page: keep the sentences on the page
+            fits = lambda i: sentence_ends[i - start_pos - 1] <= page_end  # noqa: E731
+        else:
+            capacity = len(page_text)
+            if page_num == doc.num_pages - 1:
+                # The last page is not full
+                capacity = full_page_capacity
+            capacity -= max((len(line) for line in lines), default=0)
+            fits = lambda i: text_length(pos, i) <= capacity  # noqa: E731
+        split = pos + 1  # at least one sentence per document
+        while split < min(end, pos + MAX_SIZE) and fits(split + 1):
+            split += 1
+        if _layout(accumulator, pos, split, template_name)[0].num_pages > 1:
+            split = max(pos + 1, find_split_position(accumulator, pos, template_name=template_name)[0])
+        splits.append(split)
+        pos = split
+        page_start = page_end
+        if full_page_capacity is None:
+            full_page_capacity = len(page_text)
+        if pos >= end:
+            break
+    return splits
+
+
 def find_split_position(
-    accumulator, start_pos, iters=SPLIT_ITERS, template_name="text_block.html.jinja"
+    accumulator,
+    start_pos,
+    iters=SPLIT_ITERS,
+    template_name="text_block.html.jinja",
+    split_guess=STARTING_SPLIT_GUESS,
 ):
     """Run a few iterations of binary search to find the best split point
     from the start to pack in sentences into a page without overflow.
 
     Args:
-        accumulator (list): buffer containing sentences
+        accumulator (list or SentenceBuffer): buffer containing sentences
         iters (int, optional): Max number of iterations. Defaults to SPLIT_ITERS.
+        split_guess (int, optional): first split point to try. Defaults to STARTING_SPLIT_GUESS.
 
     Returns:
         the best split position for a doc, the doc, its labels and text
     """
-    global STARTING_SPLIT_GUESS
+    return _find_split_position(accumulator, start_pos, iters, template_name, split_guess)[:4]
+
+
+def _find_split_position(accumulator, start_pos, iters, template_name, split_guess):
+    """ find_split_position() that also returns the split guess for the next doc of the buffer """
     # use binary search to find page split point
     start, end = start_pos, min(len(accumulator), MAX_SIZE + start_pos)
     best = None
     count = 0
     while start <= end:
         if count == 0 and (
-            STARTING_SPLIT_GUESS + start_pos > start
-            and STARTING_SPLIT_GUESS + start_pos < end
+            split_guess + start_pos > start
+            and split_guess + start_pos < end
         ):
-            split_point = STARTING_SPLIT_GUESS
+            split_point = split_guess
         else:
             split_point = (start + end) // 2
-        doc_buf = (start_pos, split_point)
-        content_words, labels = unwrap(doc_buf, accumulator)
-        content_types = [ContentType.PARAGRAPH]
-
-        text = " ".join(content_words)
-        content = CompositeContent([text], content_types)
-        doc_gen = default_generator.create_generator(content, [template_name])
+        doc, labels, text = _layout(accumulator, start_pos, split_point, template_name)
 
-        doc = next(doc_gen)
-
-        if len(doc._document.pages) > 1:
+        if doc.num_pages > 1:
             end = split_point - 1
         else:
             start = split_point + 1
@@ -110,69 +406,167 @@ def find_split_position(
             if count >= iters:
                 break
         count += 1
-    STARTING_SPLIT_GUESS = split_point
-    return best
+    return best + (split_point,)
 
 
-def generate_splits(
+def split_positions(accumulator, estimate_fit=False, paginate=False, template_name="text_block.html.jinja"):
+    """Split all the sentences in a buffer into docs. The split positions only depend
+    on the buffer, so the buffers of a file can be split in any order or in parallel.
+
+    Args:
+        accumulator (list or SentenceBuffer): buffer containing sentences
+        estimate_fit (bool, optional): use a PageFitEstimator. Defaults to False.
+        paginate (bool, optional): use paginate_split_positions. Defaults to False.
+
+    Yields:
+        the split position of each doc, in order
+    """
+    estimator = PageFitEstimator() if estimate_fit else None
+    split_guess = STARTING_SPLIT_GUESS
+    start_pos = 0
+    while start_pos < len(accumulator):
+        if paginate:
+            for start_pos in paginate_split_positions(accumulator, start_pos, template_name):
+                yield start_pos
+        elif estimator:
+            start_pos = estimate_split_position(accumulator, start_pos, estimator, template_name)[0]
+            yield start_pos
+        else:
+            start_pos, _, _, _, split_guess = _find_split_position(
+                accumulator, start_pos, SPLIT_ITERS, template_name, split_guess
+            )
+            yield start_pos
+
+
+def _split_partition(args):
+    """ Compute the split positions of a buffer in a worker process """
+    accumulator, estimate_fit, paginate = args
+    return list(split_positions(accumulator, estimate_fit, paginate))
+
+
+def read_partitions(
     input_file,
-    output_folder,
     sentence_seperator="",
     doc_seperator=None,
-    pool=None,
     force_doc_sep=False,
-    ext="txt",
+    buffer_size=BUFFER_SIZE,
 ):
-    """Processes the file line by line and add sentences to the buffer for processing.
+    """Read a CoNLL file into buffers of sentences, cut at the separators.
 
     Args:
         input_file (str): CoNLL formated file
-        output_folder (str): output folder path
         sentence_seperator (str): sentence seperator
         doc_seperator (str, optional): document seperator. Defaults to None.
-        pool (ThreadPool, optional): ThreadPool. If not set, no multithreading is used. Defaults to None.
-        force_doc_sep (bool, optional): Forces documents to be on separate pages. Defaults to False.
+        force_doc_sep (bool, optional): Cut a buffer at every document seperator. Defaults to False.
+        buffer_size (int, optional): number of sentences after which a buffer is cut
+            at the next seperator. Defaults to BUFFER_SIZE.
+
+    Yields:
+        SentenceBuffer: a buffer of sentences
     """
-    doc_id = 0
-    accumulator = []
-    sentence = []
-    progress_bar = tqdm(unit=" docs", desc="Split into")
+    accumulator = SentenceBuffer()
     with open(input_file) as f:
         for line in f:
             if line.strip() == sentence_seperator or line.strip() == doc_seperator:
 
-                if len(sentence) > 0:
-                    accumulator.append(sentence)
-                sentence = []
+                accumulator.end_sentence()
 
                 if line.strip() == doc_seperator and force_doc_sep:
                     # progress to processing buffer immediately if force_doc_sep
                     pass
-                elif len(accumulator) < BUFFER_SIZE:
+                elif len(accumulator) < buffer_size:
                     continue
-                start_pos = 0
-                while start_pos < len(accumulator):
-                    start_pos = next_doc(
-                        accumulator, doc_id, start_pos, output_folder, pool
-                    )
-                    doc_id += 1
-                    progress_bar.update(1)
-                accumulator = []
+                if accumulator:
+                    yield accumulator
+                accumulator = SentenceBuffer()
                 continue
 
             word, tok = line.split("\t")
             if word.strip() == "":
                 continue
-            sentence.append((word, tok))
+            accumulator.add_token(word, tok)
 
-        # process any left over lines
-        start_pos = 0
-        if len(sentence) > 0:
-            accumulator.append(sentence)
-        while start_pos < len(accumulator):
-            start_pos = next_doc(accumulator, doc_id, start_pos, output_folder, pool)
-            doc_id += 1
-            progress_bar.update(1)
+    # process any left over lines
+    accumulator.end_sentence()
+    if accumulator:
+        yield accumulator
+
+
+def generate_splits(
+    input_file,
+    output_folder,
+    sentence_seperator="",
+    doc_seperator=None,
+    pool=None,
+    force_doc_sep=False,
+    ext="txt",
+    estimate_fit=False,
+    paginate=False,
+    processes=None,
+    buffer_size=BUFFER_SIZE,
+):
+    """Processes the file line by line and add sentences to the buffer for processing.
+
+    Args:
+        input_file (str): CoNLL formated file
+        output_folder (str): output folder path
+        sentence_seperator (str): sentence seperator
+        doc_seperator (str, optional): document seperator. Defaults to None.
+        pool (ThreadPool, optional): ThreadPool. If not set, no multithreading is used. Defaults to None.
+        force_doc_sep (bool, optional): Forces documents to be on separate pages. Defaults to False.
+        estimate_fit (bool, optional): Predict the split points with a PageFitEstimator instead of
+            a binary search over trial layouts. Faster, but the pages may be packed differently. Defaults to False.
+        paginate (bool, optional): Lay out chunks of sentences once and cut them at the page boundaries
+            (see paginate_split_positions). Fastest. Defaults to False.
+        processes (int, optional): Number of processes splitting the buffers in parallel.
+            The output is the same as the serial one. Defaults to None (split in this process).
+        buffer_size (int, optional): number of sentences per buffer (see read_partitions).
+            Smaller buffers give more parallelism. Defaults to BUFFER_SIZE.
+    """
+    partitions = read_partitions(input_file, sentence_seperator, doc_seperator, force_doc_sep, buffer_size)
+    with tqdm(unit=" docs", desc="Split into") as progress_bar:
+        doc_id = 0
+        if not processes:
+            for accumulator in partitions:
+                splits = split_positions(accumulator, estimate_fit, paginate)
+                doc_id = write_partition(accumulator, splits, doc_id, output_folder, pool, progress_bar, ext)
+            return
+
+        # The doc ids of a buffer start after the docs of the previous buffers, so the
+        # results are written in the buffer order, with a bounded number of buffers in flight.
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            in_flight = collections.deque()
+            for accumulator in partitions:
+                future = executor.submit(_split_partition, (accumulator, estimate_fit, paginate))
+                in_flight.append((accumulator, future))
+                if len(in_flight) > 2 * processes:
+                    done_accumulator, done_future = in_flight.popleft()
+                    doc_id = write_partition(
+                        done_accumulator, done_future.result(), doc_id, output_folder, pool, progress_bar, ext
+                    )
+            for accumulator, future in in_flight:
+                doc_id = write_partition(accumulator, future.result(), doc_id, output_folder, pool, progress_bar, ext)
+
+
+def write_partition(accumulator, splits, doc_id, output_folder, pool, progress_bar, ext="txt"):
+    """Write the docs of a buffer
+
+    Args:
+        accumulator (list or SentenceBuffer): buffer containing sentences
+        splits (iterable): the split position of each doc in the buffer
+        doc_id (int): id of the first doc
+
+    Returns:
+        int: the id of the next doc
+    """
+    start_pos = 0
+    for split_pos in splits:
+        content_words, labels = unwrap((start_pos, split_pos), accumulator)
+        handle_doc(None, labels, doc_id, " ".join(content_words), output_folder, pool, ext)
+        start_pos = split_pos
+        doc_id += 1
+        progress_bar.update(1)
+    return doc_id
 
 
 def next_doc(accumulator, doc_id, start_pos, output_folder, pool, ext="txt"):
@@ -247,6 +641,30 @@ if __name__ == "__main__":
         action="store_true",
         help="If set, documents are forced to be split by the doc seperator (recommended to turn this off)",
     )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes splitting the buffers in parallel",
+    )
+    parser.add_argument(
+        "--buffer_size",
+        type=int,
+        default=BUFFER_SIZE,
+        help="Number of sentences per buffer",
+    )
+    parser.add_argument(
+        "--paginate",
+        default=False,
+        action="store_true",
+        help="If set, lay out chunks of sentences once and cut them at the page boundaries (fastest)",
+    )
+    parser.add_argument(
+        "--estimate_fit",
+        default=False,
+        action="store_true",
+        help="If set, predict the split points from the calibrated page capacity instead of searching them with trial layouts (faster)",
+    )
     args = parser.parse_args()
 
     unescape = lambda s: s.encode("utf-8").decode("unicode_escape") if s else None  # noqa: E731
@@ -269,6 +687,10 @@ if __name__ == "__main__":
             pool=pool,
             force_doc_sep=False,
             ext=args.ext,
+            estimate_fit=args.estimate_fit,
+            paginate=args.paginate,
+            processes=args.processes,
+            buffer_size=args.buffer_size,
         )
         pool.close()
         pool.join()
@@ -1,6 +1,6 @@
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional, Tuple
 
 def setup_logging():
     logging.disable(logging.WARNING)
@@ -23,6 +23,16 @@ class GenerationConfig:
     max_workers: Optional[int] = None
     template_name: str = "columns.html.jinja"
     shard_size: int = 1000
+    # Effects of genalog.degradation.Degrader applied to each rendered page, e.g. [("blur", {"radius": 3})]
+    degradations: Optional[List[Tuple[str, dict]]] = None
+
+    def __post_init__(self):
+        if self.degradations and not self.grayscale:
+            raise ValueError("degradations are applied to grayscale pages, set grayscale=True")
+        if self.degradations:
+            # Fail here rather than in the worker initializer, where it breaks the process pool
+            from genalog.degradation.degrader import Degrader
+            Degrader.validate_effects(self.degradations)
 
     def to_serializable(self) -> dict:
         return {
@@ -55,7 +55,7 @@ def run_pipeline(config: GenerationConfig, content_paragraphs: List[str], output
     with ProcessPoolExecutor(
             max_workers=config.max_workers,
             initializer=_init_worker,
-            initargs=(config.template_name, str(run_dir)),
+            initargs=(config.template_name, str(run_dir), config.degradations),
     ) as executor:
         for (p_cnt, e_cnt) in executor.map(_process_document_batch, args_iter(), chunksize=config.chunksize):
             processed += p_cnt
@@ -79,6 +79,7 @@ def run_pipeline(config: GenerationConfig, content_paragraphs: List[str], output
         f"batch_size={config.batch_size}",
         f"chunksize={config.chunksize}",
         f"shard_size={config.shard_size}",
+        f"degradations={config.degradations}",
         f"total_seconds={total_time:.2f}",
         f"docs_per_second={docs_per_second:.2f}",
     ]
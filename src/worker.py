@@ -1,18 +1,24 @@
 import io
-import os
 import logging
-import img2pdf
+import os
 from pathlib import Path
 
+import img2pdf
+import numpy as np
+
 _worker_template = None
 _worker_error_file = None
+_worker_degrader = None
 
-def _init_worker(template_name: str, run_dir: str):
-    global _worker_template, _worker_error_file
+def _init_worker(template_name: str, run_dir: str, degradations=None):
+    global _worker_template, _worker_error_file, _worker_degrader
     logging.disable(logging.WARNING)
     from genalog.generation.document import DocumentGenerator
     gen = DocumentGenerator()
     _worker_template = gen.template_env.get_template(template_name)
+    if degradations:
+        from genalog.degradation.degrader import Degrader
+        _worker_degrader = Degrader(degradations)
     pid = os.getpid()
     _worker_error_file = str(Path(run_dir) / f"errors_worker_{pid}.log")
 
@@ -33,6 +39,10 @@ def _render_document(doc, target_pdf: Path, config: dict):
             output_img = bg.convert("L")
         else:
             output_img = bg
+        if _worker_degrader is not None:
+            # Degrade the raster in memory, before the single encode of the page
+            degraded = _worker_degrader.apply_effects(np.asarray(output_img))
+            output_img = Image.fromarray(degraded)
         buf = io.BytesIO()
         if output_format == "JPEG":
             if grayscale:
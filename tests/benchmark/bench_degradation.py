@@ -0,0 +1,222 @@
+"""Throughput and memory benchmark of the degradation effects.
+
+Every effect in `genalog.degradation.effect` and a few typical `Degrader`
+chains are run on synthetic A4 pages at several resolutions. The benchmark
+reports the throughput (in megapixels per second) and the peak memory
+allocated (as traced by `tracemalloc`, which tracks numpy and OpenCV output
+buffers but not OpenCV internal scratch buffers).
+
+usage: python -m tests.benchmark.bench_degradation [-h] [--dpi DPI [DPI ...]]
+                                                   [--repeat REPEAT] [--output OUTPUT]
+                                                   [--effects EFFECTS [EFFECTS ...]]
+
+example usage:
+
+    python -m tests.benchmark.bench_degradation --dpi 80 300 --output degradation_benchmark.json
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import tempfile
+import timeit
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from genalog.degradation import effect
+from genalog.degradation.degrader import Degrader, ImageState
+from genalog.degradation.texture_bank import TextureBank
+
+DEFAULT_DPIS = [80, 150, 300, 600]
+DEFAULT_REPEAT = 3
+A4_SIZE_INCHES = (11.69, 8.27)  # (height, width)
+
+KERNEL = effect.create_2D_kernel((3, 3), kernel_type="ones")
+
+# Keyword arguments (other than "src") to benchmark each effect with.
+# The "PAGE" and "BANK" placeholders are replaced by the page and the texture bank path.
+EFFECT_KWARGS = {
+    "blur": {"radius": 5},
+    "overlay_weighted": {"background": "PAGE", "alpha": 0.8, "beta": 0.2},
+    "overlay": {"background": "PAGE"},
+    "translation": {"offset_x": 5, "offset_y": 5},
+    "bleed_through": {"alpha": 0.8},
+    "bleed_through_texture": {"bank_path": "BANK", "index": 0},
+    "pepper": {"amount": 0.05},
+    "salt": {"amount": 0.3},
+    "salt_then_pepper": {},
+    "pepper_then_salt": {},
+    "morphology": {"operation": "open", "kernel_shape": (3, 3)},
+    "open": {"kernel": KERNEL},
+    "close": {"kernel": KERNEL},
+    "erode": {"kernel": KERNEL},
+    "dilate": {"kernel": KERNEL},
+}
+
+# Typical degradation chains (see genalog/degradation/README.md)
+DEGRADER_CHAINS = {
+    "degrader_light": [
+        ("blur", {"radius": 3}),
+        ("bleed_through", {"alpha": 0.8}),
+        ("salt", {"amount": 0.5}),
+    ],
+    "degrader_heavy": [
+        ("morphology", {"operation": "open", "kernel_shape": (9, 9), "kernel_type": "plus"}),
+        ("morphology", {"operation": "close", "kernel_shape": (9, 1), "kernel_type": "ones"}),
+        ("salt", {"amount": 0.7}),
+        ("overlay", {
+            "src": ImageState.ORIGINAL_STATE,
+            "background": ImageState.CURRENT_STATE,
+        }),
+        ("bleed_through", {
+            "src": ImageState.CURRENT_STATE,
+            "background": ImageState.ORIGINAL_STATE,
+            "alpha": 0.90,
+            "offset_x": -5,
+            "offset_y": -5,
+        }),
+        ("pepper", {"amount": 0.005}),
+        ("blur", {"radius": 3}),
+        ("salt", {"amount": 0.15}),
+    ],
+}
+
+
+def list_effects():
+    """ Return the names of all the image effects in `genalog.degradation.effect` """
+    return [
+        name for name, method in inspect.getmembers(effect, inspect.isfunction)
+        if method.__module__ == effect.__name__ and not name.startswith("_")
+        and "src" in inspect.signature(method).parameters
+    ]
+
+
+def synthetic_page(dpi, seed=0):
+    """Create a white grayscale A4 page covered with dark "text lines"
+
+    Arguments:
+        dpi (int) : resolution of the page
+        seed (int, optional) : random seed. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: a uint8 page of shape (rows, cols)
+    """
+    rows, cols = (int(round(inches * dpi)) for inches in A4_SIZE_INCHES)
+    rng = np.random.RandomState(seed)
+    page = np.full((rows, cols), 255, dtype=np.uint8)
+    line_height = max(dpi // 6, 2)
+    margin = dpi // 2
+    for top in range(margin, rows - margin - line_height, 2 * line_height):
+        glyphs = rng.randint(0, 2, size=(line_height, cols - 2 * margin)).astype(bool)
+        page[top: top + line_height, margin: cols - margin][glyphs] = 0
+    return page
+
+
+def _measure(fn, repeat):
+    """Return the best wall-clock time and the peak traced allocation of `fn()`"""
+    fn()  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        fn()
+        best = min(best, timeit.default_timer() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def _effect_fn(name, page, bank_path):
+    kwargs = {}
+    for key, value in EFFECT_KWARGS.get(name, {}).items():
+        if isinstance(value, str) and value == "PAGE":
+            value = page
+        elif isinstance(value, str) and value == "BANK":
+            value = bank_path
+        kwargs[key] = value
+    method = getattr(effect, name)
+    return lambda: method(page, **kwargs)
+
+
+def run_benchmark(dpis=DEFAULT_DPIS, repeat=DEFAULT_REPEAT, effects=None):
+    """Benchmark the degradation effects and chains
+
+    Arguments:
+        dpis (list, optional) : page resolutions to benchmark. Defaults to ``DEFAULT_DPIS``.
+        repeat (int, optional) : number of timed runs (the best is reported). Defaults to ``DEFAULT_REPEAT``.
+        effects (list, optional) : names of effects or chains to benchmark. Defaults to None (all).
+
+    Returns:
+        list : a list of result dictionaries with the keys
+        ``("name", "dpi", "shape", "seconds", "mpix_per_sec", "peak_alloc_mb")``
+    """
+    names = list_effects() + list(DEGRADER_CHAINS)
+    if effects:
+        names = [name for name in names if name in effects]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for dpi in dpis:
+            page = synthetic_page(dpi)
+            bank_path = os.path.join(tmp_dir, f"bank_{dpi}.npy")
+            TextureBank.build(bank_path, [synthetic_page(dpi, seed=1)])
+            for name in names:
+                if name in DEGRADER_CHAINS:
+                    degrader = Degrader(DEGRADER_CHAINS[name])
+                    fn = (lambda degrader: lambda: degrader.apply_effects(page))(degrader)
+                else:
+                    fn = _effect_fn(name, page, bank_path)
+                seconds, peak = _measure(fn, repeat)
+                results.append({
+                    "name": name,
+                    "dpi": dpi,
+                    "shape": list(page.shape),
+                    "seconds": seconds,
+                    "mpix_per_sec": page.size / 1e6 / seconds,
+                    "peak_alloc_mb": peak / 2 ** 20,
+                })
+    return results
+
+
+def format_table(results):
+    """ Format the benchmark results into a text table """
+    header = f"{'effect':<22} {'dpi':>5} {'shape':>12} {'ms':>10} {'MPix/s':>10} {'peak MB':>10}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        shape = "x".join(map(str, r["shape"]))
+        lines.append(
+            f"{r['name']:<22} {r['dpi']:>5} {shape:>12} {r['seconds'] * 1000:>10.2f} "
+            f"{r['mpix_per_sec']:>10.1f} {r['peak_alloc_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def save_results(results, output_path):
+    """ Write the benchmark results with the environment info as JSON """
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "results": results,
+    }
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dpi", type=int, nargs="+", default=DEFAULT_DPIS, help="page resolutions to benchmark")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="number of timed runs per effect")
+    parser.add_argument("--output", help="JSON file to store the results in")
+    parser.add_argument("--effects", nargs="+", help="subset of effects or degrader chains to benchmark")
+    args = parser.parse_args()
+
+    results = run_benchmark(dpis=args.dpi, repeat=args.repeat, effects=args.effects)
+    print(format_table(results))
+    if args.output:
+        save_results(results, args.output)
+        print(f"Results saved in {args.output}")
@@ -0,0 +1,17 @@
+import json
+
+from tests.benchmark import bench_degradation
+
+
+def test_run_benchmark(tmp_path):
+    results = bench_degradation.run_benchmark(dpis=[10], repeat=1)
+    names = {r["name"] for r in results}
+    assert set(bench_degradation.list_effects()).issubset(names)
+    assert set(bench_degradation.DEGRADER_CHAINS).issubset(names)
+    assert all(r["mpix_per_sec"] > 0 for r in results)
+    assert bench_degradation.format_table(results).count("\n") == len(results) + 1
+
+    output_path = tmp_path / "benchmark.json"
+    bench_degradation.save_results(results, str(output_path))
+    with open(output_path) as f:
+        assert json.load(f)["results"] == results
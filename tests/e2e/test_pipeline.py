@@ -3,9 +3,18 @@ import os
 
 import numpy as np
 import pytest
-
-from genalog.generation.document import DocumentGenerator
-from genalog.pipeline import AnalogDocumentGeneration, generate_dataset_multiprocess
+from jinja2 import Template
+
+from genalog import pipeline
+from genalog.generation.document import Document, DocumentGenerator
+from genalog.pipeline import (
+    AnalogDocumentGeneration,
+    generate_dataset_multiprocess,
+    generate_dataset_streaming,
+    iter_manifest,
+    iter_text_files,
+)
+from genalog.telemetry import STAGES
 
 EXAMPLE_TEXT_FILE = "tests/unit/text/data/gt_1.txt"
 INPUT_TEXT_FILENAMES = glob.glob("tests/unit/text/data/gt_*.txt")
@@ -60,6 +69,54 @@ def test_generate_img_array_empty(empty_style_doc_generator):
     assert sample_img is None
 
 
+@pytest.mark.parametrize("max_workers", [None, 2])
+def test_generate_all_styles(max_workers):
+    doc_generator = AnalogDocumentGeneration(styles=STYLES_COMBINATION, degradations=DEGRATIONS)
+    template = "text_block.html.jinja"
+    if max_workers:
+        with doc_generator.create_executor(template, max_workers=max_workers) as executor:
+            results = list(doc_generator.generate_all_styles(EXAMPLE_TEXT_FILE, template, executor=executor))
+    else:
+        results = list(doc_generator.generate_all_styles(EXAMPLE_TEXT_FILE, template))
+    expected_keys = [
+        tuple(style.items()) for style in DocumentGenerator.expand_style_combinations(STYLES_COMBINATION)
+    ]
+    assert sorted(style_key for style_key, _ in results) == sorted(expected_keys)
+    for _, img in results:
+        assert isinstance(img, np.ndarray)
+
+
+def test_generate_all_styles_rasterizes_each_layout_once(mocker):
+    # "language" only sets the html lang attribute: without hyphenation the layout is the same
+    styles = {"language": ["en_US", "en_GB"], "font_size": ["5px", "6px"]}
+    doc_generator = AnalogDocumentGeneration(styles=styles, degradations=DEGRATIONS)
+    render_array = mocker.spy(Document, "render_array")
+    results = list(doc_generator.generate_all_styles(EXAMPLE_TEXT_FILE, "text_block.html.jinja"))
+    assert len(results) == 4
+    assert render_array.call_count == 2
+
+
+@pytest.mark.parametrize("styles, same_layout", [
+    ({"language": "en_US"}, True),
+    ({"language": "en_US", "font_size": "20px"}, False),
+    ({"language": "en_US", "color": "red"}, False),
+    ({"language": "en_US", "decoration": "underline"}, False),
+    ({"language": "en_US", "background": "gray"}, False),
+])
+def test_layout_fingerprint(styles, same_layout):
+    template = Template(
+        "<html lang={{ language }}><body style='font-size: {{ font_size }}; color: {{ color }};"
+        " text-decoration: {{ decoration }}; background: {{ background }}'>{{ content }}</body></html>"
+    )
+    reference = {
+        "language": "en_GB", "font_size": "12px", "color": "black", "decoration": "none", "background": "white"
+    }
+    doc = Document("Some text", template, **reference)
+    other = Document("Some text", template, **{**reference, **styles})
+    assert isinstance(doc.layout_fingerprint(), str)
+    assert (doc.layout_fingerprint() == other.layout_fingerprint()) == same_layout
+
+
 @pytest.mark.io
 @pytest.mark.parametrize("doc_generator", [
     pytest.lazy_fixture('default_doc_generator'),
@@ -99,3 +156,51 @@ def test_generate_dataset_multiprocess(tmpdir, folder_name, styles):
     num_generated_img = glob.glob(os.path.join(output_folder, "**", "*.png"))
     assert len(num_generated_img) > 0
     assert len(num_generated_img) == len(INPUT_TEXT_FILENAMES) * len(DocumentGenerator.expand_style_combinations(styles))
+
+
+def test_batch_img_generate_without_writer(monkeypatch):
+    for name in ["_worker_generator", "_worker_template", "_worker_writer", "_worker_rasters"]:
+        monkeypatch.setattr(pipeline, name, None)
+    pipeline._init_worker(None, STYLES, DEGRATIONS, "text_block.html.jinja", 300)
+    files, telemetry = pipeline.batch_img_generate([EXAMPLE_TEXT_FILE])
+    assert files == [EXAMPLE_TEXT_FILE]
+    assert telemetry["docs"] == 1
+
+
+def test_iter_text_files():
+    assert sorted(f for f in iter_text_files("tests/unit/text/data") if "gt_" in f) == sorted(INPUT_TEXT_FILENAMES)
+
+
+def test_iter_manifest(tmpdir):
+    manifest_path = os.path.join(tmpdir, "manifest.txt")
+    with open(manifest_path, "w") as f:
+        f.write("\n".join(INPUT_TEXT_FILENAMES) + "\n\n")
+    assert list(iter_manifest(manifest_path)) == INPUT_TEXT_FILENAMES
+
+
+@pytest.mark.io
+@pytest.mark.parametrize("image_format, extension", [("png", "png"), ("webp", "webp"), ("raw", "npy")])
+def test_generate_dataset_streaming(tmpdir, image_format, extension):
+    output_folder = os.path.join(tmpdir, "result")
+    input_files = (f for f in INPUT_TEXT_FILENAMES)
+    batches = list(generate_dataset_streaming(
+        input_files, output_folder, STYLES, DEGRATIONS, "text_block.html.jinja",
+        batch_size=1, max_workers=2, max_in_flight=2, image_format=image_format
+    ))
+    assert sorted(f for batch in batches for f in batch) == sorted(INPUT_TEXT_FILENAMES)
+    num_generated_img = glob.glob(os.path.join(output_folder, "**", f"*.{extension}"))
+    assert len(num_generated_img) == len(INPUT_TEXT_FILENAMES)
+
+
+@pytest.mark.io
+def test_generate_dataset_streaming_callbacks(tmpdir):
+    snapshots = []
+    list(generate_dataset_streaming(
+        INPUT_TEXT_FILENAMES, os.path.join(tmpdir, "result"), STYLES, DEGRATIONS, "text_block.html.jinja",
+        batch_size=1, max_workers=2, callbacks=[snapshots.append], total_docs=len(INPUT_TEXT_FILENAMES)
+    ))
+    assert len(snapshots) == len(INPUT_TEXT_FILENAMES)
+    assert snapshots[-1]["docs"] == len(INPUT_TEXT_FILENAMES)
+    assert snapshots[-1]["queue_depth"] == 0
+    assert snapshots[-1]["eta_sec"] == 0
+    assert set(snapshots[-1]["stage_latency_sec"]) == set(STAGES)
@@ -1,7 +1,21 @@
 import difflib
 import os
 
-from genalog.text.splitter import CONLL2003_DOC_SEPERATOR, generate_splits
+import pytest
+
+from genalog.text import splitter
+from genalog.text.splitter import (
+    _layout,
+    CONLL2003_DOC_SEPERATOR,
+    estimate_split_position,
+    find_split_position,
+    generate_splits,
+    next_doc,
+    PageFitEstimator,
+    paginate_split_positions,
+    read_partitions,
+    SentenceBuffer,
+)
 
 
 def _compare_content(file1, file2):
@@ -42,3 +56,161 @@ def test_splitter(tmpdir):
         "tests/e2e/data/splitter/example_splits/clean_labels/1.txt",
         f"{tmpdir}/clean_labels/1.txt",
     )
+
+
+def _read_tokens(folder):
+    tokens = []
+    for doc_id in range(len(os.listdir(f"{folder}/clean_labels"))):
+        with open(f"{folder}/clean_labels/{doc_id}.txt") as f:
+            tokens.extend(line for line in f.read().split("\n") if line)
+    return tokens
+
+
+@pytest.mark.parametrize("mode", ["estimate_fit", "paginate"])
+def test_splitter_fast_modes(tmpdir, mode):
+    for folder in ["search", mode]:
+        os.makedirs(f"{tmpdir}/{folder}/clean_labels")
+        os.makedirs(f"{tmpdir}/{folder}/clean_text")
+        generate_splits(
+            "tests/e2e/data/splitter/example_conll2012.txt",
+            f"{tmpdir}/{folder}",
+            doc_seperator=CONLL2003_DOC_SEPERATOR,
+            sentence_seperator="",
+            **({mode: True} if folder == mode else {}),
+        )
+    # All the tokens are kept, in order
+    assert _read_tokens(f"{tmpdir}/{mode}") == _read_tokens(f"{tmpdir}/search")
+
+
+def test_page_fit_estimator_calibrate():
+    accumulator = [[("word", "O")] * 50] * 100
+    estimator = PageFitEstimator()
+    assert estimator.predict_split(accumulator, 0, 100, "text_block.html.jinja") == 100
+    doc, _, _ = _layout(accumulator, 0, 100, "text_block.html.jinja")
+    assert doc.num_pages > 1
+    capacity = estimator.calibrate("text_block.html.jinja", doc)
+    assert capacity > 0
+    split_point = estimator.predict_split(accumulator, 0, 100, "text_block.html.jinja")
+    assert 0 < split_point < 100
+    doc, _, _ = _layout(accumulator, 0, split_point, "text_block.html.jinja")
+    assert doc.num_pages == 1
+
+
+def test_estimate_split_position_grows_underestimate():
+    accumulator = [[("word", "O")] * 50] * 100
+    estimator = PageFitEstimator()
+    doc, _, _ = _layout(accumulator, 0, 100, "text_block.html.jinja")
+    estimator.calibrate("text_block.html.jinja", doc)
+    # An under-estimated capacity leaves free lines at the bottom of the page
+    estimator.capacity["text_block.html.jinja"] //= 2
+    predicted = estimator.predict_split(accumulator, 0, 100, "text_block.html.jinja")
+    split_point, doc, _, _ = estimate_split_position(accumulator, 0, estimator)
+    assert split_point == predicted + 1
+    assert doc.num_pages == 1
+
+
+def test_paginate_split_positions():
+    accumulator = [[("word", "O")] * 50] * 100
+    splits = paginate_split_positions(accumulator, 0, "text_block.html.jinja")
+    assert splits[-1] <= 100
+    assert splits == sorted(splits)
+    for start, end in zip([0] + splits, splits):
+        doc, _, _ = _layout(accumulator, start, end, "text_block.html.jinja")
+        assert doc.num_pages == 1
+
+
+def test_paginate_split_positions_mixed_word_lengths():
+    # Sentences of short and long words straddle the page boundaries,
+    # so the character capacity of a page is not a good estimate of what fits
+    words = ["a", "of", "internationalization", "I", "characteristically", "to"]
+    accumulator = [
+        [(words[(i + j) % len(words)], "O") for j in range(5 + i % 23)] for i in range(150)
+    ]
+    splits = paginate_split_positions(accumulator, 0, "text_block.html.jinja")
+    assert splits == sorted(set(splits))
+    for start, end in zip([0] + splits, splits):
+        doc, _, _ = _layout(accumulator, start, end, "text_block.html.jinja")
+        assert doc.num_pages == 1
+
+
+def test_paginate_split_positions_broken_words():
+    # Compound words may be broken at their hyphen anywhere on a page,
+    # which must not shift the boundaries of the following pages
+    words = ["well-known", "state-of-the-art", "a", "Pneumonoultramicroscopicsilicovolcanoconiosis", "to"]
+    accumulator = [
+        [(words[(i + j) % len(words)], "O") for j in range(3 + i % 17)] for i in range(150)
+    ]
+    splits = paginate_split_positions(accumulator, 0, "text_block.html.jinja")
+    assert splits == sorted(set(splits))
+    for start, end in zip([0] + splits, splits):
+        doc, _, _ = _layout(accumulator, start, end, "text_block.html.jinja")
+        assert doc.num_pages == 1
+
+
+def test_find_split_position(tmpdir):
+    accumulator = [[("word", "O")] * 50] * 100
+    split_pos, doc, labels, text = find_split_position(accumulator, 0)
+    assert 0 < split_pos < 100
+    assert doc.num_pages == 1
+    assert len(labels) == len(text.split()) == 50 * split_pos
+    os.makedirs(f"{tmpdir}/clean_labels")
+    os.makedirs(f"{tmpdir}/clean_text")
+    assert next_doc(accumulator, 0, 0, tmpdir, None) == split_pos
+    assert os.path.exists(f"{tmpdir}/clean_text/0.txt")
+
+
+def _read_outputs(folder):
+    outputs = {}
+    for sub_folder in ["clean_text", "clean_labels"]:
+        for filename in os.listdir(f"{folder}/{sub_folder}"):
+            with open(f"{folder}/{sub_folder}/{filename}") as f:
+                outputs[f"{sub_folder}/{filename}"] = f.read()
+    return outputs
+
+
+@pytest.mark.parametrize("mode", [{}, {"paginate": True}])
+def test_splitter_multiprocess(tmpdir, mode):
+    for folder, processes in [("serial", None), ("parallel", 2)]:
+        os.makedirs(f"{tmpdir}/{folder}/clean_labels")
+        os.makedirs(f"{tmpdir}/{folder}/clean_text")
+        generate_splits(
+            "tests/e2e/data/splitter/example_conll2012.txt",
+            f"{tmpdir}/{folder}",
+            doc_seperator=CONLL2003_DOC_SEPERATOR,
+            sentence_seperator="",
+            processes=processes,
+            buffer_size=10,
+            **mode,
+        )
+    serial_outputs = _read_outputs(f"{tmpdir}/serial")
+    assert len(serial_outputs) > 4  # more than one buffer
+    assert _read_outputs(f"{tmpdir}/parallel") == serial_outputs
+
+
+def test_default_generator():
+    assert splitter.default_generator is splitter.get_default_generator()
+    with pytest.raises(AttributeError):
+        splitter.not_an_attribute
+
+
+def test_sentence_buffer():
+    sentences = [[("Hello", "O"), ("World", "B-LOC")], [("Hello", "O")]]
+    buffer = SentenceBuffer()
+    buffer.append(sentences[0])
+    buffer.end_sentence()  # empty sentences are ignored
+    buffer.append(sentences[1])
+    assert len(buffer) == 2
+    assert [buffer[i] for i in range(len(buffer))] == sentences
+    assert buffer[-1] == sentences[-1]
+    assert len(buffer.vocab) == 4
+
+
+def test_read_partitions():
+    partitions = list(read_partitions(
+        "tests/e2e/data/splitter/example_conll2012.txt", doc_seperator=CONLL2003_DOC_SEPERATOR, buffer_size=10
+    ))
+    assert all(len(partition) >= 10 for partition in partitions[:-1])
+    tokens = [token for partition in partitions for i in range(len(partition)) for token in partition[i]]
+    with open("tests/e2e/data/splitter/example_conll2012.txt") as f:
+        expected = [tuple(line.split("\t")) for line in f if line.split("\t")[0].strip()]
+    assert tokens == expected
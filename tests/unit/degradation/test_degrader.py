@@ -130,3 +130,80 @@ def test_degrader_instructions(degrader):
         for key in org_method_arg.keys():
             assert isinstance(org_method_arg[key], type(method_arg[key]))
             assert org_method_arg[key] == method_arg[key]
+
+
+MOCK_PAGE = np.random.RandomState(0).randint(0, 256, size=(97, 40), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("tile_rows", [1, 8, 33, 96])
+def test_degrader_tiled_matches_untiled(degrader, tile_rows):
+    tiled_degrader = Degrader(degrader.effects_to_apply, tile_rows=tile_rows)
+    expected = degrader.apply_effects(MOCK_PAGE)
+    degraded = tiled_degrader.apply_effects(MOCK_PAGE)
+    assert degraded.dtype == np.uint8
+    assert np.array_equal(degraded, expected)
+
+
+@pytest.mark.parametrize(
+    "effects, halo",
+    [
+        ([], 0),
+        ([("blur", {"radius": 5})], 2),
+        ([("blur", {})], 2),  # default radius
+        ([("bleed_through", {"offset_y": -7})], 7),
+        ([("morphology", {"operation": "open", "kernel_shape": (3, 5)})], 10),
+        ([("morphology", {"operation": "erode", "kernel_shape": (3, 5)})], 5),
+        ([("salt", {"amount": 0.1}), ("translation", {"offset_x": 1, "offset_y": 3})], 3),
+    ],
+)
+def test_degrader_vertical_halo(effects, halo):
+    assert Degrader(effects).vertical_halo() == halo
+
+
+def test_degrader_invalid_tile_rows():
+    with pytest.raises(ValueError):
+        Degrader([("blur", {"radius": 5})], tile_rows=0)
+
+
+def test_degrader_converts_to_uint8():
+    degrader = Degrader([("blur", {"radius": 3})])
+    degraded = degrader.apply_effects(MOCK_PAGE.astype(np.float32)[:, ::2])
+    assert degraded.dtype == np.uint8
+    assert degraded.flags["C_CONTIGUOUS"]
+
+
+@pytest.mark.parametrize("src, expected", [
+    (np.array([[0.4, 0.6, 127.5, 254.6]]), np.array([[0, 1, 128, 255]])),
+    (np.array([[-3.0, 300.0, np.inf, -np.inf]]), np.array([[0, 255, 255, 0]])),
+    (np.array([[-1, 256, 1000, 42]]), np.array([[0, 255, 255, 42]])),
+])
+def test_degrader_clips_and_rounds_to_uint8(empty_degrader, src, expected):
+    degraded = empty_degrader.apply_effects(src)
+    assert degraded.dtype == np.uint8
+    assert np.array_equal(degraded, expected)
+
+
+def test_degrader_does_not_modify_src(degrader):
+    src = MOCK_PAGE.copy()
+    degrader.apply_effects(src)
+    assert np.array_equal(src, MOCK_PAGE)
+
+
+def test_degrader_debug_reports(degrader):
+    debug_degrader = Degrader(degrader.effects_to_apply, debug=True)
+    debug_degrader.apply_effects(MOCK_PAGE)
+    reports = debug_degrader.effect_reports
+    assert [report["method_name"] for report in reports] == [
+        method_name for method_name, _ in degrader.effects_to_apply
+    ]
+    for report in reports:
+        assert report["src_dtype"] == report["dst_dtype"] == "uint8"
+        assert report["image_copies"] >= 0
+
+
+def test_degrader_debug_dtype_conversion():
+    debug_degrader = Degrader([("blur", {"radius": 3})], debug=True)
+    with patch("genalog.degradation.effect.blur") as mock_blur:
+        mock_blur.return_value = MOCK_PAGE.astype(np.float64)
+        with pytest.raises(AssertionError):
+            debug_degrader.apply_effects(MOCK_PAGE)
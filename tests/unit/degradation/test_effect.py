@@ -91,6 +91,19 @@ def test_salt():
     assert dst.shape == MOCK_IMG_SHAPE
 
 
+@pytest.mark.parametrize("method, value", [(effect.salt, 255), (effect.pepper, 0)])
+def test_salt_pepper_chunked_noise(method, value):
+    src = np.full((300, 301), 128, dtype=np.uint8)  # larger than NOISE_CHUNK_SIZE
+    np.random.seed(0)
+    expected = src.copy()
+    expected[np.random.random(src.shape) < 0.2] = value
+    np.random.seed(0)
+    dst = method(src, amount=0.2)
+    assert dst.flags["C_CONTIGUOUS"]
+    assert np.array_equal(dst, expected)
+    assert (src == 128).all()  # src is not modified
+
+
 def test_salt_then_pepper():
     dst = effect.salt_then_pepper(MOCK_IMG, 0.5, 0.001)
     assert dst.dtype == np.uint8
@@ -142,6 +155,7 @@ def test_create_2D_kernel_error(kernel_shape, kernel_type):
 )
 def test_create_2D_kernel(kernel_shape, kernel_type, expected_kernel):
     kernel = effect.create_2D_kernel(kernel_shape, kernel_type)
+    assert kernel.dtype == np.uint8
     assert np.array_equal(kernel, expected_kernel)
 
 
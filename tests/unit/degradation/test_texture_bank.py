@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from genalog.degradation import effect
+from genalog.degradation.degrader import Degrader
+from genalog.degradation.texture_bank import load_texture_bank, TextureBank
+
+MOCK_IMG_SHAPE = (40, 30)
+MOCK_PAGES = [
+    np.random.RandomState(seed).randint(0, 256, size=MOCK_IMG_SHAPE, dtype=np.uint8)
+    for seed in range(3)
+]
+
+
+@pytest.fixture
+def bank_path(tmp_path):
+    bank_path = str(tmp_path / "bank.npy")
+    TextureBank.build(bank_path, MOCK_PAGES, blur_radius=None, offset_x=2, offset_y=-3)
+    return bank_path
+
+
+def test_texture_bank_build(bank_path):
+    bank = TextureBank(bank_path)
+    assert len(bank) == len(MOCK_PAGES)
+    assert bank[0].shape == MOCK_IMG_SHAPE
+    assert bank[0].dtype == np.uint8
+    assert isinstance(bank.textures, np.memmap)
+
+
+def test_texture_bank_build_invalid_pages(tmp_path):
+    with pytest.raises(ValueError):
+        TextureBank.build(str(tmp_path / "bank.npy"), [])
+    with pytest.raises(ValueError):
+        TextureBank.build(str(tmp_path / "bank.npy"), [MOCK_PAGES[0], MOCK_PAGES[1][:-1]])
+    assert not (tmp_path / "bank.npy").exists()
+
+
+def test_texture_bank_build_error_removes_file(tmp_path, mocker):
+    mocker.patch.object(effect, "translation", side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        TextureBank.build(str(tmp_path / "bank.npy"), MOCK_PAGES)
+    assert not (tmp_path / "bank.npy").exists()
+
+
+def test_texture_bank_sample(bank_path):
+    bank = TextureBank(bank_path)
+    assert np.array_equal(bank.sample(MOCK_IMG_SHAPE, index=1), bank[1])
+    assert bank.sample(MOCK_IMG_SHAPE).shape == MOCK_IMG_SHAPE
+    assert bank.sample((20, 60), index=0).shape == (20, 60)
+
+
+def test_load_texture_bank_is_cached(bank_path):
+    assert load_texture_bank(bank_path) is load_texture_bank(bank_path)
+
+
+def test_load_texture_bank_rebuilt(bank_path):
+    bank = load_texture_bank(bank_path)
+    TextureBank.build(bank_path, MOCK_PAGES[:2], blur_radius=None)
+    rebuilt = load_texture_bank(bank_path)
+    assert rebuilt is not bank
+    assert len(rebuilt) == 2
+
+
+def test_bleed_through_texture_matches_bleed_through(bank_path):
+    src = MOCK_PAGES[2]
+    expected = effect.bleed_through(src, background=MOCK_PAGES[1], alpha=0.7, offset_x=2, offset_y=-3)
+    dst = effect.bleed_through_texture(src, bank_path, index=1, alpha=0.7)
+    assert dst.dtype == np.uint8
+    assert np.array_equal(dst, expected)
+
+
+def test_degrader_bleed_through_texture(bank_path):
+    degrader = Degrader([("bleed_through_texture", {"bank_path": bank_path, "alpha": 0.9})])
+    dst = degrader.apply_effects(MOCK_PAGES[0])
+    assert dst.dtype == np.uint8
+    assert dst.shape == MOCK_IMG_SHAPE
@@ -1,3 +1,4 @@
+import os
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -210,6 +211,36 @@ def test_document_generator_create_generator_(default_document_generator):
         next(generator)
 
 
+def test_document_generator_get_template_cached(default_document_generator):
+    template_env = default_document_generator.template_env
+    template_env.get_template.reset_mock()
+    template = default_document_generator.get_template(DEFAULT_TEMPLATE_NAME)
+    assert template is default_document_generator.get_template(DEFAULT_TEMPLATE_NAME)
+    template_env.get_template.assert_called_once_with(DEFAULT_TEMPLATE_NAME)
+    with pytest.raises(FileNotFoundError):
+        default_document_generator.get_template("NOT A VALID TEMPLATE")
+
+
+@patch("genalog.generation.document.Environment")
+def test_document_generator_lists_templates_on_demand(mock_environment):
+    mock_environment.return_value.list_templates.return_value = [DEFAULT_TEMPLATE_NAME]
+    document_generator = DocumentGenerator()
+    mock_environment.return_value.list_templates.assert_not_called()
+    assert document_generator.template_list == [DEFAULT_TEMPLATE_NAME]
+    assert document_generator.template_list == [DEFAULT_TEMPLATE_NAME]
+    mock_environment.return_value.list_templates.assert_called_once()
+
+
+@pytest.mark.io
+def test_document_generator_bytecode_cache(tmpdir):
+    cache_dir = str(tmpdir.join("template_cache"))
+    DocumentGenerator(bytecode_cache_dir=cache_dir).get_template(DEFAULT_TEMPLATE_NAME)
+    assert len(os.listdir(cache_dir)) > 0
+    # A new generator loads the compiled template from the cache
+    template = DocumentGenerator(bytecode_cache_dir=cache_dir).get_template(DEFAULT_TEMPLATE_NAME)
+    assert template.render(content=None)
+
+
 @pytest.mark.parametrize(
     "template_name, expected_output",
     [
@@ -0,0 +1,47 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from genalog.generation.image_writer import ImageWriter
+
+MOCK_IMG = np.random.RandomState(0).randint(0, 256, size=(20, 10), dtype=np.uint8)
+
+
+@pytest.mark.io
+@pytest.mark.parametrize("image_format, compression", [
+    ("png", None),
+    ("png", 9),
+    ("webp", 101),  # lossless
+])
+def test_image_writer_encoded(tmpdir, image_format, compression):
+    with ImageWriter(tmpdir, image_format=image_format, compression=compression, max_queue=1) as writer:
+        for i in range(3):
+            writer.submit(MOCK_IMG, f"img_{i}")
+    for i in range(3):
+        path = writer.image_path(f"img_{i}")
+        assert path == os.path.join(tmpdir, "img", f"img_{i}.{image_format}")
+        assert np.array_equal(cv2.imread(path, cv2.IMREAD_GRAYSCALE), MOCK_IMG)
+
+
+@pytest.mark.io
+def test_image_writer_raw(tmpdir):
+    writer = ImageWriter(tmpdir, image_format="raw")
+    writer.submit(MOCK_IMG, "img")
+    writer.flush()
+    assert np.array_equal(np.load(os.path.join(tmpdir, "img", "img.npy")), MOCK_IMG)
+    writer.close()
+
+
+def test_image_writer_invalid_format(tmpdir):
+    with pytest.raises(ValueError):
+        ImageWriter(tmpdir, image_format="bmp")
+
+
+@pytest.mark.io
+def test_image_writer_error(tmpdir):
+    writer = ImageWriter(tmpdir)
+    writer.submit(MOCK_IMG, os.path.join("missing_folder", "img"))
+    with pytest.raises(RuntimeError):
+        writer.close()
@@ -2,7 +2,7 @@ import pytest
 
 import genalog.ocr.metrics
 from genalog.ocr.metrics import get_align_stats, get_editops_stats, get_stats
-from genalog.text.alignment import align, GAP_CHAR
+from genalog.text.alignment import align, EditScript, GAP_CHAR
 from genalog.text.ner_label import _find_gap_char_candidates
 
 
@@ -609,3 +609,40 @@ def test_actions_stats(src_string, target, expected_actions):
 
     for k in expected_actions:
         assert actions[k] == expected_actions[k], (k, actions[k], expected_actions[k])
+
+
+def test_get_stats_edit_script():
+    src_string, target = "a worn coat", "a wom coat"
+    alignment = align(src_string, target)
+    script = EditScript.from_aligned(*alignment)
+    assert get_editops_stats(script) == get_editops_stats(alignment, GAP_CHAR)
+    assert get_align_stats(script, src_string, target) == get_align_stats(
+        alignment, src_string, target, GAP_CHAR
+    )
+    # the texts may contain the default gap char
+    assert get_stats("a w@m coat", "a w@rn coat") == get_stats(target, src_string)
+
+
+def test_get_stats_substitutions_gap_char_not_in_input():
+    target, src_string = "b  @b", "aa"
+    _, substitution_dict, _ = get_stats(target, src_string)
+    # the substitution with a gap is rendered with a gap char that is not "@"
+    gap_chars = {char for key in substitution_dict for text in key for char in text} - set(target + src_string)
+    assert len(gap_chars) == 1
+
+
+def test_get_stats_alignment_cache(monkeypatch, tmp_path):
+    from genalog.text import alignment_cache, anchor
+
+    calls = []
+
+    def align_w_anchor(gt, noise, gap_char=GAP_CHAR):
+        calls.append((gt, noise))
+        return align(gt, noise, gap_char=gap_char)
+
+    monkeypatch.setattr(anchor, "align_w_anchor", align_w_anchor)
+    monkeypatch.setenv(alignment_cache.ALIGNMENT_CACHE_ENV_VAR, str(tmp_path / "alignments.sqlite"))
+    expected = get_stats("a wom coat", "a worn coat")
+    assert get_stats("a wom coat", "a worn coat") == expected
+    assert len(calls) == 1
+    alignment_cache.get_default_cache().close()
@@ -0,0 +1,25 @@
+import pytest
+
+from config import GenerationConfig
+
+DEGRADATIONS = [("blur", {"radius": 3})]
+
+
+def test_generation_config_degradations():
+    config = GenerationConfig(degradations=DEGRADATIONS)
+    assert config.degradations == DEGRADATIONS
+    assert "degradations" not in config.to_serializable()
+
+
+def test_generation_config_degradations_require_grayscale():
+    with pytest.raises(ValueError, match="grayscale"):
+        GenerationConfig(degradations=DEGRADATIONS, grayscale=False)
+
+
+@pytest.mark.parametrize("degradations", [
+    [("not_an_effect", {})],
+    [("blur", {"not_a_param": 3})],
+])
+def test_generation_config_invalid_degradations(degradations):
+    with pytest.raises(ValueError):
+        GenerationConfig(degradations=degradations)
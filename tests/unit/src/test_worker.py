@@ -0,0 +1,23 @@
+import pytest
+
+from genalog.degradation.degrader import Degrader
+from genalog.generation.content import CompositeContent, ContentType
+from genalog.generation.document import Document, DocumentGenerator
+
+worker = pytest.importorskip("worker")
+
+CONFIG = {"resolution": 30, "output_format": "PNG", "jpeg_quality": 70, "grayscale": True}
+
+
+def test_render_document_with_degrader(tmpdir, mocker):
+    content = CompositeContent(["Some text to degrade"], [ContentType.PARAGRAPH])
+    doc = Document(content, DocumentGenerator().get_template("text_block.html.jinja"))
+    degrader = Degrader([("blur", {"radius": 3})])
+    apply_effects = mocker.spy(degrader, "apply_effects")
+    mocker.patch.object(worker, "_worker_degrader", degrader)
+    target_pdf = tmpdir.join("doc.pdf")
+    worker._render_document(doc, target_pdf, CONFIG)
+    assert apply_effects.call_count == doc.num_pages
+    degraded = apply_effects.spy_return
+    assert degraded.ndim == 2 and degraded.dtype.name == "uint8"
+    assert target_pdf.read_binary().startswith(b"%PDF")
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from genalog.telemetry import (
+    BatchTelemetry,
+    JsonLinesExporter,
+    PipelineMetrics,
+    PrometheusExporter,
+    STAGES,
+)
+
+
+def _mock_batch(worker, docs):
+    telemetry = BatchTelemetry()
+    telemetry.worker = worker
+    telemetry.docs = docs
+    telemetry.pages = 2 * docs
+    telemetry.busy_seconds = 0.5
+    for stage in STAGES:
+        telemetry.add(stage, 0.1 * docs)
+    return telemetry.to_dict()
+
+
+def test_batch_telemetry_time():
+    telemetry = BatchTelemetry()
+    with telemetry.time("layout"):
+        pass
+    assert telemetry.stage_seconds["layout"] > 0
+    assert telemetry.stage_seconds["raster"] == 0
+
+
+def test_pipeline_metrics_snapshot():
+    metrics = PipelineMetrics(total_docs=10)
+    metrics.update(_mock_batch(1, 2), queue_depth=3)
+    metrics.update(_mock_batch(2, 3), queue_depth=1)
+    snapshot = metrics.snapshot()
+    assert snapshot["batches"] == 2
+    assert snapshot["docs"] == 5
+    assert snapshot["pages"] == 10
+    assert snapshot["queue_depth"] == 1
+    assert snapshot["eta_sec"] > 0
+    assert set(snapshot["worker_utilization"]) == {"1", "2"}
+    assert snapshot["stage_latency_sec"]["layout"] == pytest.approx(0.1)
+
+
+def test_pipeline_metrics_no_total():
+    snapshot = PipelineMetrics().snapshot()
+    assert snapshot["eta_sec"] is None
+    assert snapshot["stage_latency_sec"] == dict.fromkeys(STAGES, 0.0)
+
+
+@pytest.mark.io
+def test_json_lines_exporter(tmpdir):
+    path = str(tmpdir.join("metrics.jsonl"))
+    metrics = PipelineMetrics()
+    exporter = JsonLinesExporter(path)
+    for docs in (1, 2):
+        metrics.update(_mock_batch(1, docs))
+        exporter(metrics.snapshot())
+    with open(path) as f:
+        snapshots = [json.loads(line) for line in f]
+    assert [s["docs"] for s in snapshots] == [1, 3]
+
+
+@pytest.mark.io
+def test_prometheus_exporter(tmpdir):
+    path = str(tmpdir.join("genalog.prom"))
+    metrics = PipelineMetrics(total_docs=4)
+    metrics.update(_mock_batch(7, 2))
+    PrometheusExporter(path)(metrics.snapshot())
+    with open(path) as f:
+        text = f.read()
+    assert "genalog_docs_total 2\n" in text
+    assert 'genalog_worker_utilization{worker="7"}' in text
+    assert 'genalog_stage_latency_seconds{stage="write"}' in text
+    assert "# TYPE genalog_eta_seconds gauge" in text
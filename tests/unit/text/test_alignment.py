@@ -1,6 +1,5 @@
 import warnings
 from random import randint
-from unittest.mock import MagicMock
 
 import pytest
 
@@ -16,38 +15,139 @@ def random_num_gap_char():
     return alignment.GAP_CHAR*randint(1, 100)
 
 
-# Settup mock for third party library call
-@pytest.fixture
-def mock_pairwise2_align(monkeypatch):
-    mock = MagicMock()
+@pytest.mark.parametrize(
+    "gt, noise, expected",
+    [
+        ("A", "B", [("A", "B", -0.5, 0, 1)]),
+        ("ab", "b", [("ab", "@b", 0.5, 0, 2)]),
+        ("New York", "New Yerk", [("New York", "New Yerk", 6.5, 0, 8)]),
+        (
+            "Boston is big ",
+            "B oston bi g",
+            [
+                ("B@oston is big @", "B oston@@@ bi@ g", 7.0, 0, 16),
+                ("B@oston is big @", "B oston @@@bi@ g", 7.0, 0, 16),
+                ("B@oston is bi@g ", "B oston@@@ bi g@", 7.0, 0, 16),
+                ("B@oston is bi@g ", "B oston @@@bi g@", 7.0, 0, 16),
+                ("B@oston @is big ", "B oston bi@ @@g@", 7.0, 0, 16),
+            ],
+        ),
+    ],
+)
+def test__align_seg(gt, noise, expected):
+    assert alignment._align_seg(gt, noise) == expected
+    assert alignment._align_seg(gt, noise, one_alignment_only=True) == expected[:1]
+
+
+@pytest.mark.parametrize(
+    "gt, noise",
+    [
+        ("New York is big", "N ewYork kis big."),
+        ("aaaa bbbb aaaa", "aa aabbb baaa a"),
+        ("ünïcödé tëxt", "unïcöde  tëxt"),
+        ("Boston is big ", "B oston bi g"),
+    ],
+)
+def test__align_seg_same_as_pairwise2(gt, noise):
+    def match_reward_fn(x, y):
+        if x == y:
+            return alignment.MATCH_REWARD
+        elif x == " " or y == " ":
+            return alignment.MISMATCH_PENALTY - alignment.SPACE_MISMATCH_PENALTY
+        return alignment.MISMATCH_PENALTY
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from Bio import pairwise2
+
+        expected = pairwise2.align.globalcs(
+            list(gt), list(noise), match_reward_fn, alignment.GAP_PENALTY,
+            alignment.GAP_EXT_PENALTY, gap_char=[alignment.GAP_CHAR],
+        )
+    result = alignment._align_seg(gt, noise)
+    assert [candidate[:2] for candidate in result] == [
+        ("".join(aligned_gt), "".join(aligned_noise)) for aligned_gt, aligned_noise, *_ in expected
+    ]
+
+
+def test__align_seg_max_candidates():
+    gt, noise = "Boston is big ", "B oston bi g"
+    candidates = alignment._align_seg(gt, noise, max_candidates=2)
+    assert 0 < len(candidates) <= 2
+    assert candidates == alignment._align_seg(gt, noise)[:len(candidates)]
+
+
+def test__iter_alignments_keep_gt_tokens():
+    gt, noise = "Boston is big ", "B oston bi g"
+    candidates = list(alignment._iter_alignments(gt, noise, keep_gt_tokens=True))
+    assert candidates == [
+        candidate for candidate in alignment._align_seg(gt, noise)
+        if len(alignment.tokenize(candidate[0])) == len(alignment.tokenize(gt))
+    ]
+
+
+def test__iter_alignments_retries_swapped_when_no_candidate_keeps_gt_tokens(monkeypatch):
+    gt, noise = "Boston is big ", "B oston bi g"
+    traceback = alignment._traceback
+    calls = []
+
+    def forward_breaks_gt_tokens(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 1:
+            # A forward candidate with a gap token of its own in the aligned gt
+            return iter([(list("Bo ston is big "), list("B oston bi g--"))])
+        return traceback(*args, **kwargs)
+
+    monkeypatch.setattr(alignment, "_traceback", forward_breaks_gt_tokens)
+    candidates = list(alignment._iter_alignments(gt, noise, keep_gt_tokens=True))
+    assert calls == [gt, noise]  # the second traceback is on the swapped sequences
+    assert candidates
+    for aligned_gt, _, _, _, _ in candidates:
+        assert len(alignment.tokenize(aligned_gt)) == len(alignment.tokenize(gt))
 
-    def mock_globalcs(*args, **kwargs):
-        mock.globalcs(*args, **kwargs)
-        return MOCK_ALIGNMENT_RESULT
 
-    # replace target method reference with the mock method
-    monkeypatch.setattr("Bio.pairwise2.align.globalcs", mock_globalcs)
-    return mock
+@pytest.mark.parametrize("initial_band", [0, 1, 8])
+def test__iter_alignments_banded_same_as_full(monkeypatch, initial_band):
+    monkeypatch.setattr(alignment, "INITIAL_BAND", initial_band)
+    monkeypatch.setattr(alignment, "MIN_BANDED_LENGTH", 0)
+    gt = "The quick brown fox jumps over the lazy dog. " * 6
+    noise = gt.replace("quick", "qu1ck", 2).replace("lazy dog", "lazydog ").replace("fox", "f o x")
+    banded = list(alignment._iter_alignments(gt, noise))
+    full = list(alignment._iter_alignments(gt, noise, banded=False))
+    assert banded and banded == full
 
 
-def test__align_seg(mock_pairwise2_align):
-    # setup method input
-    required_arg = ("A", "B")
-    optional_arg = (
-        alignment.MATCH_REWARD,
-        alignment.MISMATCH_PENALTY,
-        alignment.GAP_PENALTY,
-        alignment.GAP_EXT_PENALTY,
+def test__banded_score_matrices_band_too_narrow():
+    gt_symbols, substitution, gap_open, gap_ext = alignment._scaled_scores(
+        "xxxxxxxxxxabcdefghij", "abcdefghijyyyyyyyyyy", alignment.MATCH_REWARD, alignment.MISMATCH_PENALTY,
+        alignment.GAP_PENALTY, alignment.GAP_EXT_PENALTY, alignment.SPACE_MISMATCH_PENALTY,
     )
-    optional_kwarg = {
-        "gap_char": alignment.GAP_CHAR,
-        "one_alignment_only": alignment.ONE_ALIGNMENT_ONLY,
-    }
-    # test method
-    result = alignment._align_seg(*required_arg + optional_arg, **optional_kwarg)
-    # assertion
-    mock_pairwise2_align.globalcs.assert_called()
-    assert result == MOCK_ALIGNMENT_RESULT
+    assert alignment._banded_score_matrices(gt_symbols, substitution, gap_open, gap_ext, 1) is None
+
+
+@pytest.mark.parametrize(
+    "gt, noise",
+    [
+        ("New York is big", "N ewYork kis big."),
+        ("aaaa bbbb aaaa", "aa aabbb baaa a"),
+        ("Boston is big ", "B oston bi g"),
+        ("abc", ""),
+    ],
+)
+def test__last_row_scores(gt, noise):
+    scores = alignment._scaled_scores(
+        gt, noise, alignment.MATCH_REWARD, alignment.MISMATCH_PENALTY, alignment.GAP_PENALTY,
+        alignment.GAP_EXT_PENALTY, alignment.SPACE_MISMATCH_PENALTY,
+    )
+    score, _ = alignment._score_matrices(*scores)
+    last_row, _, _ = alignment._last_row_scores(*scores)
+    assert last_row.tolist() == score[-1].tolist()
+
+
+@pytest.mark.parametrize("gap_pen, gap_ext_pen", [(0.5, -0.5), (-0.5, -1)])
+def test__align_seg_invalid_gap_penalties(gap_pen, gap_ext_pen):
+    with pytest.raises(ValueError):
+        alignment._align_seg("A", "B", gap_pen=gap_pen, gap_ext_pen=gap_ext_pen)
 
 
 @pytest.mark.parametrize(
@@ -67,84 +167,17 @@ def test__select_alignment_candidates(alignments, target_num_tokens, raised_exce
         assert result == MOCK_ALIGNMENT_RESULT[0]
 
 
-@pytest.mark.parametrize(
-    "s, index, desired_output, raised_exception",
-    [
-        # Test exceptions
-        ("s", 2, None, IndexError),
-        ("", -1, None, ValueError),  # Empty case
-        # Index at start of string
-        ("  token", 0, 2, None),
-        ("\t\ntoken", 0, 2, None),
-        # Index reach end of string
-        ("token ", 5, 5, None),
-        ("token", 4, 4, None),
-        # Index in-between tokens
-        ("token", 0, 0, None),
-        ("t1     t2", 2, 7, None),
-        ("t1 \t \n t2", 3, 7, None),
-        # Gap char
-        (" @", 0, 1, None),
-    ],
-)
-def test__find_token_start(s, index, desired_output, raised_exception):
-    if raised_exception:
-        with pytest.raises(raised_exception):
-            alignment._find_token_start(s, index)
-    else:
-        output = alignment._find_token_start(s, index)
-        assert output == desired_output
-
-
-@pytest.mark.parametrize(
-    "s, index, desired_output, raised_exception",
-    [
-        # Test exceptions
-        ("s", 2, None, IndexError),
-        ("", -1, None, ValueError),  # Empty case
-        # Index at start of string
-        (" ", 0, 0, None),
-        ("\t\ntoken", 0, 0, None),
-        ("token", 0, 4, None),
-        ("token\t", 0, 5, None),
-        ("token\n", 0, 5, None),
-        # Index reach end of string
-        ("token ", 5, 5, None),
-        ("token", 4, 4, None),
-        # Single Char
-        (".", 0, 0, None),
-        # Gap char
-        ("@@  @", 0, 2, None),
-    ],
-)
-def test__find_token_end(s, index, desired_output, raised_exception):
-    if raised_exception:
-        with pytest.raises(raised_exception):
-            alignment._find_token_end(s, index)
-    else:
-        output = alignment._find_token_end(s, index)
-        assert output == desired_output
+def test__select_alignment_candidates_stops_at_first_match():
+    consumed = []
 
+    def candidates():
+        for candidate in [("X Y", "X Y", 0, 0, 3), ("XY", "XY", 0, 0, 2), ("X@Y", "X Y", 0, 0, 3)]:
+            consumed.append(candidate)
+            yield candidate
 
-@pytest.mark.parametrize(
-    "s, start, desired_output",
-    [
-        ("token", 0, (0, 4)),
-        ("token\t", 0, (0, 5)),
-        ("token \n", 0, (0, 5)),
-        (" token ", 0, (1, 6)),
-        # mix with GAP_CHAR
-        (" @@@@ ", 0, (1, 5)),
-        ("\n\t tok@n@@ \n\t", 0, (3, 10)),
-        # single character string
-        ("s", 0, (0, 0)),
-        # punctuation
-        ("  !,.: ", 0, (2, 6)),
-    ],
-)
-def test__find_next_token(s, start, desired_output):
-    output = alignment._find_next_token(s, start)
-    assert output == desired_output
+    result = alignment._select_alignment_candidates(candidates(), 1)
+    assert result == ("XY", "XY", 0, 0, 2)
+    assert len(consumed) == 2
 
 
 @pytest.mark.parametrize(
@@ -184,8 +217,70 @@ def test_parse_alignment(
     gt_to_noise_map, noise_to_gt_map = alignment.parse_alignment(
         aligned_gt, aligned_noise
     )
-    assert gt_to_noise_map == expected_gt_to_noise_map
-    assert noise_to_gt_map == expected_noise_to_gt_map
+    assert gt_to_noise_map.tolist() == expected_gt_to_noise_map
+    assert noise_to_gt_map.tolist() == expected_noise_to_gt_map
+    # same mapping from the edit script of the alignment
+    script = alignment.EditScript.from_aligned(aligned_gt, aligned_noise)
+    gt_to_noise_map, noise_to_gt_map = alignment.parse_alignment(script)
+    assert gt_to_noise_map.tolist() == expected_gt_to_noise_map
+    assert noise_to_gt_map.tolist() == expected_noise_to_gt_map
+
+
+def test_token_mapping():
+    mapping = alignment.TokenMapping.from_lists([[0, 1], [], [1], [2]])
+    assert len(mapping) == 4
+    assert mapping.indptr.tolist() == [0, 2, 2, 3, 4]
+    assert mapping.indices.tolist() == [0, 1, 1, 2]
+    assert mapping[0].tolist() == [0, 1]
+    assert mapping[-1].tolist() == [2]
+    assert [row.tolist() for row in mapping] == [[0, 1], [], [1], [2]]
+    assert mapping.row_lengths().tolist() == [2, 0, 1, 1]
+    assert mapping.tolist() == [[0, 1], [], [1], [2]]
+    with pytest.raises(IndexError):
+        mapping[4]
+    assert alignment.TokenMapping.from_lists([]).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "aligned_gt, aligned_noise, expected_runs",
+    [
+        ("", "", []),
+        ("abc", "abc", [("=", 3)]),
+        ("N@ew York", "N ew@York", [("=", 1), ("I", 1), ("=", 2), ("D", 1), ("=", 4)]),
+        ("@@ab", "xyab", [("I", 2), ("=", 2)]),
+        ("abc@", "axc ", [("=", 1), ("X", 1), ("=", 1), ("I", 1)]),
+    ],
+)
+def test_edit_script(aligned_gt, aligned_noise, expected_runs):
+    script = alignment.EditScript.from_aligned(aligned_gt, aligned_noise)
+    assert script.runs == expected_runs
+    assert script.gt == aligned_gt.replace(alignment.GAP_CHAR, "")
+    assert script.noise == aligned_noise.replace(alignment.GAP_CHAR, "")
+    assert len(script) == len(aligned_gt)
+    assert script.to_aligned() == (aligned_gt, aligned_noise)
+    assert alignment.EditScript.from_aligned(*script.to_aligned("-"), gap_char="-") == script
+
+
+def test_edit_script_offsets():
+    script = alignment.EditScript.from_aligned("N@ew York", "N ew@York")
+    assert list(script) == [
+        ("=", 0, 0, 0, 1), ("I", 1, 1, 1, 1), ("=", 2, 1, 2, 2), ("D", 4, 3, 4, 1), ("=", 5, 4, 4, 4)
+    ]
+
+
+def test_edit_script_unequal_length():
+    with pytest.raises(ValueError):
+        alignment.EditScript.from_aligned("abc", "ab")
+
+
+def test_parse_alignment_edit_script_with_gap_char():
+    # the texts may contain the default gap char
+    gap_char = alignment._free_gap_char("N@ew York", "N@ ewYork")
+    assert gap_char not in "N@ew York" + "N@ ewYork"
+    aligned_gt, aligned_noise = alignment.align("N@ew York", "N@ ewYork", gap_char=gap_char)
+    script = alignment.EditScript.from_aligned(aligned_gt, aligned_noise, gap_char=gap_char)
+    gt_to_noise_map, noise_to_gt_map = alignment.parse_alignment(script)
+    assert (gt_to_noise_map.tolist(), noise_to_gt_map.tolist()) == ([[0, 1], [1]], [[0], [0, 1]])
 
 
 @pytest.mark.parametrize(
@@ -204,3 +299,70 @@ def test_align(gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise):
                 f"\n\n****Expect alignment returns:****\n{expected_alignment} \n****But got:****\n{result_alignment}"
             )
         )
+
+
+@pytest.mark.parametrize(
+    "gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise",
+    [
+        # none of the first candidates in the order of Bio.pairwise2 keeps the gt tokens
+        (" a ", "  a   a  a    a ", " @a@@@@@@@@@@@@ ", "  a   a  a    a "),
+        ("aaaa ", " aa          ", "aaaa@@@@@@@@ ", " aa          "),
+    ],
+)
+def test_align_repetitive_text(gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise):
+    assert alignment.align(gt_txt, noisy_txt) == (expected_aligned_gt, expected_aligned_noise)
+
+
+def test_align_prefer_token_boundaries():
+    gt_txt = "ab ab ab ab ab ab ab ab ab ab ab ab "
+    noisy_txt = "a  b a  b a  b a  b a  b a  b a  b a  b "
+    assert alignment.align(gt_txt, noisy_txt) == (
+        "ab ab ab ab ab ab ab ab a@@b a@@b a@@b a@@b ",
+        "a@  b a@  b a@  b a@  b a  b a  b a  b a  b ",
+    )
+    assert alignment.align(gt_txt, noisy_txt, prefer_token_boundaries=True) == (
+        "a@@b a@@b a@@b a@@b ab ab ab ab ab ab ab ab ",
+        "a  b a  b a  b a  b a  @b a  @b a  @b a  @b ",
+    )
+
+
+@pytest.mark.parametrize(
+    "gt_txt, noisy_txt",
+    [
+        ("New York is big", "N ewYork kis big."),
+        ("The quick brown fox jumps over the lazy dog", "Tne qu1ck brown f ox jumps ovr the lazydog."),
+        ("", "abc"),
+        ("abc", ""),
+    ],
+)
+@pytest.mark.parametrize("base_cells", [alignment.LINEAR_MEMORY_BASE_CELLS, 64])
+def test_align_linear(monkeypatch, gt_txt, noisy_txt, base_cells):
+    monkeypatch.setattr(alignment, "LINEAR_MEMORY_BASE_CELLS", base_cells)
+    aligned_gt, aligned_noise = alignment.align_linear(gt_txt, noisy_txt)
+    expected_gt, expected_noise = alignment.align(gt_txt, noisy_txt)
+    if base_cells >= (len(gt_txt) + 1) * (len(noisy_txt) + 1):
+        assert (aligned_gt, aligned_noise) == (expected_gt, expected_noise)
+    assert aligned_gt.replace(alignment.GAP_CHAR, "") == gt_txt
+    assert aligned_noise.replace(alignment.GAP_CHAR, "") == noisy_txt
+    if gt_txt:
+        assert len(alignment.tokenize(aligned_gt)) == len(alignment.tokenize(gt_txt))
+    # same (optimal) score, in SCORE_SCALE units
+    assert _alignment_score(aligned_gt, aligned_noise) == _alignment_score(expected_gt, expected_noise)
+
+
+def _alignment_score(aligned_gt, aligned_noise):
+    score, gap = 0, None
+    for gt_char, noise_char in zip(aligned_gt, aligned_noise):
+        if alignment.GAP_CHAR in (gt_char, noise_char):
+            gap_in = gt_char == alignment.GAP_CHAR
+            score += alignment.GAP_EXT_PENALTY if gap == gap_in else alignment.GAP_PENALTY
+            gap = gap_in
+            continue
+        gap = None
+        if gt_char == noise_char:
+            score += alignment.MATCH_REWARD
+        elif " " in (gt_char, noise_char):
+            score += alignment.MISMATCH_PENALTY - alignment.SPACE_MISMATCH_PENALTY
+        else:
+            score += alignment.MISMATCH_PENALTY
+    return round(score * alignment.SCORE_SCALE)
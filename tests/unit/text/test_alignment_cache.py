@@ -0,0 +1,72 @@
+import pytest
+
+from genalog.text import alignment, alignment_cache, anchor, ner_label
+from genalog.text.alignment_cache import AlignmentCache, cached_align
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AlignmentCache(str(tmp_path / "cache" / "alignments.sqlite"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def align_calls(monkeypatch):
+    calls = []
+
+    def align_w_anchor(gt, noise, gap_char=alignment.GAP_CHAR):
+        calls.append((gt, noise))
+        return alignment.align(gt, noise, gap_char=gap_char)
+
+    monkeypatch.setattr(anchor, "align_w_anchor", align_w_anchor)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "key_args",
+    [
+        ("New York", "New Yerk", "@", "align"),  # noise
+        ("New York", "New York", "!", "align_w_anchor"),  # gap char
+        ("New York", "New York", "@", "align"),  # method
+        ("New Yor", "kNew York", "@", "align_w_anchor"),  # boundary between the strings
+    ],
+)
+def test_key(key_args):
+    key = AlignmentCache.key("New York", "New York", "@", "align_w_anchor")
+    assert key == AlignmentCache.key("New York", "New York", "@", "align_w_anchor")
+    assert key != AlignmentCache.key(*key_args)
+
+
+def test_get_put(cache):
+    key = AlignmentCache.key("ünïcödé", "unïcöde", "@", "align")
+    assert cache.get(key) is None
+    cache.put(key, "ünïcödé", "unïcöde")
+    cache.put(key, "other", "other")  # the first alignment is kept
+    assert cache.get(key) == ("ünïcödé", "unïcöde")
+    assert len(cache) == 1
+    cache.close()
+    assert AlignmentCache(cache.path).get(key) == ("ünïcödé", "unïcöde")
+
+
+def test_cached_align(cache, align_calls):
+    expected = alignment.align("New York is big", "N ewYork kis big.")
+    assert cached_align("New York is big", "N ewYork kis big.", cache=cache) == expected
+    assert cached_align("New York is big", "N ewYork kis big.", cache=cache) == expected
+    assert len(align_calls) == 1
+
+
+def test_cached_align_no_cache(monkeypatch, align_calls):
+    monkeypatch.delenv(alignment_cache.ALIGNMENT_CACHE_ENV_VAR, raising=False)
+    cached_align("New York", "New Yerk")
+    cached_align("New York", "New Yerk")
+    assert len(align_calls) == 2
+
+
+def test_propagate_label_to_ocr_default_cache(monkeypatch, tmp_path, align_calls):
+    monkeypatch.setenv(alignment_cache.ALIGNMENT_CACHE_ENV_VAR, str(tmp_path / "alignments.sqlite"))
+    args = (["B-PLACE", "I-PLACE", "O", "O"], ["New", "York", "is", "big"], ["N", "ewYork", "kis", "big."])
+    expected = ner_label.propagate_label_to_ocr(*args)
+    assert ner_label.propagate_label_to_ocr(*args) == expected
+    assert len(align_calls) == 1
+    alignment_cache.get_default_cache().close()
@@ -1,4 +1,6 @@
+import concurrent.futures
 import glob
+import random
 import warnings
 
 import pytest
@@ -78,7 +80,7 @@ def test_get_word_map(unique_words, src_tokens, desired_output, raised_exception
         (
             ["a", "b", "c"],
             ["c", "b", "a"],  # common unique words but not in same order
-            ([("b", 1)], [("b", 1)]),
+            ([("c", 2)], [("c", 0)]),
         ),
         (
             ["b", "a", "c"],
@@ -104,6 +106,26 @@ def test_get_anchor_map(gt_tokens, ocr_tokens, desired_output):
     assert desired_ocr_map == ocr_map
 
 
+@pytest.mark.parametrize(
+    "gt_tokens, ocr_tokens, desired_output",
+    [
+        (["a"], ["b", "a"], ([("a", 0)], [("a", 1)])),
+        (
+            ["a", "b", "c"],
+            ["c", "b", "a"],  # the spaces around "b" are part of the LCS string
+            ([("b", 1)], [("b", 1)]),
+        ),
+        (
+            ["c", "a", "b"],
+            ["a", "c", "b"],
+            ([("a", 1), ("b", 2)], [("a", 0), ("b", 2)]),
+        ),
+    ],
+)
+def test_get_anchor_map_char_level_lcs(gt_tokens, ocr_tokens, desired_output):
+    assert anchor.get_anchor_map(gt_tokens, ocr_tokens, char_level_lcs=True) == desired_output
+
+
 # max_seg_length does not change the following output
 @pytest.mark.parametrize("max_seg_length", [0, 1, 2, 3, 5, 4, 6])
 @pytest.mark.parametrize(
@@ -218,6 +240,35 @@ def test_find_anchor_recur_e2e(gt_file, ocr_file, max_seg_length):
         assert gt_tokens[gt_anchor] == ocr_tokens[ocr_anchor]
 
 
+def _find_anchor_recur_reference(gt_tokens, ocr_tokens, max_seg_length):
+    gt_map, ocr_map = anchor.get_anchor_map(gt_tokens, ocr_tokens)
+    gt_anchors = [index for _, index in gt_map]
+    ocr_anchors = [index for _, index in ocr_map]
+    if not gt_anchors:
+        return [], []
+    output_gt, output_ocr = list(gt_anchors), list(ocr_anchors)
+    segments = zip([0] + gt_anchors, gt_anchors + [len(gt_tokens)], [0] + ocr_anchors, ocr_anchors + [len(ocr_tokens)])
+    for gt_start, gt_end, ocr_start, ocr_end in segments:
+        gt_seg, ocr_seg = gt_tokens[gt_start:gt_end], ocr_tokens[ocr_start:ocr_end]
+        if anchor.segment_len(gt_seg) > max_seg_length or anchor.segment_len(ocr_seg) > max_seg_length:
+            sub_gt, sub_ocr = _find_anchor_recur_reference(gt_seg[1:], ocr_seg[1:], max_seg_length)
+            output_gt += [index + gt_start + 1 for index in sub_gt]
+            output_ocr += [index + ocr_start + 1 for index in sub_ocr]
+    return sorted(output_gt), sorted(output_ocr)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_seg_length", [0, 5, 20])
+def test_find_anchor_recur_same_as_recursion(seed, max_seg_length):
+    rng = random.Random(seed)
+    words = ["a", "A", "b", "cat", "Cat", "", "New", "new", "York"] + [f"w{i}" for i in range(300)]
+    gt_tokens = [rng.choice(words) for _ in range(200)]
+    ocr_tokens = [token if rng.random() > 0.2 else rng.choice(words) for token in gt_tokens]
+    expected = _find_anchor_recur_reference(gt_tokens, ocr_tokens, max_seg_length)
+    assert expected[0]
+    assert anchor.find_anchor_recur(gt_tokens, ocr_tokens, max_seg_length=max_seg_length) == expected
+
+
 @pytest.mark.parametrize(
     "gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise",
     ALIGNMENT_REGRESSION_TEST_CASES,
@@ -234,3 +285,29 @@ def test_align_w_anchor(gt_txt, noisy_txt, expected_aligned_gt, expected_aligned
                 f"\n\n****Expect alignment returns:****\n{expected_alignment} \n****But got:****\n{result_alignment}"
             )
         )
+
+
+def test_align_w_anchor_long_segments(monkeypatch):
+    gt_txt, noisy_txt = "New York is big and Boston is big", "New Yerk iz big and Bostom is bi g"
+    expected = anchor.align_w_anchor(gt_txt, noisy_txt)
+    calls = []
+
+    def align_linear(gt, noise, **kwargs):
+        calls.append((gt, noise))
+        return alignment.align(gt, noise, **kwargs)
+
+    monkeypatch.setattr(anchor, "LINEAR_MEMORY_SEGMENT_LENGTH", 0)
+    monkeypatch.setattr(alignment, "align_linear", align_linear)
+    assert anchor.align_w_anchor(gt_txt, noisy_txt) == expected
+    assert calls
+
+
+@pytest.mark.parametrize(
+    "gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise",
+    ALIGNMENT_REGRESSION_TEST_CASES[:10],
+)
+@pytest.mark.parametrize("chunk_size", [None, 1])
+def test_align_w_anchor_executor(gt_txt, noisy_txt, expected_aligned_gt, expected_aligned_noise, chunk_size):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        result = anchor.align_w_anchor(gt_txt, noisy_txt, max_seg_length=10, executor=executor, chunk_size=chunk_size)
+    assert result == anchor.align_w_anchor(gt_txt, noisy_txt, max_seg_length=10)
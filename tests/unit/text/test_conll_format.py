@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 import pytest
 
-from genalog.text import conll_format
+from genalog.text import alignment, conll_format
 
 
 @pytest.mark.parametrize(
@@ -244,7 +244,10 @@ def test_propagate_labels_sentences_text_alignment_corner_cases(
     desired_labels,
 ):
     with patch("genalog.text.alignment.parse_alignment") as mock_alignment:
-        mock_alignment.return_value = (mock_gt_to_ocr_mapping, mock_ocr_to_gt_mapping)
+        mock_alignment.return_value = (
+            alignment.TokenMapping.from_lists(mock_gt_to_ocr_mapping),
+            alignment.TokenMapping.from_lists(mock_ocr_to_gt_mapping),
+        )
         (
             ocr_text_sentences,
             ocr_labels_sentences,
@@ -1,6 +1,8 @@
+import random
+
 import pytest
 
-from genalog.text.lcs import LCS
+from genalog.text.lcs import LCS, UniqueLCS
 
 
 @pytest.fixture(
@@ -52,3 +54,31 @@ def test_lcs_e2e(str1, str2, expected_len, expected_lcs):
     lcs = LCS(str1, str2)
     assert expected_lcs == lcs.get_str()
     assert expected_len == lcs.get_len()
+
+
+@pytest.mark.parametrize(
+    "seq1, seq2, expected_lcs",
+    [
+        ([], [], []),  # empty
+        ([1, 2, 3], [], []),
+        ([1, 2, 3], [1, 2, 3], [1, 2, 3]),
+        ([1, 2, 3], [4, 5], []),  # no results
+        ([1, 2, 3], [3, 2, 1], [3]),  # multiple cases
+        ([3, 1, 2], [1, 3, 2], [1, 2]),
+        (["New", "York", "is", "big"], ["big", "New", "is", "York"], ["New", "is"]),
+    ],
+)
+def test_unique_lcs(seq1, seq2, expected_lcs):
+    lcs = UniqueLCS(seq1, seq2)
+    assert expected_lcs == lcs.get_seq()
+    assert len(expected_lcs) == lcs.get_len()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_unique_lcs_same_as_lcs(seed):
+    rng = random.Random(seed)
+    seq1 = rng.sample(range(50), 30)
+    seq2 = rng.sample(range(50), 30)
+    # characters of a string are unique items
+    str1, str2 = ("".join(map(chr, seq)) for seq in (seq1, seq2))
+    assert UniqueLCS(seq1, seq2).get_seq() == list(map(ord, LCS(str1, str2).get_str()))
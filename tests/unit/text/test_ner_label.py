@@ -218,25 +218,12 @@ def test__propagate_label_to_ocr(gt_labels, gt_tokens, ocr_tokens, desired_ocr_l
         (["o"], ["New"], ["New"], None),  # positive case
         (["o"], ["New@"], ["New"], None),  # positive case with gap char
         (["o"], ["New"], ["@@New"], None),  # positive case with gap char
-        (
-            ["o"],
-            list(ner_label.GAP_CHAR_SET),
-            [""],
-            ner_label.GapCharError,
-        ),  # input char set == GAP_CHAR_SET
         (
             ["o"],
             [""],
             list(ner_label.GAP_CHAR_SET),
-            ner_label.GapCharError,
-        ),  # input char set == GAP_CHAR_SET
-        # all possible gap chars set split between ocr and gt tokens
-        (
-            ["o"],
-            list(ner_label.GAP_CHAR_SET)[:10],
-            list(ner_label.GAP_CHAR_SET)[10:],
-            ner_label.GapCharError,
-        ),
+            ValueError,
+        ),  # invalid token: empty string
     ],
 )
 def test_propagate_label_to_ocr_error(
@@ -260,6 +247,20 @@ def test_propagate_label_to_ocr(gt_labels, gt_tokens, ocr_tokens, desired_ocr_la
     assert ocr_labels == desired_ocr_labels
 
 
+def test_propagate_label_to_ocr_all_gap_chars():
+    # the input contains all the printable gap chars
+    gt_tokens = sorted(ner_label.GAP_CHAR_SET)
+    ocr_tokens = gt_tokens[:10] + ["".join(gt_tokens[10:])]
+    gt_labels = ["o"] * len(gt_tokens)
+    ocr_labels, aligned_gt, aligned_ocr, gap_char = ner_label.propagate_label_to_ocr(
+        gt_labels, gt_tokens, ocr_tokens
+    )
+    assert ocr_labels == ["o"] * len(ocr_tokens)
+    assert gap_char not in ner_label.GAP_CHAR_SET
+    assert aligned_gt.replace(gap_char, "") == " ".join(gt_tokens)
+    assert aligned_ocr.replace(gap_char, "") == " ".join(ocr_tokens)
+
+
 @pytest.mark.parametrize(
     "tokens, labels, label_top, desired_output",
     [